@@ -0,0 +1,92 @@
+# agent_tools.py
+
+from typing import List, Optional
+from langchain.tools import tool
+from pydantic import BaseModel, Field
+from preflight import preflight_contract
+from solidity_tools import compile_contract, compile_contracts, analyze_contract, save_contract_files
+from config import SAVE_DIRECTORY
+
+# -------------------------------
+# Input Schema Definitions
+# -------------------------------
+
+class CompileSolidityInput(BaseModel):
+    contract_code: str = Field(..., description="Solidity contract code to compile.")
+
+class CompileSolidityBatchInput(BaseModel):
+    contract_codes: List[str] = Field(..., description="Solidity contract sources to compile together in one solc run.")
+
+class AnalyzeWithSlitherInput(BaseModel):
+    contract_code: str = Field(..., description="Solidity contract code to analyze.")
+
+class SaveContractAndReportInput(BaseModel):
+    contract_code: str = Field(..., description="Solidity contract code to save.")
+    slither_output: str = Field(..., description="Slither analysis report to save.")
+    contract_filename: Optional[str] = Field(
+        default=None, 
+        description="Desired filename for the Solidity contract (e.g., MyContract.sol). If not provided, a timestamped filename will be used."
+    )
+    report_filename: Optional[str] = Field(
+        default=None, 
+        description="Desired filename for the Slither report (e.g., MyContract_SlitherReport.txt). If not provided, a timestamped filename will be used."
+    )
+    save_directory: Optional[str] = Field(
+        default=SAVE_DIRECTORY,
+        description=f"Directory where the files will be saved. Defaults to '{SAVE_DIRECTORY}' in the current working directory."
+    )
+
+# -------------------------------
+# Tool Definitions Using @tool
+# -------------------------------
+
+@tool(
+    args_schema=CompileSolidityInput,
+    return_direct=True
+)
+def compile_solidity(contract_code: str) -> str:
+    """Compiles the Solidity contract."""
+    # Reject obviously broken sources without starting solc
+    checked = preflight_contract(contract_code)
+    if not checked.ok:
+        return f"Compilation failed: {checked.reason}"
+    _, output = compile_contract(checked.code)
+    return output  # Compiled output, or the error message
+
+
+@tool(
+    args_schema=CompileSolidityBatchInput,
+    return_direct=True
+)
+def compile_solidity_batch(contract_codes: List[str]) -> str:
+    """Compiles several Solidity contracts in one solc run and reports which ones compiled."""
+    results = compile_contracts(contract_codes)
+    return "\n\n".join(
+        f"Contract {i}: {'compiled' if compiled else 'failed'}\n{output}"
+        for i, (compiled, output) in enumerate(results)
+    )
+
+
+@tool(
+    args_schema=AnalyzeWithSlitherInput,
+    return_direct=True
+)
+def analyze_with_slither(contract_code: str) -> str:
+    """Analyzes the Solidity contract using Slither."""
+    _, output = analyze_contract(contract_code)
+    return output  # Analysis report, or the error message
+
+
+@tool(
+    args_schema=SaveContractAndReportInput,
+    return_direct=True
+)
+def save_contract_and_report(
+    contract_code: str, 
+    slither_output: str, 
+    contract_filename: Optional[str] = None, 
+    report_filename: Optional[str] = None, 
+    save_directory: Optional[str] = SAVE_DIRECTORY
+) -> str:
+    """Saves the Solidity contract and Slither report with dynamic naming to prevent overwriting."""
+    return save_contract_files(contract_code, slither_output, contract_filename, report_filename, save_directory)
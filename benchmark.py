@@ -0,0 +1,369 @@
+# benchmark.py
+"""
+End-to-end throughput benchmark for the direct pipeline.
+
+Runs ContractPipeline against a local stand-in for the Cohere generate API
+(configurable latency, error rate and 429 injection, serving canned
+contracts such as test.sol) and stub solc/slither binaries with configurable
+runtimes, or the real tools with --real-tools. Every combination of the
+given worker counts is run and reported: contracts/hour, per-stage p50/p95
+latency, CPU use and API calls per valid contract. The stub solc emits no
+bytecode, so validation takes the Slither CLI fallback path.
+
+    python benchmark.py -c 50 --generate-workers 2 4 8 --analyze-workers 1 2 4 --api-latency 2
+"""
+
+import argparse
+import itertools
+import json
+import os
+import random
+import resource
+import shutil
+import stat
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+_STUB_SOLC = '''#!/usr/bin/env python3
+import json, sys, time
+if sys.argv[1:] == ["--version"]:
+    print("solc, the solidity compiler commandline interface\\nVersion: 0.8.0-benchmark-stub")
+    sys.exit(0)
+time.sleep({seconds})
+if sys.argv[1:] == ["--standard-json"]:
+    sources = json.load(sys.stdin)["sources"]
+    print(json.dumps({{
+        "sources": {{name: {{"id": i, "ast": {{}}}} for i, name in enumerate(sources)}},
+        "contracts": {{name: {{"Stub": {{"abi": []}}}} for name in sources}},
+        "errors": [],
+    }}))
+    sys.exit(0)
+print("Compiler run successful.")
+'''
+
+_STUB_SLITHER = '''#!/usr/bin/env python3
+import json, random, sys, time
+if sys.argv[1:] == ["--version"]:
+    print("0.0.0-benchmark-stub")
+    sys.exit(0)
+detectors = {detectors!r}
+if sys.argv[1:] == ["--list-detectors-json"]:
+    print(json.dumps([{{"check": name}} for name in detectors]))
+    sys.exit(0)
+time.sleep({seconds})
+if "--detect" in sys.argv:
+    requested = sys.argv[sys.argv.index("--detect") + 1].split(",")
+    detectors = [name for name in requested if random.random() < {hit_rate}]
+findings = [
+    {{"check": name, "impact": "High", "confidence": "Medium", "description": name + " (stub)",
+      "elements": [{{"source_mapping": {{"lines": [1]}}}}]}}
+    for name in detectors
+]
+print(json.dumps({{"success": True, "error": None, "results": {{"detectors": findings}}}}))
+sys.exit(255 if findings else 0)
+'''
+
+
+class FakeCohereServer:
+    """
+    Local HTTP stand-in for Cohere's /v1/generate, including streamed
+    responses. Each request waits `latency` (+/- `jitter`) seconds, then fails
+    with a 429 (with Retry-After) or a 500 at the configured rates, or returns
+    the next canned contract wrapped in a code fence and a line of prose.
+    Batch prompts (see CohereAPI._build_batch_prompt) get one delimited
+    contract per requested spec.
+    """
+
+    def __init__(
+        self,
+        contracts: List[str],
+        latency: float = 0.5,
+        jitter: float = 0.1,
+        error_rate: float = 0.0,
+        throttle_rate: float = 0.0,
+        retry_after: float = 0.5,
+        stream_chunk_chars: int = 40,
+    ):
+        self.contracts = contracts
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.stream_chunk_chars = stream_chunk_chars
+        self.stats: Counter = Counter()
+        self._lock = threading.Lock()
+        self._next = 0
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def count(self, name: str):
+        with self._lock:
+            self.stats[name] += 1
+
+    def reset_stats(self):
+        with self._lock:
+            self.stats = Counter()
+
+    def _canned(self) -> str:
+        with self._lock:
+            code = self.contracts[self._next % len(self.contracts)]
+            self._next += 1
+        return f"Here is the contract:\n```solidity\n{code}\n```\nIt contains the requested vulnerabilities."
+
+    def completion(self, prompt: str) -> str:
+        specs = sum(1 for line in prompt.splitlines() if line.startswith("Contract ") and "complexity level" in line)
+        if specs:
+            return "\n".join(f"### CONTRACT {i}\n{self._canned()}" for i in range(1, specs + 1))
+        return self._canned()
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _json(self, status: int, body: dict, headers: Optional[Dict[str, str]] = None):
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                server.count("requests")
+                time.sleep(max(0.0, server.latency + random.uniform(-server.jitter, server.jitter)))
+
+                roll = random.random()
+                if roll < server.throttle_rate:
+                    server.count("throttled")
+                    return self._json(429, {"message": "rate limited"}, {"Retry-After": str(server.retry_after)})
+                if roll < server.throttle_rate + server.error_rate:
+                    server.count("errors")
+                    return self._json(500, {"message": "injected error"})
+
+                text = server.completion(request.get("prompt", ""))
+                generation_id = str(uuid.uuid4())
+                if not request.get("stream"):
+                    return self._json(200, {
+                        "id": generation_id,
+                        "prompt": request.get("prompt"),
+                        "generations": [{"id": generation_id, "index": 0, "text": text}],
+                        "meta": {},
+                    })
+
+                # Streamed: one JSON event per line, connection closed at the end
+                self.send_response(200)
+                self.send_header("Content-Type", "application/stream+json")
+                self.end_headers()
+                try:
+                    for i in range(0, len(text), server.stream_chunk_chars):
+                        event = {"event_type": "text-generation", "is_finished": False,
+                                 "text": text[i:i + server.stream_chunk_chars]}
+                        self.wfile.write((json.dumps(event) + "\n").encode())
+                        self.wfile.flush()
+                    end = {"event_type": "stream-end", "is_finished": True, "finish_reason": "COMPLETE",
+                           "response": {"id": generation_id, "generations": [{"id": generation_id, "text": text}]}}
+                    self.wfile.write((json.dumps(end) + "\n").encode())
+                except (BrokenPipeError, ConnectionResetError):
+                    server.count("streams_closed_early")
+
+        return Handler
+
+
+def write_tool_stubs(directory: str, solc_seconds: float, slither_seconds: float, hit_rate: float,
+                     detectors: List[str]) -> Dict[str, str]:
+    """Writes executable solc/slither stand-ins into `directory` and returns their paths."""
+    paths = {
+        "solc": (_STUB_SOLC.format(seconds=solc_seconds), os.path.join(directory, "solc")),
+        "slither": (
+            _STUB_SLITHER.format(seconds=slither_seconds, hit_rate=hit_rate, detectors=detectors),
+            os.path.join(directory, "slither"),
+        ),
+    }
+    for source, path in paths.values():
+        with open(path, "w") as f:
+            f.write(source)
+        os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    return {name: path for name, (_, path) in paths.items()}
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+def _cpu_seconds() -> Dict[str, float]:
+    own, children = resource.getrusage(resource.RUSAGE_SELF), resource.getrusage(resource.RUSAGE_CHILDREN)
+    return {"self": own.ru_utime + own.ru_stime, "children": children.ru_utime + children.ru_stime}
+
+
+def run_benchmark(server: FakeCohereServer, num_contracts: int, generate_workers: int, analyze_workers: int,
+                  work_dir: str, **pipeline_options) -> dict:
+    """Runs the pipeline once in a fresh output directory and returns its measurements."""
+    # Imported here: config reads the tool paths and Cohere base URL from the environment set up by main()
+    from cohere_api import CohereAPI
+    from pipeline import ContractPipeline
+    from rate_limit import AdaptiveRateLimiter
+    from config import COHERE_REQUESTS_PER_MINUTE, COHERE_LATENCY_TARGET
+    from utils import COMPLEXITY, VULNERABILITIES
+
+    run_dir = tempfile.mkdtemp(prefix=f"g{generate_workers}-a{analyze_workers}-", dir=work_dir)
+    shutil.copy(os.path.join(os.path.dirname(os.path.abspath(__file__)), "preamble.txt"), run_dir)
+    previous_dir = os.getcwd()
+    os.chdir(run_dir)
+    try:
+        limiter = AdaptiveRateLimiter(
+            requests_per_second=COHERE_REQUESTS_PER_MINUTE / 60,
+            max_concurrency=generate_workers,
+            latency_target=COHERE_LATENCY_TARGET,
+        )
+        cohere_api = CohereAPI("benchmark", limiter=limiter)
+        select_params = lambda: (random.choice(COMPLEXITY), random.sample(VULNERABILITIES, k=random.randint(1, 3)))
+        pipeline = ContractPipeline(
+            cohere_api,
+            select_params,
+            generate_workers=generate_workers,
+            analyze_workers=analyze_workers,
+            findings_store=None,
+            **pipeline_options,
+        )
+
+        server.reset_stats()
+        cpu_before = _cpu_seconds()
+        start = time.perf_counter()
+        completed = pipeline.run(num_contracts)
+        wall = time.perf_counter() - start
+        cpu_after = _cpu_seconds()
+    finally:
+        os.chdir(previous_dir)
+
+    stage_times: Dict[str, List[float]] = {}
+    for job in pipeline.completed + pipeline.failed:
+        for stage, seconds in job.timings.items():
+            stage_times.setdefault(stage, []).append(seconds)
+    cpu = {name: cpu_after[name] - cpu_before[name] for name in cpu_after}
+    return {
+        "generate_workers": generate_workers,
+        "analyze_workers": analyze_workers,
+        "contracts": num_contracts,
+        "valid": len(completed),
+        "failed": len(pipeline.failed),
+        "wall_seconds": wall,
+        "contracts_per_hour": len(completed) / wall * 3600 if wall else 0.0,
+        "stages": {
+            stage: {"p50": percentile(times, 50), "p95": percentile(times, 95), "count": len(times)}
+            for stage, times in stage_times.items()
+        },
+        "cpu_seconds": cpu,
+        "cpu_utilization": (cpu["self"] + cpu["children"]) / wall if wall else 0.0,
+        "api": dict(server.stats),
+        "api_calls_per_valid_contract": server.stats["requests"] / len(completed) if completed else None,
+    }
+
+
+def _print_report(results: List[dict]):
+    print(f"\n{'gen':>4} {'ana':>4} {'valid':>6} {'wall s':>8} {'contracts/h':>12} {'CPU %':>7} {'API/valid':>10}  stage p50/p95 (s)")
+    for result in results:
+        stages = "  ".join(
+            f"{stage} {times['p50']:.2f}/{times['p95']:.2f}" for stage, times in result["stages"].items()
+        )
+        calls = result["api_calls_per_valid_contract"]
+        print(
+            f"{result['generate_workers']:>4} {result['analyze_workers']:>4} {result['valid']:>6} "
+            f"{result['wall_seconds']:>8.1f} {result['contracts_per_hour']:>12.0f} "
+            f"{result['cpu_utilization'] * 100:>6.0f}% {calls if calls is None else round(calls, 2)!s:>10}  {stages}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the contract pipeline against local Cohere/solc/Slither stand-ins.")
+    parser.add_argument("-c", "--contracts", type=int, default=20, help="Contracts per run.")
+    parser.add_argument("--generate-workers", type=int, nargs="+", default=[4], help="Generate worker counts to try.")
+    parser.add_argument("--analyze-workers", type=int, nargs="+", default=[2], help="Analyze/validate worker counts to try.")
+    parser.add_argument("--contract-file", action="append", help="Canned contract served by the fake API (default: test.sol); repeatable.")
+    parser.add_argument("--api-latency", type=float, default=0.5, help="Seconds per fake API response.")
+    parser.add_argument("--api-jitter", type=float, default=0.1, help="Uniform +/- jitter on the API latency.")
+    parser.add_argument("--api-error-rate", type=float, default=0.0, help="Fraction of API requests answered with a 500.")
+    parser.add_argument("--api-429-rate", type=float, default=0.0, help="Fraction of API requests answered with a 429.")
+    parser.add_argument("--solc-seconds", type=float, default=0.2, help="Runtime of the stub solc.")
+    parser.add_argument("--slither-seconds", type=float, default=1.0, help="Runtime of the stub slither.")
+    parser.add_argument("--slither-hit-rate", type=float, default=1.0, help="Chance the stub slither confirms a requested detector.")
+    parser.add_argument("--real-tools", action="store_true", help="Use solc and slither from PATH instead of the stubs.")
+    parser.add_argument("--stream", action="store_true", help="Use streamed generation.")
+    parser.add_argument("--contracts-per-call", type=int, default=1, help="Contracts requested per API call.")
+    parser.add_argument("--dedup-threshold", type=float, default=0.0, help="Near-duplicate threshold (canned contracts repeat, so off by default).")
+    parser.add_argument("--json-out", help="Also write the results as JSON to this file.")
+    args = parser.parse_args()
+
+    package_dir = os.path.dirname(os.path.abspath(__file__))
+    contract_files = args.contract_file or [os.path.join(package_dir, "test.sol")]
+    contracts = []
+    for path in contract_files:
+        with open(path, "r") as f:
+            contracts.append(f.read())
+
+    work_dir = tempfile.mkdtemp(prefix="contract-benchmark-")
+    server = FakeCohereServer(
+        contracts,
+        latency=args.api_latency,
+        jitter=args.api_jitter,
+        error_rate=args.api_error_rate,
+        throttle_rate=args.api_429_rate,
+    ).start()
+    os.environ["COHERE_BASE_URL"] = server.url
+    # Identical canned sources would otherwise be served from the tool cache after the first run
+    os.environ["TOOL_CACHE_DISABLED"] = "1"
+    if not args.real_tools:
+        from utils import VULNERABILITIES
+        stubs = write_tool_stubs(work_dir, args.solc_seconds, args.slither_seconds, args.slither_hit_rate, VULNERABILITIES)
+        os.environ["SOLC_PATH"] = stubs["solc"]
+        os.environ["SLITHER_PATH"] = stubs["slither"]
+
+    results = []
+    try:
+        for generate_workers, analyze_workers in itertools.product(args.generate_workers, args.analyze_workers):
+            results.append(run_benchmark(
+                server, args.contracts, generate_workers, analyze_workers, work_dir,
+                stream=args.stream,
+                contracts_per_call=args.contracts_per_call,
+                dedup_threshold=args.dedup_threshold,
+            ))
+    finally:
+        server.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    _print_report(results)
+    if args.json_out:
+        with open(args.json_out, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
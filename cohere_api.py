@@ -1,39 +1,255 @@
 # cohere_api.py
 
+import asyncio
+import hashlib
+import time
 import cohere
+import httpx
 import logging
-from utils import load_prompt_from_file
+import re
+from collections import Counter
+from typing import Dict, List, Optional, Sequence, Tuple
+from utils import load_prompt_from_file, pprint
 from requests.exceptions import RequestException  # For catching HTTP-related errors
-from rich.pretty import pprint
-from rich.progress import Progress
+from rate_limit import AdaptiveRateLimiter, backoff_delay
+from preflight import StreamChecker
+from response_cache import ResponseCache, ResponseCacheMiss
+from metrics import MetricsRegistry
+from config import (
+    COHERE_MODEL, COHERE_BASE_URL, COHERE_MAX_RETRIES, COHERE_BACKOFF_BASE, COHERE_BACKOFF_CAP,
+    COHERE_REQUESTS_PER_MINUTE, COHERE_MAX_CONCURRENCY, COHERE_LATENCY_TARGET,
+    REPAIR_TEMPERATURE, REPAIR_MAX_DIAGNOSTIC_CHARS,
+    GENERATE_MAX_TOKENS, GENERATE_TOKENS_PER_COMPLEXITY, COHERE_MAX_OUTPUT_TOKENS
+)
+
+logger = logging.getLogger(__name__)
+
+# Errors worth retrying: throttling, transient server failures and network problems
+RETRYABLE_ERRORS = (
+    cohere.TooManyRequestsError,
+    cohere.ServiceUnavailableError,
+    cohere.InternalServerError,
+    cohere.GatewayTimeoutError,
+    cohere.ClientClosedRequestError,
+    httpx.TransportError,
+    RequestException,
+)
+
+
+# Delimiter line the model is asked to put before each contract of a batch generation
+_BATCH_DELIMITER = re.compile(r"^[ \t#*=-]*CONTRACT[ \t]+(\d+)[ \t#*=:-]*$", re.M | re.I)
+
+
+def split_batch_output(text: str, count: int) -> Dict[int, str]:
+    """
+    Splits the output of a batch generation on its `### CONTRACT i` lines.
+    Returns the non-empty contracts by 0-based index; contracts that are
+    missing (e.g. the output was cut off) are simply absent.
+    """
+    markers = list(_BATCH_DELIMITER.finditer(text))
+    contracts = {}
+    for k, marker in enumerate(markers):
+        index = int(marker.group(1)) - 1
+        end = markers[k + 1].start() if k + 1 < len(markers) else len(text)
+        body = text[marker.end():end].strip()
+        if 0 <= index < count and body and index not in contracts:
+            contracts[index] = body
+    return contracts
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """Returns the server's Retry-After hint in seconds, if the error carries one."""
+    headers = getattr(error, "headers", None) or {}
+    value = headers.get("retry-after") or headers.get("Retry-After")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
 
 class CohereAPI:
-    def __init__(self, api_key):
-        self.client = cohere.Client(api_key)
+    """
+    Cohere generation client.
+
+    With a ResponseCache, requests are recorded or replayed (see
+    response_cache); in replay mode no client is created, so no API key or
+    network access is needed. With a seed, each request is sent with
+    `seed + n`, n counting earlier requests with the same prompt, so reruns
+    with the same seed issue (and replay) the same requests.
+
+    With a MetricsRegistry, every request is counted by outcome and timed,
+    retries are counted by error, and billed tokens (characters for streams,
+    which are closed before usage is reported) are added both to counters and
+    to the pipeline span the request runs in.
+    """
+
+    def __init__(
+        self,
+        api_key,
+        limiter: Optional[AdaptiveRateLimiter] = None,
+        cache: Optional[ResponseCache] = None,
+        seed: Optional[int] = None,
+        metrics: Optional[MetricsRegistry] = None,
+    ):
+        self.api_key = api_key
+        self.metrics = metrics
+        self._client = None
+        self._async_client = None  # Created on first async call, inside the running event loop
+        self.cache = cache
+        self.seed = seed
+        self._prompt_counts: Counter = Counter()
+        self.limiter = limiter or AdaptiveRateLimiter(
+            requests_per_second=COHERE_REQUESTS_PER_MINUTE / 60,
+            max_concurrency=COHERE_MAX_CONCURRENCY,
+            latency_target=COHERE_LATENCY_TARGET,
+        )
         self.base_prompt = load_prompt_from_file()  # Load the base prompt from file
-    
+
+    @staticmethod
+    def _client_kwargs() -> dict:
+        return {"base_url": COHERE_BASE_URL} if COHERE_BASE_URL else {}
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = cohere.Client(self.api_key, **self._client_kwargs())
+        return self._client
+
+    @property
+    def async_client(self):
+        if self._async_client is None:
+            self._async_client = cohere.AsyncClient(self.api_key, **self._client_kwargs())
+        return self._async_client
+
+    def _build_prompt(self, complexity, vulnerabilities) -> str:
+        if not isinstance(vulnerabilities, list):
+            raise ValueError(f"Expected a list of vulnerabilities, got {type(vulnerabilities)}")
+
+        # Construct the prompt for contract generation
+        vulnerability_prompt = f"Generate a Solidity contract with the following vulnerabilities: {', '.join(vulnerabilities)}."
+        return f"{self.base_prompt}\n\nComplexity level: {complexity}\n{vulnerability_prompt}"
+
+    def _build_batch_prompt(self, specs: Sequence[Tuple[str, List[str]]]) -> str:
+        lines = [
+            f"Generate {len(specs)} separate, unrelated Solidity contracts. Put a line `### CONTRACT i` "
+            "before contract i and nothing else on that line, and write END after the last contract.",
+        ]
+        for i, (complexity, vulnerabilities) in enumerate(specs, start=1):
+            if not isinstance(vulnerabilities, list):
+                raise ValueError(f"Expected a list of vulnerabilities, got {type(vulnerabilities)}")
+            lines.append(f"Contract {i}: complexity level: {complexity}; vulnerabilities: {', '.join(vulnerabilities)}.")
+        return f"{self.base_prompt}\n\n" + "\n".join(lines)
+
+    @staticmethod
+    def _batch_max_tokens(specs: Sequence[Tuple[str, List[str]]]) -> int:
+        budget = sum(GENERATE_TOKENS_PER_COMPLEXITY.get((complexity or "").lower(), GENERATE_MAX_TOKENS) for complexity, _ in specs)
+        return min(budget, COHERE_MAX_OUTPUT_TOKENS)
+
+    def _build_repair_prompt(self, contract_code: str, problem: str, diagnostics: str, vulnerabilities) -> str:
+        # Deliberately short: the base prompt is not resent, only the source and what is wrong with it
+        if len(diagnostics) > REPAIR_MAX_DIAGNOSTIC_CHARS:
+            diagnostics = diagnostics[:REPAIR_MAX_DIAGNOSTIC_CHARS] + "\n..."
+        return (
+            f"The Solidity contract below {problem}\n\n{diagnostics}\n\n"
+            f"```solidity\n{contract_code}\n```\n\n"
+            "Fix it with the smallest changes needed. It must still intentionally contain these vulnerabilities: "
+            f"{', '.join(vulnerabilities)}. Reply with only the complete corrected contract, then END."
+        )
+
+    def _generate_kwargs(self, prompt: str, temperature: float = 0.5, max_tokens: int = GENERATE_MAX_TOKENS) -> dict:
+        return dict(
+            model=COHERE_MODEL,
+            prompt=prompt,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            stop_sequences=["END"],
+            return_likelihoods="NONE",
+            # Retries are handled here so throttling is visible to the rate limiter
+            request_options={"max_retries": 0},
+        )
+
+    def _record_request(self, outcome: str, seconds: float, **usage):
+        if self.metrics is None:
+            return
+        self.metrics.inc("cohere_requests_total", outcome=outcome)
+        self.metrics.observe("cohere_request_seconds", seconds, outcome=outcome)
+        for name, value in usage.items():
+            self.metrics.inc(f"cohere_{name}_total", value)
+        self.metrics.annotate(api_requests=1, api_seconds=seconds, **usage)
+
+    def _record_retry(self, error: Exception):
+        if self.metrics is not None:
+            self.metrics.inc("cohere_retries_total", error=type(error).__name__)
+            self.metrics.annotate(api_retries=1)
+
+    @staticmethod
+    def _billed_tokens(response) -> dict:
+        billed = getattr(getattr(response, "meta", None), "billed_units", None)
+        if billed is None:
+            return {}
+        return {
+            name: int(getattr(billed, name))
+            for name in ("input_tokens", "output_tokens")
+            if getattr(billed, name, None) is not None
+        }
+
+    def _seeded(self, kwargs: dict) -> dict:
+        if self.seed is None:
+            return kwargs
+        prompt_hash = hashlib.sha256(kwargs["prompt"].encode()).hexdigest()
+        seed = self.seed + self._prompt_counts[prompt_hash]
+        self._prompt_counts[prompt_hash] += 1
+        return {**kwargs, "seed": seed}
+
+    def _cache_lookup(self, kwargs: dict, stream: bool = False) -> Tuple[Optional[str], Optional[str]]:
+        """Returns (cache key, replayed text); the key is None when the cache is not in use."""
+        if self.cache is None or not self.cache.enabled:
+            return None, None
+        key = self.cache.make_key({**kwargs, "stream": stream})
+        if self.cache.mode != "replay":
+            return key, None
+        text = self.cache.get(key)
+        if text is None:
+            raise ResponseCacheMiss(f"No recorded response for request {key}")
+        return key, text
+
+    def _cache_store(self, key: Optional[str], kwargs: dict, text: Optional[str]):
+        if key is not None and text is not None and self.cache.mode == "record":
+            self.cache.put(key, text, kwargs["model"])
+
+    async def _arequest(self, kwargs: dict, stream: bool = False) -> Optional[str]:
+        """Sends one generate request, through the response cache when there is one."""
+        kwargs = self._seeded(kwargs)
+        key, text = self._cache_lookup(kwargs, stream)
+        if text is not None:
+            if self.metrics is not None:
+                self.metrics.inc("cohere_cache_replays_total")
+            return text
+        text = await (self._astream_with_retries(kwargs) if stream else self._agenerate_with_retries(kwargs))
+        self._cache_store(key, kwargs, text)
+        return text
+
     def generate_contract(self, complexity, vulnerabilities):
         """Generates a Solidity contract with specified complexity and vulnerabilities."""
         try:
-            if not isinstance(vulnerabilities, list):
-                raise ValueError(f"Expected a list of vulnerabilities, got {type(vulnerabilities)}")
+            full_prompt = self._build_prompt(complexity, vulnerabilities)
+            kwargs = self._seeded(self._generate_kwargs(full_prompt))
+            key, contract_code = self._cache_lookup(kwargs)
+            if contract_code is not None:
+                return contract_code
 
-            # Construct the prompt for contract generation
-            vulnerability_prompt = f"Generate a Solidity contract with the following vulnerabilities: {', '.join(vulnerabilities)}."
-            full_prompt = f"{self.base_prompt}\n\nComplexity level: {complexity}\n{vulnerability_prompt}"
-
-                        # Add progress tracking
-            with Progress() as progress:
-                response = self.client.generate(
-                    model='command-r-plus-08-2024',
-                    prompt=full_prompt,
-                    max_tokens=1250,
-                    temperature=0.5,
-                    stop_sequences=["END"],
-                    return_likelihoods="NONE"
-                )
-            contract_code = response.generations[0].text
-            return contract_code
+            for attempt in range(COHERE_MAX_RETRIES + 1):
+                try:
+                    response = self.client.generate(**kwargs)
+                    contract_code = response.generations[0].text
+                    self._cache_store(key, kwargs, contract_code)
+                    return contract_code
+                except RETRYABLE_ERRORS as e:
+                    if attempt == COHERE_MAX_RETRIES:
+                        raise
+                    delay = _retry_after(e) or backoff_delay(attempt, COHERE_BACKOFF_BASE, COHERE_BACKOFF_CAP)
+                    logger.warning(f"Retryable error while generating contract (attempt {attempt + 1}), retrying in {delay:.1f}s: {e}")
+                    time.sleep(delay)
 
         except RequestException as e:
             logging.error(f"Network error while generating contract: {e}")
@@ -41,3 +257,140 @@ class CohereAPI:
         except Exception as e:
             logging.error(f"An error occurred while generating contract: {e}")
             return None
+
+    async def agenerate_contract(self, complexity, vulnerabilities) -> Optional[str]:
+        """
+        Async variant of generate_contract. Calls go through the adaptive rate
+        limiter, and retryable errors are retried with jittered exponential backoff.
+        Returns None when generation ultimately fails.
+        """
+        try:
+            full_prompt = self._build_prompt(complexity, vulnerabilities)
+            return await self._arequest(self._generate_kwargs(full_prompt))
+        except Exception as e:
+            logger.error(f"An error occurred while generating contract: {e}")
+            return None
+
+    async def agenerate_contract_stream(self, complexity, vulnerabilities) -> Optional[str]:
+        """
+        Streaming variant of agenerate_contract. Tokens are checked as they
+        arrive (see StreamChecker): the stream is closed as soon as the contract
+        is complete, so it can be compiled without waiting for trailing prose,
+        and abandoned early when the output is clearly not a contract. Returns
+        None for abandoned or failed generations.
+        """
+        try:
+            full_prompt = self._build_prompt(complexity, vulnerabilities)
+            return await self._arequest(self._generate_kwargs(full_prompt), stream=True)
+        except Exception as e:
+            logger.error(f"An error occurred while generating contract: {e}")
+            return None
+
+    async def _astream_with_retries(self, kwargs: dict) -> Optional[str]:
+        for attempt in range(COHERE_MAX_RETRIES + 1):
+            checker = StreamChecker()
+            await self.limiter.acquire()
+            start = time.monotonic()
+            try:
+                stream = self.async_client.generate_stream(**kwargs)
+                try:
+                    async for event in stream:
+                        if event.event_type == "stream-error":
+                            raise RuntimeError(f"Stream error: {event.err}")
+                        if event.event_type != "text-generation":
+                            continue
+                        status = checker.feed(event.text)
+                        if status == StreamChecker.ABORT:
+                            logger.warning(f"Abandoning generation after {len(checker.text)} characters: {checker.reason}")
+                            self._record_request("aborted", time.monotonic() - start, output_chars=len(checker.text))
+                            return None
+                        if status == StreamChecker.COMPLETE:
+                            break
+                finally:
+                    # Closes the HTTP response, which stops the server generating further tokens
+                    await stream.aclose()
+                self.limiter.record_success(time.monotonic() - start)
+                self._record_request("ok", time.monotonic() - start, output_chars=len(checker.text))
+                return checker.text
+            except RETRYABLE_ERRORS as e:
+                self._record_request("throttled" if isinstance(e, cohere.TooManyRequestsError) else "error", time.monotonic() - start)
+                self._record_retry(e)
+                if isinstance(e, cohere.TooManyRequestsError):
+                    self.limiter.record_throttle()
+                if attempt == COHERE_MAX_RETRIES:
+                    raise
+                delay = _retry_after(e) or backoff_delay(attempt, COHERE_BACKOFF_BASE, COHERE_BACKOFF_CAP)
+                logger.warning(f"Retryable error while streaming contract (attempt {attempt + 1}), retrying in {delay:.1f}s: {e}")
+            finally:
+                await self.limiter.release()
+            await asyncio.sleep(delay)
+
+    async def agenerate_contract_batch(self, specs: Sequence[Tuple[str, List[str]]]) -> List[Optional[str]]:
+        """
+        Generates one contract per (complexity, vulnerabilities) spec with a
+        single request, so the base prompt is sent once for all of them.
+        max_tokens scales with the number and complexity of the contracts. Any
+        contract missing from the parsed output (or all of them, if the request
+        fails) is generated on its own instead. Results are in spec order.
+        """
+        if len(specs) == 1:
+            return [await self.agenerate_contract(*specs[0])]
+        try:
+            prompt = self._build_batch_prompt(specs)
+            text = await self._arequest(self._generate_kwargs(prompt, max_tokens=self._batch_max_tokens(specs)))
+            contracts = split_batch_output(text, len(specs))
+        except Exception as e:
+            logger.error(f"An error occurred while generating a batch of {len(specs)} contracts: {e}")
+            contracts = {}
+
+        missing = [i for i in range(len(specs)) if i not in contracts]
+        if missing:
+            logger.warning(f"Batch generation returned {len(contracts)} of {len(specs)} contracts, generating the rest one by one")
+            fallback = await asyncio.gather(*(self.agenerate_contract(*specs[i]) for i in missing))
+            contracts.update(zip(missing, fallback))
+        return [contracts[i] for i in range(len(specs))]
+
+    async def arepair_contract(self, contract_code: str, problem: str, diagnostics: str, vulnerabilities) -> Optional[str]:
+        """
+        Asks for a fixed version of a generated contract. `problem` completes the
+        sentence "The Solidity contract below ..." (e.g. "fails to compile with
+        these solc errors:") and `diagnostics` is the solc or Slither output.
+        Returns None when the request ultimately fails.
+        """
+        try:
+            prompt = self._build_repair_prompt(contract_code, problem, diagnostics, vulnerabilities)
+            return await self._arequest(self._generate_kwargs(prompt, temperature=REPAIR_TEMPERATURE))
+        except Exception as e:
+            logger.error(f"An error occurred while repairing contract: {e}")
+            return None
+
+    async def agenerate_contracts(self, jobs: Sequence[Tuple[str, List[str]]]) -> List[Optional[str]]:
+        """
+        Generates a contract for each (complexity, vulnerabilities) job concurrently.
+        Results are returned in job order, with None for jobs that failed.
+        """
+        return await asyncio.gather(*(
+            self.agenerate_contract(complexity, vulnerabilities) for complexity, vulnerabilities in jobs
+        ))
+
+    async def _agenerate_with_retries(self, kwargs: dict) -> str:
+        for attempt in range(COHERE_MAX_RETRIES + 1):
+            await self.limiter.acquire()
+            start = time.monotonic()
+            try:
+                response = await self.async_client.generate(**kwargs)
+                self.limiter.record_success(time.monotonic() - start)
+                self._record_request("ok", time.monotonic() - start, **self._billed_tokens(response))
+                return response.generations[0].text
+            except RETRYABLE_ERRORS as e:
+                self._record_request("throttled" if isinstance(e, cohere.TooManyRequestsError) else "error", time.monotonic() - start)
+                self._record_retry(e)
+                if isinstance(e, cohere.TooManyRequestsError):
+                    self.limiter.record_throttle()
+                if attempt == COHERE_MAX_RETRIES:
+                    raise
+                delay = _retry_after(e) or backoff_delay(attempt, COHERE_BACKOFF_BASE, COHERE_BACKOFF_CAP)
+                logger.warning(f"Retryable error while generating contract (attempt {attempt + 1}), retrying in {delay:.1f}s: {e}")
+            finally:
+                await self.limiter.release()
+            await asyncio.sleep(delay)
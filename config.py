@@ -6,7 +6,92 @@ import os
 OUTPUT_DIR = 'save_directory'
 GENERATED_CONTRACT_DIR = os.path.join(OUTPUT_DIR, 'contracts')
 GENERATED_REPORT_DIR = os.path.join(OUTPUT_DIR, 'reports')
+SAVE_DIRECTORY = 'saved_contracts'  # Default save_directory of the save tools
+# Dataset root: contracts/, reports/, ids and manifest of saved contracts, and the stores that refer to them
+DATASET_ROOT = os.path.join(SAVE_DIRECTORY, OUTPUT_DIR)
 
 # Validation Tools
-SOLC_PATH = 'solc'  # Ensure solc is installed and in PATH
-SLITHER_PATH = 'slither'  # Ensure Slither is installed and in PATH
+SOLC_PATH = os.getenv('SOLC_PATH', 'solc')  # Ensure solc is installed and in PATH
+SLITHER_PATH = os.getenv('SLITHER_PATH', 'slither')  # Ensure Slither is installed and in PATH
+
+# Pipeline Concurrency Limits
+PIPELINE_GENERATE_WORKERS = 4  # Concurrent Cohere generation calls
+PIPELINE_COMPILE_WORKERS = 2  # solc worker processes
+PIPELINE_ANALYZE_WORKERS = max(1, (os.cpu_count() or 2) - 1)  # Slither worker processes
+PIPELINE_QUEUE_SIZE = 8  # Max contracts buffered between two stages
+
+# Cohere API
+COHERE_MODEL = 'command-r-plus-08-2024'
+COHERE_BASE_URL = os.getenv('COHERE_BASE_URL')  # None uses the SDK default; set to point at a local stand-in
+COHERE_REQUESTS_PER_MINUTE = 500  # Upper bound; the adaptive limiter backs off on 429s
+COHERE_MAX_CONCURRENCY = PIPELINE_GENERATE_WORKERS
+COHERE_LATENCY_TARGET = 30.0  # Seconds; slower responses shrink concurrency
+COHERE_MAX_RETRIES = 5
+COHERE_BACKOFF_BASE = 1.0  # Seconds
+COHERE_BACKOFF_CAP = 60.0  # Seconds
+GENERATE_MAX_TOKENS = 1250  # Output budget of a single-contract generation
+GENERATE_TOKENS_PER_COMPLEXITY = {'low': 900, 'medium': 1250, 'high': 1600}  # Per contract in batch generations
+COHERE_MAX_OUTPUT_TOKENS = 4000  # Model limit; caps batch generations
+
+# Tool Result Cache
+TOOL_CACHE_DIR = os.path.join(DATASET_ROOT, '.tool_cache')
+TOOL_CACHE_MAX_BYTES = 512 * 1024 * 1024
+TOOL_CACHE_DISABLE_ENV = 'TOOL_CACHE_DISABLED'  # Set to any value to bypass the cache
+
+# Vulnerability Verification
+# 'any': keep contracts where at least one requested detector fires; 'all': require every one; 'off': no targeted pass
+PIPELINE_VERIFY_POLICY = 'any'
+
+# Structured Findings Store
+FINDINGS_DB_PATH = os.path.join(DATASET_ROOT, 'findings.sqlite')
+
+# Coverage-Guided Sampling
+SAMPLER_DEFAULT_TARGET = 100  # Confirmed findings wanted per detector
+SAMPLER_MIN_WEIGHT = 0.05  # Keeps covered detectors and complexities selectable
+
+# Dataset Manifest
+MANIFEST_FILENAME = 'manifest.jsonl'  # Append-only record per saved contract, in the dataset root
+ID_COUNTER_FILENAME = '.next_id'  # Atomic sequential id counter, in the dataset root
+
+# Sharded Output Format
+PIPELINE_OUTPUT_FORMAT = 'files'  # 'files': one .sol and one report per contract; 'shards': packed shard files
+SHARD_DIRNAME = 'shards'  # Inside the dataset root
+SHARD_MAX_BYTES = 256 * 1024 * 1024
+SHARD_SYNC_EVERY = 64  # Records between fsyncs of shard data and index
+
+# Near-Duplicate Detection
+PIPELINE_DEDUP_THRESHOLD = 0.85  # Estimated Jaccard similarity of normalized shingles; 0 disables dedup
+DEDUP_NUM_PERM = 128  # MinHash signature length
+DEDUP_SHINGLE_SIZE = 5  # Tokens per shingle
+DEDUP_INDEX_FILENAME = 'dedup_index.jsonl'  # Persisted signatures, in the dataset root
+
+# Pre-Compile Sanity Filter
+PIPELINE_PREFLIGHT = True  # Extract code from model output and reject broken/truncated sources before solc
+
+# Compiler-Feedback Repair
+PIPELINE_REPAIR_ATTEMPTS = 3  # Fix-up requests per contract after a failed compile (0 disables repair)
+PIPELINE_REPAIR_VERIFY = False  # Also request fixes when Slither misses requested vulnerabilities
+REPAIR_TEMPERATURE = 0.2
+REPAIR_MAX_DIAGNOSTIC_CHARS = 2000  # solc/Slither output sent back with a repair request
+
+# Multi-Contract Generation
+PIPELINE_CONTRACTS_PER_CALL = 1  # Contracts requested per Cohere call; >1 sends the base prompt once for several
+
+# Streaming Generation
+PIPELINE_STREAM = False  # Stream generations and hand them off as soon as the contract is complete
+STREAM_ABORT_CHARS = 1500  # Abort a stream with no contract declaration after this many characters
+
+# LLM Response Cache
+LLM_CACHE_MODE = 'passthrough'  # 'record' stores every response, 'replay' serves only stored ones (no network)
+LLM_CACHE_PATH = os.path.join(DATASET_ROOT, 'llm_cache.sqlite')
+LLM_CACHE_MAX_BYTES = 1024 * 1024 * 1024
+
+# Job Journal
+JOURNAL_PATH = os.path.join(DATASET_ROOT, 'journal.sqlite')  # Write-ahead record of every job's stage transitions
+
+# Distributed Mode
+DISTRIBUTED_QUEUE_PATH = os.path.join(DATASET_ROOT, 'job_queue.sqlite')  # Coordinator's queue when serving it over tcp://
+DISTRIBUTED_LEASE_SECONDS = 1800  # A leased job not finished by then is handed to another worker
+DISTRIBUTED_WINDOW = 64  # Jobs kept queued or leased ahead of results
+DISTRIBUTED_POLL_SECONDS = 1.0  # Idle wait of coordinators and workers between queue checks
+DISTRIBUTED_TOKEN = os.getenv('QUEUE_TOKEN')  # Shared secret of tcp:// queues; required to serve on a non-loopback address
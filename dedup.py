@@ -0,0 +1,172 @@
+# dedup.py
+
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+from config import DEDUP_NUM_PERM, DEDUP_SHINGLE_SIZE
+
+logger = logging.getLogger(__name__)
+
+_COMMENT = re.compile(r"//[^\n]*|/\*.*?\*/", re.S)
+_TOKEN = re.compile(r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'|[A-Za-z_$][A-Za-z0-9_$]*|0x[0-9A-Fa-f]+|\d[\d_]*(?:\.\d+)?(?:e\d+)?|\S')
+_ELEMENTARY_TYPE = re.compile(r"^(?:u?int\d*|bytes\d*|u?fixed[\dx]*)$")
+
+# Words kept as-is by the normalizer; every other identifier is renamed by order of first use
+_RESERVED = frozenset("""
+    pragma solidity import as from contract interface library abstract is using for struct enum event error
+    modifier function constructor fallback receive returns return public private internal external pure view
+    payable constant immutable override virtual memory storage calldata indexed anonymous unchecked emit
+    if else while do break continue new delete try catch revert require assert assembly let
+    address bool string bytes mapping true false this super type
+    msg sender value data sig tx origin gasprice block timestamp number coinbase difficulty prevrandao gaslimit
+    chainid basefee now gasleft blockhash selfdestruct keccak256 sha256 ripemd160 ecrecover abi encode
+    encodePacked encodeWithSelector encodeWithSignature encodeCall decode call delegatecall staticcall
+    send transfer balance code codehash length push pop wei gwei ether seconds minutes hours days weeks
+""".split())
+
+_MERSENNE_PRIME = (1 << 61) - 1
+
+
+def normalize_tokens(code: str) -> List[str]:
+    """
+    Tokens of a Solidity source with comments and whitespace removed and
+    user-defined identifiers renamed (id0, id1, ...) by first occurrence, so
+    renaming a variable or reformatting does not change the result.
+    """
+    names: Dict[str, str] = {}
+    tokens = []
+    for token in _TOKEN.findall(_COMMENT.sub(" ", code)):
+        if (token[0].isalpha() or token[0] in "_$") and token not in _RESERVED and not _ELEMENTARY_TYPE.match(token):
+            token = names.setdefault(token, f"id{len(names)}")
+        tokens.append(token)
+    return tokens
+
+
+def _lsh_shape(num_perm: int, threshold: float) -> Tuple[int, int]:
+    """Bands and rows per band whose LSH threshold (1/b)^(1/r) is closest to `threshold`."""
+    shapes = [(num_perm // rows, rows) for rows in range(1, num_perm + 1) if num_perm % rows == 0]
+    return min(shapes, key=lambda shape: abs((1 / shape[0]) ** (1 / shape[1]) - threshold))
+
+
+class NearDuplicateIndex:
+    """
+    MinHash/LSH index of generated contracts.
+
+    Sources are normalized (see normalize_tokens), split into token shingles and
+    MinHashed; the signature is cut into LSH bands so candidate duplicates are
+    found by bucket lookups instead of comparing against every contract. A
+    candidate counts as a duplicate when its estimated Jaccard similarity is at
+    least `threshold`.
+
+    Contracts are reserved while in flight (so two concurrent clones do not both
+    pass) and persisted to a JSONL file once saved; contracts dropped later in
+    the pipeline are discarded so they do not block future generations.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        threshold: float,
+        num_perm: int = DEDUP_NUM_PERM,
+        shingle_size: int = DEDUP_SHINGLE_SIZE,
+    ):
+        self.path = path
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.bands, self.rows = _lsh_shape(num_perm, threshold)
+
+        # Fixed seed: signatures must stay comparable with the persisted ones
+        rng = random.Random(1)
+        self._perms = [
+            (rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME)) for _ in range(num_perm)
+        ]
+        self.signatures: Dict[str, Tuple[int, ...]] = {}
+        self._buckets: Dict[Tuple[int, Tuple[int, ...]], Set[str]] = defaultdict(set)
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r') as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    record = json.loads(line)
+                    if len(record["signature"]) != self.num_perm:
+                        logger.warning(f"Skipping dedup record {record['id']} with a different signature size")
+                        continue
+                    self._insert(record["id"], tuple(record["signature"]))
+        except FileNotFoundError:
+            pass
+
+    def signature(self, code: str) -> Tuple[int, ...]:
+        tokens = normalize_tokens(code)
+        size = min(self.shingle_size, len(tokens)) or 1
+        shingles = {
+            int.from_bytes(hashlib.blake2b(" ".join(tokens[i:i + size]).encode(), digest_size=8).digest(), "big")
+            for i in range(max(len(tokens) - size + 1, 1))
+        }
+        return tuple(min((a * h + b) % _MERSENNE_PRIME for h in shingles) for a, b in self._perms)
+
+    def _bands(self, signature: Tuple[int, ...]):
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows]
+
+    def _insert(self, key: str, signature: Tuple[int, ...]):
+        self.signatures[key] = signature
+        for bucket in self._bands(signature):
+            self._buckets[bucket].add(key)
+
+    def _remove(self, key: str) -> Optional[Tuple[int, ...]]:
+        signature = self.signatures.pop(key, None)
+        if signature is not None:
+            for bucket in self._bands(signature):
+                self._buckets[bucket].discard(key)
+        return signature
+
+    def similarity(self, first: Tuple[int, ...], second: Tuple[int, ...]) -> float:
+        return sum(x == y for x, y in zip(first, second)) / self.num_perm
+
+    def find_duplicate(self, signature: Tuple[int, ...]) -> Optional[Tuple[str, float]]:
+        """Most similar indexed contract at or above the threshold, as (key, similarity)."""
+        candidates = set()
+        for bucket in self._bands(signature):
+            candidates.update(self._buckets.get(bucket, ()))
+        best = None
+        for key in candidates:
+            score = self.similarity(signature, self.signatures[key])
+            if score >= self.threshold and (best is None or score > best[1]):
+                best = (key, score)
+        return best
+
+    def reserve(self, key: str, signature: Tuple[int, ...]) -> Optional[Tuple[str, float]]:
+        """
+        Returns the near-duplicate of a contract signature if there is one;
+        otherwise indexes it as in flight under `key` and returns None.
+        """
+        duplicate = self.find_duplicate(signature)
+        if duplicate is None:
+            self._insert(key, signature)
+        return duplicate
+
+    def commit(self, key: str, record_id: str):
+        """Persists a reserved contract under its saved id."""
+        signature = self._remove(key)
+        if signature is None:
+            return
+        self._insert(record_id, signature)
+        with open(self.path, 'a') as f:
+            f.write(json.dumps({"id": record_id, "signature": list(signature)}) + "\n")
+
+    def discard(self, key: str):
+        """Drops a reserved contract that was not saved."""
+        self._remove(key)
@@ -0,0 +1,535 @@
+# distributed.py
+
+import hmac
+import ipaddress
+import json
+import logging
+import os
+import socket
+import socketserver
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+from utils import pprint
+from solidity_tools import save_contract_record, append_manifest_record, open_shard_writer, open_dedup_index
+from config import (
+    DISTRIBUTED_QUEUE_PATH, DISTRIBUTED_LEASE_SECONDS, DISTRIBUTED_WINDOW, DISTRIBUTED_POLL_SECONDS, DISTRIBUTED_TOKEN
+)
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    complexity TEXT NOT NULL,
+    vulnerabilities TEXT NOT NULL,
+    status TEXT NOT NULL,
+    worker TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    reason TEXT,
+    settled INTEGER NOT NULL DEFAULT 0,
+    contract_id TEXT,
+    updated_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, job_id);
+CREATE TABLE IF NOT EXISTS queue_state (
+    name TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# Job statuses: queued -> leased -> done | failed
+QUEUED, LEASED, DONE, FAILED = "queued", "leased", "done", "failed"
+
+
+def worker_name() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class SQLiteJobQueue:
+    """
+    Job queue in a SQLite file, usable by processes on several machines
+    through a shared volume (or by the coordinator behind a QueueServer).
+
+    The coordinator enqueues (complexity, vulnerabilities) jobs and `close`s
+    the queue once it has scheduled everything. Workers `lease` one job at a
+    time; a lease that is not completed within `lease_seconds` (the worker
+    died or was preempted) makes the job available to the next worker. Only
+    the first `complete` or `fail` of a job is accepted, so a job picked up
+    again after its lease expired is never recorded twice. Completed results
+    stay in the queue until the coordinator `collect`s and `settle`s them,
+    which is the only place contracts are saved and given ids.
+
+    A file shared between hosts uses SQLite's rollback journal, which only
+    needs the volume's file locks (NFS with working locking; not SMB). WAL
+    relies on shared memory of a single host, so it is only used with
+    `local=True`, for the coordinator's own queue behind a QueueServer.
+    """
+
+    def __init__(self, path: str = DISTRIBUTED_QUEUE_PATH, lease_seconds: float = DISTRIBUTED_LEASE_SECONDS,
+                 local: bool = False):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Autocommit; writes that read first take the write lock up front with BEGIN IMMEDIATE
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.execute(f"PRAGMA journal_mode={'WAL' if local else 'DELETE'}")
+        self.conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def close_connection(self):
+        self.conn.close()
+
+    def _write(self, statements: Callable[[], object]):
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = statements()
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+            return result
+
+    # -------------------------------
+    # Coordinator side
+    # -------------------------------
+
+    def enqueue(self, complexity: str, vulnerabilities: List[str]) -> int:
+        def insert():
+            return self.conn.execute(
+                "INSERT INTO jobs (complexity, vulnerabilities, status, updated_at) VALUES (?, ?, ?, ?)",
+                (complexity, json.dumps(vulnerabilities), QUEUED, time.time()),
+            ).lastrowid
+        return self._write(insert)
+
+    def close(self):
+        """Tells workers no more jobs are coming, so they stop once the queue is empty."""
+        self._write(lambda: self.conn.execute(
+            "INSERT OR REPLACE INTO queue_state (name, value) VALUES ('closed', '1')"
+        ))
+
+    def reopen(self):
+        self._write(lambda: self.conn.execute("DELETE FROM queue_state WHERE name = 'closed'"))
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+    def collect(self, limit: int = 100) -> List[dict]:
+        """Finished (done or failed) jobs the coordinator has not settled yet."""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT job_id, complexity, vulnerabilities, status, worker, result, reason FROM jobs "
+                "WHERE status IN (?, ?) AND settled = 0 ORDER BY job_id LIMIT ?",
+                (DONE, FAILED, limit),
+            ).fetchall()
+        return [
+            {
+                "job_id": job_id,
+                "complexity": complexity,
+                "vulnerabilities": json.loads(vulnerabilities),
+                "status": status,
+                "worker": worker,
+                "result": json.loads(result) if result else None,
+                "reason": reason,
+            }
+            for job_id, complexity, vulnerabilities, status, worker, result, reason in rows
+        ]
+
+    def unsettled(self) -> List[dict]:
+        """Jobs not settled yet (queued, leased or finished), such as those left by an earlier coordinator."""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT job_id, complexity, vulnerabilities FROM jobs WHERE settled = 0 ORDER BY job_id"
+            ).fetchall()
+        return [
+            {"job_id": job_id, "complexity": complexity, "vulnerabilities": json.loads(vulnerabilities)}
+            for job_id, complexity, vulnerabilities in rows
+        ]
+
+    def settle(self, job_id: int, contract_id: Optional[str] = None, reason: Optional[str] = None):
+        """Marks a collected job as handled; drops its result payload, which now lives in the dataset."""
+        def update():
+            self.conn.execute(
+                "UPDATE jobs SET settled = 1, result = NULL, contract_id = ?, reason = COALESCE(?, reason), "
+                "updated_at = ? WHERE job_id = ?",
+                (contract_id, reason, time.time(), job_id),
+            )
+        self._write(update)
+
+    # -------------------------------
+    # Worker side
+    # -------------------------------
+
+    def lease(self, worker: str) -> Optional[dict]:
+        """Takes the oldest queued (or lease-expired) job, or returns None when none is available."""
+        def take():
+            now = time.time()
+            row = self.conn.execute(
+                "SELECT job_id, complexity, vulnerabilities FROM jobs "
+                "WHERE status = ? OR (status = ? AND lease_expires < ?) ORDER BY job_id LIMIT 1",
+                (QUEUED, LEASED, now),
+            ).fetchone()
+            if row is None:
+                return None
+            self.conn.execute(
+                "UPDATE jobs SET status = ?, worker = ?, lease_expires = ?, attempts = attempts + 1, updated_at = ? "
+                "WHERE job_id = ?",
+                (LEASED, worker, now + self.lease_seconds, now, row[0]),
+            )
+            return {"job_id": row[0], "complexity": row[1], "vulnerabilities": json.loads(row[2])}
+        return self._write(take)
+
+    def finished(self) -> bool:
+        """True once the queue is closed and every job has been completed or failed."""
+        with self._lock:
+            closed = self.conn.execute("SELECT 1 FROM queue_state WHERE name = 'closed'").fetchone()
+            open_jobs = self.conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status IN (?, ?)", (QUEUED, LEASED)
+            ).fetchone()[0]
+        return closed is not None and open_jobs == 0
+
+    def _finish(self, job_id: int, worker: str, status: str, result: Optional[dict], reason: Optional[str]) -> bool:
+        def update():
+            return self.conn.execute(
+                "UPDATE jobs SET status = ?, worker = ?, result = ?, reason = ?, updated_at = ? "
+                "WHERE job_id = ? AND status = ?",
+                (status, worker, json.dumps(result) if result is not None else None, reason, time.time(), job_id, LEASED),
+            ).rowcount
+        accepted = self._write(update) == 1
+        if not accepted:
+            logger.info(f"Ignoring a second result for job {job_id} from {worker}")
+        return accepted
+
+    def complete(self, job_id: int, worker: str, result: dict) -> bool:
+        return self._finish(job_id, worker, DONE, result, None)
+
+    def fail(self, job_id: int, worker: str, reason: str) -> bool:
+        return self._finish(job_id, worker, FAILED, None, reason)
+
+
+# Operations a worker may call on a queue served over TCP
+_WORKER_OPS = ("lease", "finished", "complete", "fail")
+
+# Report file suffix by the report format a worker sends; the coordinator never takes a path part from a worker
+REPORT_SUFFIXES = {"json": "_slither.json", "text": "_slither_report.txt"}
+
+
+def _is_loopback(host: str) -> bool:
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+class QueueServer(socketserver.ThreadingTCPServer):
+    """
+    Serves the worker side of a queue over TCP, one JSON object per line:
+    {"op": "lease", "args": [...], "token": ...} -> {"ok": true, "result": ...}.
+
+    With a shared `token`, requests without it are refused. There is no
+    other authentication, so a server without a token only binds to a
+    loopback address.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, queue: SQLiteJobQueue, host: str, port: int, token: Optional[str] = DISTRIBUTED_TOKEN):
+        if not token and not _is_loopback(host):
+            raise ValueError(f"Serving the job queue on {host} needs a shared token (set QUEUE_TOKEN on coordinator and workers)")
+        self.queue = queue
+        self.token = token
+        super().__init__((host, port), _QueueRequestHandler)
+
+    def serve_in_background(self) -> threading.Thread:
+        thread = threading.Thread(target=self.serve_forever, name="queue-server", daemon=True)
+        thread.start()
+        return thread
+
+
+class _QueueRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                token = self.server.token
+                if token and not hmac.compare_digest(str(request.get("token", "")).encode(), token.encode()):
+                    raise PermissionError("invalid queue token")
+                if request.get("op") not in _WORKER_OPS:
+                    raise ValueError(f"Unknown queue operation {request.get('op')!r}")
+                response = {"ok": True, "result": getattr(self.server.queue, request["op"])(*request.get("args", []))}
+            except Exception as e:
+                logger.error(f"Queue request from {self.client_address[0]} failed: {e}")
+                response = {"ok": False, "error": str(e)}
+            self.wfile.write((json.dumps(response) + "\n").encode())
+            self.wfile.flush()
+
+
+class TCPJobQueue:
+    """Worker-side client of a QueueServer; reconnects once when the connection drops."""
+
+    def __init__(self, host: str, port: int, timeout: float = 60.0, token: Optional[str] = DISTRIBUTED_TOKEN):
+        self.address = (host, port)
+        self.timeout = timeout
+        self.token = token
+        self._lock = threading.Lock()
+        self._sock = None
+        self._file = None
+
+    def _connect(self):
+        self._sock = socket.create_connection(self.address, timeout=self.timeout)
+        self._file = self._sock.makefile("rwb")
+
+    def _call(self, op: str, *args):
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    if self._file is None:
+                        self._connect()
+                    self._file.write((json.dumps({"op": op, "args": list(args), "token": self.token}) + "\n").encode())
+                    self._file.flush()
+                    line = self._file.readline()
+                    if not line:
+                        raise ConnectionError("queue server closed the connection")
+                    break
+                except OSError:
+                    self.close_connection()
+                    if attempt:
+                        raise
+        response = json.loads(line)
+        if not response["ok"]:
+            raise RuntimeError(f"Queue {op} failed: {response['error']}")
+        return response["result"]
+
+    def close_connection(self):
+        if self._sock is not None:
+            self._file.close()
+            self._sock.close()
+        self._sock = self._file = None
+
+    def lease(self, worker: str) -> Optional[dict]:
+        return self._call("lease", worker)
+
+    def finished(self) -> bool:
+        return self._call("finished")
+
+    def complete(self, job_id: int, worker: str, result: dict) -> bool:
+        return self._call("complete", job_id, worker, result)
+
+    def fail(self, job_id: int, worker: str, reason: str) -> bool:
+        return self._call("fail", job_id, worker, reason)
+
+
+def parse_queue_url(url: str) -> Tuple[str, str]:
+    """Splits 'sqlite:///path' / 'tcp://host:port' (a bare path means sqlite) into (scheme, location)."""
+    parsed = urlparse(url)
+    if parsed.scheme in ("", "sqlite"):
+        return "sqlite", (parsed.netloc + parsed.path) if parsed.scheme else url
+    if parsed.scheme == "tcp":
+        if not parsed.hostname or not parsed.port:
+            raise ValueError(f"TCP queue URL needs a host and port: {url}")
+        return "tcp", f"{parsed.hostname}:{parsed.port}"
+    raise ValueError(f"Unsupported queue URL {url!r}; use sqlite:///path or tcp://host:port")
+
+
+def open_worker_queue(url: str):
+    """Queue handle for a worker: the shared SQLite file, or a TCP client of the coordinator."""
+    scheme, location = parse_queue_url(url)
+    if scheme == "sqlite":
+        return SQLiteJobQueue(location)
+    host, port = location.rsplit(":", 1)
+    return TCPJobQueue(host, int(port))
+
+
+def open_coordinator_queue(url: str, path: str = DISTRIBUTED_QUEUE_PATH) -> Tuple[SQLiteJobQueue, Optional[QueueServer]]:
+    """
+    Queue for the coordinator. For tcp:// URLs the jobs live in a local SQLite
+    file at `path` and a QueueServer bound to the URL's address serves them.
+    """
+    scheme, location = parse_queue_url(url)
+    if scheme == "sqlite":
+        return SQLiteJobQueue(location), None
+    queue = SQLiteJobQueue(path, local=True)
+    host, port = location.rsplit(":", 1)
+    server = QueueServer(queue, host, int(port))
+    server.serve_in_background()
+    pprint(f"Serving the job queue on {host}:{port}")
+    return queue, server
+
+
+class ResultWriter:
+    """
+    Saves worker results into the coordinator's dataset (files or shards,
+    manifest, findings store), dropping near-duplicates of saved contracts.
+    The queue drops a result once it is settled, so each shard record is
+    synced before it is published and its job settled.
+    """
+
+    def __init__(self, findings_store=None, output_format: str = "files", dedup_threshold: float = 0.0):
+        self.findings_store = findings_store
+        self.shard_writer = open_shard_writer() if output_format == "shards" else None
+        self.dedup_index = open_dedup_index(dedup_threshold) if dedup_threshold > 0 else None
+
+    def close(self):
+        if self.shard_writer is not None:
+            self.shard_writer.close()
+
+    def __call__(self, entry: dict) -> Optional[str]:
+        result = entry["result"]
+        key = f"job-{entry['job_id']}"
+        if self.dedup_index is not None:
+            duplicate = self.dedup_index.reserve(key, self.dedup_index.signature(result["contract_code"]))
+            if duplicate is not None:
+                logger.error(f"Job {entry['job_id']} is a near-duplicate of {duplicate[0]} (similarity {duplicate[1]:.2f}), skipping.")
+                return None
+        try:
+            report_suffix = REPORT_SUFFIXES.get(result.get("report_format"))
+            if report_suffix is None:
+                raise ValueError(f"Unknown report format {result.get('report_format')!r}")
+            record = save_contract_record(
+                result["contract_code"],
+                result["slither_result"],
+                report_suffix=report_suffix,
+                params={"complexity": entry["complexity"], "vulnerabilities": entry["vulnerabilities"],
+                        "confirmed": result["confirmed"], "missing": result["missing"], "repairs": result["repairs"],
+                        "worker": entry["worker"]},
+                timings=result["timings"],
+                shard_writer=self.shard_writer,
+                labels=[entry["complexity"], *result["confirmed"]],
+                append_manifest=self.shard_writer is None,
+            )
+            if self.shard_writer is not None:
+                self.shard_writer.sync()
+                append_manifest_record(record)
+        except Exception:
+            if self.dedup_index is not None:
+                self.dedup_index.discard(key)
+            raise
+        if self.findings_store is not None:
+            self.findings_store.add_contract(
+                record["id"], entry["complexity"], entry["vulnerabilities"], result["findings"],
+                record["contract_path"], record["report_path"],
+            )
+        if self.dedup_index is not None:
+            self.dedup_index.commit(key, record["id"])
+        return record["id"]
+
+
+class Coordinator:
+    """
+    Schedules jobs for remote workers and saves what they send back.
+
+    Parameters are picked like in the single-process pipeline (the coverage
+    sampler when given, `select_params` otherwise), but only `window` jobs
+    are kept queued or leased ahead of results, so sampling keeps reacting
+    to what has been saved. Results are written by `save_result` (the dataset
+    files, manifest and findings store) in this one process, so ids are
+    allocated once no matter how many workers run. Near-duplicates of saved
+    contracts are dropped here, across all workers.
+    """
+
+    def __init__(
+        self,
+        queue: SQLiteJobQueue,
+        select_params: Callable[[], Tuple[Optional[str], Optional[List[str]]]],
+        save_result: Callable[[dict], Optional[str]],
+        sampler=None,
+        stop_at_coverage: bool = False,
+        window: int = DISTRIBUTED_WINDOW,
+        poll_seconds: float = DISTRIBUTED_POLL_SECONDS,
+    ):
+        self.queue = queue
+        self.select_params = select_params
+        self.save_result = save_result
+        self.sampler = sampler
+        self.stop_at_coverage = stop_at_coverage
+        self.window = max(1, window)
+        self.poll_seconds = poll_seconds
+        self.saved: List[str] = []
+        self.failed = 0
+
+    def _outstanding(self) -> int:
+        counts = self.queue.counts()
+        return counts.get(QUEUED, 0) + counts.get(LEASED, 0)
+
+    def _schedule(self, scheduled: int, num_contracts: int) -> Tuple[int, bool]:
+        """Tops the queue up to the window; returns the new scheduled count and whether scheduling is over."""
+        room = self.window - self._outstanding()
+        while room > 0 and scheduled < num_contracts:
+            if self.sampler is not None and self.stop_at_coverage and self.sampler.coverage_reached():
+                pprint(f"Coverage target reached after {scheduled} jobs, not scheduling more")
+                return scheduled, True
+            scheduled += 1
+            if self.sampler is not None:
+                complexity, vulnerabilities = self.sampler.sample()
+            else:
+                complexity, vulnerabilities = self.select_params()
+            if complexity is None:
+                continue
+            self.queue.enqueue(complexity, vulnerabilities)
+            room -= 1
+        return scheduled, scheduled >= num_contracts
+
+    def _settle(self, entry: dict):
+        if entry["status"] == DONE:
+            try:
+                contract_id = self.save_result(entry)
+            except Exception as e:
+                logger.error(f"Error saving the result of job {entry['job_id']}: {e}")
+                contract_id = None
+            if contract_id is not None:
+                self.saved.append(contract_id)
+                if self.sampler is not None:
+                    self.sampler.record(entry["complexity"], entry["vulnerabilities"], entry["result"]["confirmed"])
+                self.queue.settle(entry["job_id"], contract_id=contract_id)
+                pprint(f"Job {entry['job_id']} from {entry['worker']} saved as contract {contract_id}")
+                return
+            reason = "not saved by the coordinator"
+        else:
+            reason = None
+            logger.error(f"Job {entry['job_id']} failed on {entry['worker']}: {entry['reason']}")
+        self.failed += 1
+        if self.sampler is not None:
+            self.sampler.release(entry["vulnerabilities"])
+        self.queue.settle(entry["job_id"], reason=reason)
+
+    def run(self, num_contracts: int) -> List[str]:
+        """Schedules num_contracts jobs and saves their results; returns the saved contract ids."""
+        if num_contracts is None:
+            raise ValueError("The coordinator needs a number of contracts to schedule")
+        self.queue.reopen()
+        if self.sampler is not None:
+            # Jobs left on the queue by an earlier coordinator are settled here too; count them as in
+            # flight so settling them balances the sampler's reservations
+            leftover = self.queue.unsettled()
+            for job in leftover:
+                self.sampler.reserve(job["vulnerabilities"])
+            if leftover:
+                pprint(f"Picking up {len(leftover)} unsettled jobs from an earlier coordinator")
+        scheduled, done_scheduling = 0, False
+        while True:
+            if not done_scheduling:
+                scheduled, done_scheduling = self._schedule(scheduled, num_contracts)
+                if done_scheduling:
+                    self.queue.close()
+            # Checked before collecting, so nothing finished before the check can be left unsettled
+            finished = done_scheduling and self.queue.finished()
+            entries = self.queue.collect()
+            for entry in entries:
+                self._settle(entry)
+            if finished and not entries:
+                break
+            if not entries:
+                time.sleep(self.poll_seconds)
+        pprint(f"Coordinator finished: {len(self.saved)} saved, {self.failed} failed out of {scheduled} scheduled")
+        return self.saved
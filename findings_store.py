@@ -0,0 +1,189 @@
+# findings_store.py
+
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import time
+from typing import Dict, List, Optional
+from config import FINDINGS_DB_PATH
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS contracts (
+    contract_id TEXT PRIMARY KEY,
+    complexity TEXT,
+    requested TEXT,
+    contract_path TEXT,
+    report_path TEXT,
+    created_at REAL
+);
+CREATE TABLE IF NOT EXISTS findings (
+    id INTEGER PRIMARY KEY,
+    contract_id TEXT NOT NULL REFERENCES contracts(contract_id),
+    detector TEXT NOT NULL,
+    impact TEXT,
+    confidence TEXT,
+    confirmed INTEGER NOT NULL,
+    lines TEXT,
+    description TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_findings_detector_impact ON findings(detector, impact, confirmed);
+CREATE INDEX IF NOT EXISTS idx_findings_impact ON findings(impact, confirmed);
+CREATE INDEX IF NOT EXISTS idx_findings_contract ON findings(contract_id);
+"""
+
+
+class FindingsStore:
+    """
+    Append-only SQLite store of normalized Slither findings.
+
+    Each saved contract gets one `contracts` row and one `findings` row per
+    Slither result (see solidity_tools.normalize_findings). A finding is
+    `confirmed` when its detector was one of the vulnerabilities requested for
+    that contract. Findings are indexed by detector and impact, so questions
+    like "contracts with a confirmed high-impact reentrancy-eth" are index
+    lookups rather than report re-parsing.
+    """
+
+    def __init__(self, path: str = FINDINGS_DB_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(_SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def add_contract(
+        self,
+        contract_id: str,
+        complexity: Optional[str],
+        requested: List[str],
+        findings: List[dict],
+        contract_path: Optional[str] = None,
+        report_path: Optional[str] = None,
+    ):
+        """
+        Records a contract and its normalized findings in one transaction,
+        replacing an earlier record under the same id (from a dataset whose
+        ids were reset, or a save that is retried).
+        """
+        requested_set = set(requested or [])
+        with self.conn:
+            self.conn.execute("DELETE FROM findings WHERE contract_id = ?", (contract_id,))
+            self.conn.execute(
+                "INSERT OR REPLACE INTO contracts (contract_id, complexity, requested, contract_path, report_path, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (contract_id, complexity, json.dumps(requested or []), contract_path, report_path, time.time()),
+            )
+            self.conn.executemany(
+                "INSERT INTO findings (contract_id, detector, impact, confidence, confirmed, lines, description) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        contract_id,
+                        finding["detector"],
+                        finding.get("impact"),
+                        finding.get("confidence"),
+                        int(finding["detector"] in requested_set),
+                        json.dumps(finding.get("lines", [])),
+                        finding.get("description"),
+                    )
+                    for finding in findings
+                ],
+            )
+
+    @staticmethod
+    def _where(detector=None, impact=None, confidence=None, confirmed=None):
+        clauses, params = [], []
+        for column, value in (("detector", detector), ("impact", impact), ("confidence", confidence)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if confirmed is not None:
+            clauses.append("confirmed = ?")
+            params.append(int(confirmed))
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def query_contracts(
+        self,
+        detector: Optional[str] = None,
+        impact: Optional[str] = None,
+        confidence: Optional[str] = None,
+        confirmed: Optional[bool] = None,
+    ) -> List[str]:
+        """Returns the ids of contracts with at least one finding matching all given filters."""
+        where, params = self._where(detector, impact, confidence, confirmed)
+        rows = self.conn.execute(f"SELECT DISTINCT contract_id FROM findings{where} ORDER BY contract_id", params)
+        return [row[0] for row in rows]
+
+    def query_findings(
+        self,
+        detector: Optional[str] = None,
+        impact: Optional[str] = None,
+        confidence: Optional[str] = None,
+        confirmed: Optional[bool] = None,
+        limit: Optional[int] = None,
+    ) -> List[dict]:
+        """Returns the findings matching all given filters."""
+        where, params = self._where(detector, impact, confidence, confirmed)
+        sql = f"SELECT contract_id, detector, impact, confidence, confirmed, lines, description FROM findings{where} ORDER BY id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return [
+            {
+                "contract_id": row[0],
+                "detector": row[1],
+                "impact": row[2],
+                "confidence": row[3],
+                "confirmed": bool(row[4]),
+                "lines": json.loads(row[5] or "[]"),
+                "description": row[6],
+            }
+            for row in self.conn.execute(sql, params)
+        ]
+
+    def detector_counts(self, confirmed: Optional[bool] = None) -> Dict[str, int]:
+        """Number of distinct contracts per detector."""
+        where, params = self._where(confirmed=confirmed)
+        rows = self.conn.execute(
+            f"SELECT detector, COUNT(DISTINCT contract_id) FROM findings{where} GROUP BY detector", params
+        )
+        return dict(rows)
+
+    def complexity_counts(self, confirmed: Optional[bool] = None) -> Dict[str, int]:
+        """Number of contracts per complexity level; with confirmed=True only those with a confirmed finding."""
+        if confirmed:
+            rows = self.conn.execute(
+                "SELECT complexity, COUNT(*) FROM contracts WHERE contract_id IN "
+                "(SELECT contract_id FROM findings WHERE confirmed = 1) GROUP BY complexity"
+            )
+        else:
+            rows = self.conn.execute("SELECT complexity, COUNT(*) FROM contracts GROUP BY complexity")
+        return dict(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query the Slither findings store.")
+    parser.add_argument("--db", default=FINDINGS_DB_PATH, help="Path to the findings database.")
+    parser.add_argument("--detector", help="Slither detector name, e.g. reentrancy-eth.")
+    parser.add_argument("--impact", help="High, Medium, Low, Informational or Optimization.")
+    parser.add_argument("--confidence", help="High, Medium or Low.")
+    parser.add_argument("--confirmed", action="store_true", help="Only findings for requested vulnerabilities.")
+    parser.add_argument("--counts", action="store_true", help="Print contracts per detector instead of contract ids.")
+    args = parser.parse_args()
+
+    store = FindingsStore(args.db)
+    if args.counts:
+        for detector, count in sorted(store.detector_counts(confirmed=args.confirmed or None).items()):
+            print(f"{detector}\t{count}")
+    else:
+        for contract_id in store.query_contracts(args.detector, args.impact, args.confidence, args.confirmed or None):
+            print(contract_id)
@@ -0,0 +1,191 @@
+# journal.py
+
+import json
+import logging
+import os
+import sqlite3
+import time
+from typing import Dict, List, Optional
+from config import JOURNAL_PATH
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    num_contracts INTEGER NOT NULL,
+    started_at REAL,
+    resumed_at REAL
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    run_id INTEGER NOT NULL REFERENCES runs(run_id),
+    job_index INTEGER NOT NULL,
+    complexity TEXT,
+    vulnerabilities TEXT,
+    stage TEXT NOT NULL,
+    status TEXT NOT NULL,
+    contract_code TEXT,
+    repairs TEXT,
+    contract_id TEXT,
+    updated_at REAL,
+    PRIMARY KEY (run_id, job_index)
+);
+CREATE TABLE IF NOT EXISTS transitions (
+    id INTEGER PRIMARY KEY,
+    run_id INTEGER NOT NULL,
+    job_index INTEGER NOT NULL,
+    stage TEXT NOT NULL,
+    status TEXT NOT NULL,
+    at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(run_id, status);
+"""
+
+# Job statuses; 'pending' jobs are the ones a resumed run picks up again
+PENDING, SAVED, FAILED = "pending", "saved", "failed"
+
+
+class JobJournal:
+    """
+    Write-ahead SQLite journal of pipeline jobs.
+
+    A job is recorded with its parameters before it is queued, and every
+    stage it completes is recorded before it moves on: the `jobs` row holds
+    its latest stage, status and source (the generated, preflighted or
+    repaired code, plus the repair attempts used so far), and `transitions`
+    keeps the full history. SQLite in WAL mode commits each transition, so a
+    killed or preempted process loses at most the stage that was running.
+
+    `start(resume=True)` continues the latest run: its pending jobs are
+    returned by `pending_jobs` so the pipeline can requeue them, reusing the
+    journaled source instead of generating it again, and new jobs are
+    numbered after the last journaled one. Stages after generation are
+    rerun, which is cheap for solc and Slither thanks to the tool cache.
+    A crash during the save stage itself can still save that contract twice.
+    """
+
+    def __init__(self, path: str = JOURNAL_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        # With WAL, NORMAL still survives a crash of the process; only an OS crash can lose the last commits
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+        self.run_id: Optional[int] = None
+        self.num_contracts = 0
+
+    def close(self):
+        self.conn.close()
+
+    def start(self, num_contracts: Optional[int], resume: bool = False) -> int:
+        """
+        Starts a new run, or with resume continues the latest one; returns its id.
+        A resumed run keeps its recorded num_contracts unless a new one is given
+        (None starts a new run with one contract).
+        """
+        latest = self.conn.execute(
+            "SELECT run_id, num_contracts FROM runs ORDER BY run_id DESC LIMIT 1"
+        ).fetchone()
+        with self.conn:
+            if resume and latest is not None:
+                self.run_id = latest[0]
+                if num_contracts is None:
+                    num_contracts = latest[1]
+                self.conn.execute(
+                    "UPDATE runs SET num_contracts = ?, resumed_at = ? WHERE run_id = ?",
+                    (num_contracts, time.time(), self.run_id),
+                )
+            else:
+                if num_contracts is None:
+                    num_contracts = 1
+                if latest is not None:
+                    unfinished = self._count(latest[0], PENDING)
+                    if unfinished:
+                        logger.warning(f"Run {latest[0]} left {unfinished} unfinished jobs; use --resume to continue them")
+                cursor = self.conn.execute(
+                    "INSERT INTO runs (num_contracts, started_at) VALUES (?, ?)", (num_contracts, time.time())
+                )
+                self.run_id = cursor.lastrowid
+        self.num_contracts = num_contracts
+        return self.run_id
+
+    def _count(self, run_id: int, status: Optional[str] = None) -> int:
+        if status is None:
+            return self.conn.execute("SELECT COUNT(*) FROM jobs WHERE run_id = ?", (run_id,)).fetchone()[0]
+        return self.conn.execute(
+            "SELECT COUNT(*) FROM jobs WHERE run_id = ? AND status = ?", (run_id, status)
+        ).fetchone()[0]
+
+    def next_index(self) -> int:
+        """Index for the next new job of the run (job indices are 1-based)."""
+        row = self.conn.execute("SELECT MAX(job_index) FROM jobs WHERE run_id = ?", (self.run_id,)).fetchone()
+        return (row[0] or 0) + 1
+
+    def pending_jobs(self) -> List[dict]:
+        """Jobs of the run that were scheduled but neither saved nor dropped, in index order."""
+        rows = self.conn.execute(
+            "SELECT job_index, complexity, vulnerabilities, stage, contract_code, repairs FROM jobs "
+            "WHERE run_id = ? AND status = ? ORDER BY job_index",
+            (self.run_id, PENDING),
+        ).fetchall()
+        return [
+            {
+                "index": index,
+                "complexity": complexity,
+                "vulnerabilities": json.loads(vulnerabilities),
+                "stage": stage,
+                "contract_code": contract_code,
+                "repairs": json.loads(repairs) if repairs else [],
+            }
+            for index, complexity, vulnerabilities, stage, contract_code, repairs in rows
+        ]
+
+    def _transition(self, index: int, stage: str, status: str, now: float):
+        self.conn.execute(
+            "INSERT INTO transitions (run_id, job_index, stage, status, at) VALUES (?, ?, ?, ?, ?)",
+            (self.run_id, index, stage, status, now),
+        )
+
+    def schedule(self, index: int, complexity: Optional[str], vulnerabilities: Optional[List[str]]):
+        """Records a job and its parameters before it is queued."""
+        now = time.time()
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO jobs (run_id, job_index, complexity, vulnerabilities, stage, status, updated_at) "
+                "VALUES (?, ?, ?, ?, 'scheduled', ?, ?)",
+                (self.run_id, index, complexity, json.dumps(vulnerabilities), PENDING, now),
+            )
+            self._transition(index, "scheduled", PENDING, now)
+
+    def advance(self, index: int, stage: str, contract_code: Optional[str], repairs: List[dict]):
+        """Records that a job completed `stage`, with its source as that stage left it."""
+        now = time.time()
+        with self.conn:
+            self.conn.execute(
+                "UPDATE jobs SET stage = ?, contract_code = ?, repairs = ?, updated_at = ? "
+                "WHERE run_id = ? AND job_index = ?",
+                (stage, contract_code, json.dumps(repairs), now, self.run_id, index),
+            )
+            self._transition(index, stage, PENDING, now)
+
+    def finish(self, index: int, stage: str, saved: bool, contract_id: Optional[str] = None):
+        """Marks a job saved (after the save stage) or failed (dropped at `stage`)."""
+        status = SAVED if saved else FAILED
+        now = time.time()
+        with self.conn:
+            self.conn.execute(
+                "UPDATE jobs SET stage = ?, status = ?, contract_id = ?, updated_at = ? "
+                "WHERE run_id = ? AND job_index = ?",
+                (stage, status, contract_id, now, self.run_id, index),
+            )
+            self._transition(index, stage, status, now)
+
+    def summary(self) -> Dict[str, int]:
+        """Job counts of the run by status."""
+        rows = self.conn.execute(
+            "SELECT status, COUNT(*) FROM jobs WHERE run_id = ? GROUP BY status", (self.run_id,)
+        ).fetchall()
+        return dict(rows)
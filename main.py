@@ -1,18 +1,33 @@
 import os
 import re
 import random
+import logging
 import argparse
-from rich.logging import RichHandler
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.messages import SystemMessage
-from langchain_cohere import ChatCohere, create_cohere_react_agent
-from langchain.agents import AgentExecutor
-from cohere_api import CohereAPI
-from solidity_tools import *
-from storage import ContractStorage
-from rich.pretty import pprint
-from utils import load_preamble_from_file, get_params
-from config import GENERATED_CONTRACT_DIR, GENERATED_REPORT_DIR
+from functools import partial
+import cProfile
+import pstats
+from utils import load_preamble_from_file, get_params, pprint
+from pipeline import ContractPipeline
+from findings_store import FindingsStore
+from sampler import CoverageSampler
+from rate_limit import AdaptiveRateLimiter
+from response_cache import ResponseCache, CACHE_MODES
+from metrics import MetricsRegistry
+from journal import JobJournal
+from distributed import Coordinator, ResultWriter, open_coordinator_queue, open_worker_queue, worker_name
+from config import (
+    GENERATED_CONTRACT_DIR, GENERATED_REPORT_DIR,
+    PIPELINE_GENERATE_WORKERS, PIPELINE_COMPILE_WORKERS,
+    PIPELINE_ANALYZE_WORKERS, PIPELINE_QUEUE_SIZE,
+    COHERE_MODEL, COHERE_REQUESTS_PER_MINUTE, COHERE_LATENCY_TARGET,
+    TOOL_CACHE_DISABLE_ENV, PIPELINE_VERIFY_POLICY, FINDINGS_DB_PATH,
+    SAMPLER_DEFAULT_TARGET, PIPELINE_OUTPUT_FORMAT, PIPELINE_DEDUP_THRESHOLD,
+    PIPELINE_PREFLIGHT, PIPELINE_REPAIR_ATTEMPTS, PIPELINE_REPAIR_VERIFY,
+    PIPELINE_CONTRACTS_PER_CALL, PIPELINE_STREAM, LLM_CACHE_MODE, LLM_CACHE_PATH, JOURNAL_PATH,
+    DISTRIBUTED_QUEUE_PATH, DISTRIBUTED_WINDOW
+)
+# The Cohere SDK, LangChain and the agent tools are imported where they are used, so --help,
+# the coordinator and compile/analysis worker processes start without loading them
 
 # Configure Rich logging
 logging.basicConfig(
@@ -24,10 +39,12 @@ def parse_assessment_result(assessment_result: str):
     try:
         # Use regex to extract the complexity level
         complexity_match = re.search(r"Complexity Level: (\w+)", assessment_result)
-        complexity = complexity_match.group(1) if complexity_match else None
+        # get_params capitalizes the level; everything downstream uses utils.COMPLEXITY's lower case
+        complexity = complexity_match.group(1).lower() if complexity_match else None
         
         # Use regex to extract vulnerabilities as a list
-        vulnerabilities_match = re.findall(r"- (\w+-\w+)", assessment_result)
+        # Detector names have any number of hyphenated parts (suicidal, reentrancy-no-eth, arbitrary-send-erc20)
+        vulnerabilities_match = re.findall(r"^- ([\w-]+)$", assessment_result, re.M)
         vulnerabilities = vulnerabilities_match if vulnerabilities_match else None
         
         return complexity, vulnerabilities
@@ -35,15 +52,190 @@ def parse_assessment_result(assessment_result: str):
         logging.error(f"Error parsing assessment result: {e}")
         return None, None
 
-def setup_react_agent(num_contracts):
-    # Get the API key from the environment variable
+def get_api_key() -> str:
+    """Reads the Cohere API key from the environment."""
     api_key = os.getenv("COHERE_API_KEY")
-    
+
     if not api_key:
         raise EnvironmentError("COHERE_API_KEY is not set in the environment. Please set it before running the script.")
+
+    return api_key
+
+def select_params(rng=None):
+    """Picks the complexity and vulnerabilities for the next contract, or (None, None) on failure."""
+    # Assess complexity and vulnerabilities using the appropriate tool
+    logging.info("Assessing complexity and vulnerabilities")
+    assessment_result = get_params(rng)
+
+    # Parse the assessment result to extract complexity and vulnerabilities
+    complexity, vulnerabilities = parse_assessment_result(assessment_result)
+
+    pprint(f"Extracted complexity: {complexity}")
+    pprint(f"Extracted vulnerabilities: {vulnerabilities}")
+
+    # Ensure vulnerabilities is a list
+    if complexity is None or vulnerabilities is None:
+        logging.error(f"Failed to retrieve complexity or vulnerabilities (Complexity: {complexity}, Vulnerabilities: {vulnerabilities})")
+        return None, None
+    if not isinstance(vulnerabilities, list):
+        logging.error(f"Expected vulnerabilities to be a list, but got {type(vulnerabilities)}")
+        return None, None
+
+    return complexity, vulnerabilities
+
+def run_direct_pipeline(num_contracts, generate_workers=PIPELINE_GENERATE_WORKERS,
+                        compile_workers=PIPELINE_COMPILE_WORKERS, analyze_workers=PIPELINE_ANALYZE_WORKERS,
+                        queue_size=PIPELINE_QUEUE_SIZE, split_validation=False,
+                        verify_policy=PIPELINE_VERIFY_POLICY, findings_db=FINDINGS_DB_PATH,
+                        coverage_sampling=False, coverage_target=SAMPLER_DEFAULT_TARGET,
+                        target_distribution=None, stop_at_coverage=False,
+                        output_format=PIPELINE_OUTPUT_FORMAT, dedup_threshold=PIPELINE_DEDUP_THRESHOLD,
+                        preflight=PIPELINE_PREFLIGHT, repair_attempts=PIPELINE_REPAIR_ATTEMPTS,
+                        repair_verify=PIPELINE_REPAIR_VERIFY, contracts_per_call=PIPELINE_CONTRACTS_PER_CALL,
+                        stream=PIPELINE_STREAM, llm_cache=LLM_CACHE_MODE, llm_cache_path=LLM_CACHE_PATH,
+                        seed=None, metrics_out=None, profile_out=None,
+                        journal_path=JOURNAL_PATH, resume=False, queue_url=None):
+    """
+    Generates each contract with CohereAPI, then compiles, analyzes and saves it by
+    calling the tools in-process. No agent round-trips are made for the deterministic stages,
+    and the stages run concurrently through ContractPipeline.
+
+    llm_cache records or replays Cohere responses (see ResponseCache); replay
+    needs neither an API key nor network access. A seed makes the parameter
+    choices and the Cohere sampling repeatable, so a recorded run can be
+    replayed exactly.
+
+    metrics_out receives the run's metrics (Prometheus text for .prom/.txt,
+    JSON otherwise) and profile_out a cProfile dump of the run.
+
+    Jobs are journaled in journal_path (see JobJournal); resume continues the
+    latest journaled run instead of starting a new one.
+
+    With queue_url the process runs as a distributed worker (see
+    run_coordinator): it takes jobs from that queue, up to num_contracts
+    when given, and sends results back instead of saving them, so the
+    journal, findings store and sampler stay with the coordinator.
+    """
+    from cohere_api import CohereAPI
+
+    # Parameter choices get their own generator, so nothing else drawing random numbers (such as
+    # retry jitter) can change which prompts a seeded run issues
+    params_rng = random.Random(seed)
+    limiter = AdaptiveRateLimiter(
+        requests_per_second=COHERE_REQUESTS_PER_MINUTE / 60,
+        max_concurrency=generate_workers,
+        latency_target=COHERE_LATENCY_TARGET,
+    )
+    cache = ResponseCache(llm_cache_path, mode=llm_cache) if llm_cache != "passthrough" else None
+    api_key = os.getenv("COHERE_API_KEY") if llm_cache == "replay" else get_api_key()
+    metrics = MetricsRegistry() if metrics_out else None
+    cohere_api = CohereAPI(api_key, limiter=limiter, cache=cache, seed=seed, metrics=metrics)
+    job_queue = open_worker_queue(queue_url) if queue_url else None
+    if job_queue is not None:
+        findings_db = journal_path = None
+        coverage_sampling = False
+        # Near-duplicates are dropped by the coordinator, across all workers
+        dedup_threshold = 0
+    findings_store = FindingsStore(findings_db) if findings_db else None
+    if resume and not journal_path:
+        raise ValueError("Resuming a run needs the job journal")
+    journal = JobJournal(journal_path) if journal_path else None
+
+    sampler = None
+    if coverage_sampling:
+        if target_distribution:
+            sampler = CoverageSampler.from_config_file(target_distribution, findings_store, coverage_target, rng=params_rng)
+        else:
+            sampler = CoverageSampler(findings_store, default_target=coverage_target, rng=params_rng)
+
+    pipeline = ContractPipeline(
+        cohere_api,
+        partial(select_params, rng=params_rng),
+        generate_workers=generate_workers,
+        compile_workers=compile_workers,
+        analyze_workers=analyze_workers,
+        queue_size=queue_size,
+        split_validation=split_validation,
+        verify_policy=verify_policy,
+        findings_store=findings_store,
+        sampler=sampler,
+        stop_at_coverage=stop_at_coverage,
+        output_format=output_format,
+        dedup_threshold=dedup_threshold,
+        preflight=preflight,
+        repair_attempts=repair_attempts,
+        repair_verify=repair_verify,
+        contracts_per_call=contracts_per_call,
+        stream=stream,
+        metrics=metrics,
+        journal=journal,
+        resume=resume,
+        job_queue=job_queue,
+        worker=worker_name() if job_queue is not None else None,
+    )
+    profiler = cProfile.Profile() if profile_out else None
+    if profiler is not None:
+        profiler.enable()
+    try:
+        return pipeline.run(num_contracts)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(profile_out)
+            pstats.Stats(profiler).sort_stats("cumulative").print_stats(25)
+        if metrics is not None:
+            metrics.write(metrics_out)
+            pprint(f"Metrics written to {metrics_out}")
+        if journal is not None:
+            pprint(f"Run {journal.run_id} journal: {journal.summary()}")
+            journal.close()
+
+def run_coordinator(num_contracts, queue_url, findings_db=FINDINGS_DB_PATH, coverage_sampling=False,
+                    coverage_target=SAMPLER_DEFAULT_TARGET, target_distribution=None, stop_at_coverage=False,
+                    output_format=PIPELINE_OUTPUT_FORMAT, dedup_threshold=PIPELINE_DEDUP_THRESHOLD,
+                    window=DISTRIBUTED_WINDOW, seed=None):
+    """
+    Schedules num_contracts jobs on the queue at queue_url for workers started
+    with --role worker, and saves their results into this machine's dataset.
+    A sqlite:/// queue must be on a volume every worker can reach; for a
+    tcp://host:port queue the jobs are kept locally and served on that address.
+    """
+    # Parameter choices get their own generator, so nothing else drawing random numbers (such as
+    # retry jitter) can change which prompts a seeded run issues
+    params_rng = random.Random(seed)
+    findings_store = FindingsStore(findings_db) if findings_db else None
+    sampler = None
+    if coverage_sampling:
+        if target_distribution:
+            sampler = CoverageSampler.from_config_file(target_distribution, findings_store, coverage_target, rng=params_rng)
+        else:
+            sampler = CoverageSampler(findings_store, default_target=coverage_target, rng=params_rng)
+
+    queue, server = open_coordinator_queue(queue_url, DISTRIBUTED_QUEUE_PATH)
+    writer = ResultWriter(findings_store, output_format=output_format, dedup_threshold=dedup_threshold)
+    coordinator = Coordinator(
+        queue, partial(select_params, rng=params_rng), writer, sampler=sampler, stop_at_coverage=stop_at_coverage, window=window
+    )
+    try:
+        return coordinator.run(num_contracts)
+    finally:
+        writer.close()
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+
+def setup_react_agent(num_contracts):
+    from langchain_core.prompts import ChatPromptTemplate
+    from langchain_core.messages import SystemMessage
+    from langchain_cohere import ChatCohere, create_cohere_react_agent
+    from langchain.agents import AgentExecutor
+    from cohere_api import CohereAPI
+    from agent_tools import compile_solidity, compile_solidity_batch, analyze_with_slither, save_contract_and_report
+
+    api_key = get_api_key()
     
     # Initialize Cohere LLM with the API key for ReAct agent
-    cohere_llm = ChatCohere(cohere_api_key=api_key, model="command-r-plus-08-2024")
+    cohere_llm = ChatCohere(cohere_api_key=api_key, model=COHERE_MODEL)
     chat_hx = [SystemMessage(content="")]
     load_preamble = load_preamble_from_file()
     preamble = load_preamble
@@ -52,7 +244,7 @@ def setup_react_agent(num_contracts):
     cohere_api = CohereAPI(api_key)
 
     # Define the tools for the agent
-    tools = [compile_solidity, analyze_with_slither, save_contract_and_report]
+    tools = [compile_solidity, compile_solidity_batch, analyze_with_slither, save_contract_and_report]
     
     # Create the prompt
     prompt = ChatPromptTemplate.from_messages(chat_hx)
@@ -66,22 +258,9 @@ def setup_react_agent(num_contracts):
         try:
             logging.info("Starting agent execution with preamble")
             
-            # Step 1: Assess complexity and vulnerabilities using the appropriate tool
-            logging.info("Assessing complexity and vulnerabilities")
-            assessment_result = get_params()
-
-            # Step 2: Parse the assessment result to extract complexity and vulnerabilities
-            complexity, vulnerabilities = parse_assessment_result(assessment_result)
-
-            pprint(f"Extracted complexity: {complexity}")
-            pprint(f"Extracted vulnerabilities: {vulnerabilities}")
-
-            # Ensure vulnerabilities is a list
-            if complexity is None or vulnerabilities is None:
-                logging.error(f"Failed to retrieve complexity or vulnerabilities (Complexity: {complexity}, Vulnerabilities: {vulnerabilities})")
-                continue
-            if not isinstance(vulnerabilities, list):
-                logging.error(f"Expected vulnerabilities to be a list, but got {type(vulnerabilities)}")
+            # Steps 1-2: Assess and parse complexity and vulnerabilities
+            complexity, vulnerabilities = select_params()
+            if complexity is None:
                 continue
 
             # Step 3: Call CohereAPI to generate the contract code
@@ -124,8 +303,119 @@ def setup_react_agent(num_contracts):
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Run contract generation and validation using Cohere and LangChain.")
-    parser.add_argument("-c", "--contracts", type=int, default=1, help="Number of contracts to generate and validate.")
+    parser.add_argument("-c", "--contracts", type=int, help="Number of contracts to generate and validate (default 1; workers default to every job the coordinator schedules).")
+    parser.add_argument(
+        "-m", "--mode", choices=["direct", "agent"], default="direct",
+        help="'direct' runs compile/analyze/save in-process; 'agent' routes each step through the ReAct agent."
+    )
+    parser.add_argument("--generate-workers", type=int, default=PIPELINE_GENERATE_WORKERS, help="Concurrent Cohere generation calls (direct mode).")
+    parser.add_argument("--compile-workers", type=int, default=PIPELINE_COMPILE_WORKERS, help="solc worker processes (direct mode with --split-validation).")
+    parser.add_argument("--analyze-workers", type=int, default=PIPELINE_ANALYZE_WORKERS, help="Slither (or combined validation) worker processes (direct mode).")
+    parser.add_argument("--queue-size", type=int, default=PIPELINE_QUEUE_SIZE, help="Max contracts buffered between pipeline stages (direct mode).")
+    parser.add_argument("--split-validation", action="store_true", help="Compile and run Slither as separate stages instead of reusing one solc compilation (requires --verify off).")
+    parser.add_argument(
+        "--verify", choices=["off", "any", "all"],
+        help=f"Run only the requested Slither detectors first and drop contracts where none ('any') or not all ('all') are confirmed "
+             f"(default '{PIPELINE_VERIFY_POLICY}'; 'off' with --split-validation)."
+    )
+    parser.add_argument("--findings-db", default=FINDINGS_DB_PATH, help="SQLite store for normalized Slither findings (empty string disables it).")
+    parser.add_argument("--coverage-sampling", action="store_true", help="Weight complexity/vulnerability choices towards detectors the dataset is missing.")
+    parser.add_argument("--coverage-target", type=int, default=SAMPLER_DEFAULT_TARGET, help="Confirmed findings wanted per detector (coverage sampling).")
+    parser.add_argument("--target-distribution", help="JSON file with per-detector targets and complexity shares (coverage sampling).")
+    parser.add_argument("--stop-at-coverage", action="store_true", help="Stop scheduling contracts once every detector reaches its target.")
+    parser.add_argument(
+        "--output-format", choices=["files", "shards"], default=PIPELINE_OUTPUT_FORMAT,
+        help="'files' writes a .sol and a report per contract; 'shards' packs them into size-capped shard files with an offset index."
+    )
+    parser.add_argument(
+        "--dedup-threshold", type=float, default=PIPELINE_DEDUP_THRESHOLD,
+        help="Drop generations at least this similar (MinHash Jaccard) to an existing contract before compiling; 0 disables."
+    )
+    parser.add_argument("--no-preflight", action="store_true", help="Send raw model output to solc without extracting and sanity-checking the code first.")
+    parser.add_argument("--repair-attempts", type=int, default=PIPELINE_REPAIR_ATTEMPTS, help="Fix-up requests with solc diagnostics per contract that fails to compile (0 disables).")
+    parser.add_argument("--repair-verify", action="store_true", help="Also request fixes when Slither misses requested vulnerabilities.")
+    parser.add_argument("--contracts-per-call", type=int, default=PIPELINE_CONTRACTS_PER_CALL, help="Contracts requested per Cohere call, sharing one copy of the base prompt.")
+    parser.add_argument("--stream", action="store_true", help="Stream generations, stopping as soon as the contract is complete or clearly off track.")
+    parser.add_argument(
+        "--llm-cache", choices=CACHE_MODES, default=LLM_CACHE_MODE,
+        help="'record' stores every Cohere response; 'replay' reruns from stored responses without network access."
+    )
+    parser.add_argument("--llm-cache-path", default=LLM_CACHE_PATH, help="SQLite file for recorded Cohere responses.")
+    parser.add_argument("--seed", type=int, help="Seed for parameter selection and Cohere sampling, for repeatable (replayable) runs.")
+    parser.add_argument("--metrics-out", help="Write per-stage metrics at the end of the run (Prometheus text for .prom/.txt, JSON otherwise).")
+    parser.add_argument("--profile", help="Profile the run with cProfile, dump the stats to this file and print the hottest calls.")
+    parser.add_argument("--journal", default=JOURNAL_PATH, help="SQLite job journal recording each job's stage transitions (empty string disables it).")
+    parser.add_argument("--resume", action="store_true", help="Continue the latest journaled run: requeue its unfinished jobs, reusing already generated sources.")
+    parser.add_argument(
+        "--role", choices=["standalone", "coordinator", "worker"], default="standalone",
+        help="'coordinator' schedules jobs on --queue and saves results; 'worker' runs generate/compile/analyze for jobs from --queue (direct mode)."
+    )
+    parser.add_argument("--queue", help="Job queue shared by coordinator and workers: sqlite:///path/on/shared/volume or tcp://host:port "
+                                         "(a non-loopback tcp:// host needs the same QUEUE_TOKEN on coordinator and workers).")
+    parser.add_argument("--queue-window", type=int, default=DISTRIBUTED_WINDOW, help="Jobs the coordinator keeps queued or leased ahead of results.")
+    parser.add_argument("--no-tool-cache", action="store_true", help="Always rerun solc and Slither instead of using cached results.")
     args = parser.parse_args()
 
-    # Setup and run the ReAct agent
-    setup_react_agent(args.contracts)
+    if args.no_tool_cache:
+        # Set in the environment so compile/analysis worker processes see it too
+        os.environ[TOOL_CACHE_DISABLE_ENV] = "1"
+
+    if args.role != "standalone" and not args.queue:
+        parser.error(f"--role {args.role} needs --queue")
+    if args.role != "standalone" and args.resume:
+        parser.error(f"--resume continues a journaled standalone run; with --role {args.role} unfinished jobs stay on the queue")
+    if args.verify is None:
+        args.verify = "off" if args.split_validation else PIPELINE_VERIFY_POLICY
+    elif args.split_validation and args.verify != "off":
+        parser.error("--verify any|all needs the fused validate stage; it cannot be combined with --split-validation")
+    # Workers take jobs until the coordinator is done; a resumed standalone run keeps its journaled target
+    if args.contracts is None and args.role != "worker" and not args.resume:
+        args.contracts = 1
+
+    if args.mode == "agent":
+        # Setup and run the ReAct agent
+        setup_react_agent(args.contracts or 1)
+    elif args.role == "coordinator":
+        run_coordinator(
+            args.contracts,
+            args.queue,
+            findings_db=args.findings_db,
+            coverage_sampling=args.coverage_sampling or args.stop_at_coverage or bool(args.target_distribution),
+            coverage_target=args.coverage_target,
+            target_distribution=args.target_distribution,
+            stop_at_coverage=args.stop_at_coverage,
+            output_format=args.output_format,
+            dedup_threshold=args.dedup_threshold,
+            window=args.queue_window,
+            seed=args.seed,
+        )
+    else:
+        run_direct_pipeline(
+            args.contracts,
+            generate_workers=args.generate_workers,
+            compile_workers=args.compile_workers,
+            analyze_workers=args.analyze_workers,
+            queue_size=args.queue_size,
+            split_validation=args.split_validation,
+            verify_policy=args.verify,
+            findings_db=args.findings_db,
+            coverage_sampling=args.coverage_sampling or args.stop_at_coverage or bool(args.target_distribution),
+            coverage_target=args.coverage_target,
+            target_distribution=args.target_distribution,
+            stop_at_coverage=args.stop_at_coverage,
+            output_format=args.output_format,
+            dedup_threshold=args.dedup_threshold,
+            preflight=not args.no_preflight,
+            repair_attempts=args.repair_attempts,
+            repair_verify=args.repair_verify,
+            contracts_per_call=args.contracts_per_call,
+            stream=args.stream,
+            llm_cache=args.llm_cache,
+            llm_cache_path=args.llm_cache_path,
+            seed=args.seed,
+            metrics_out=args.metrics_out,
+            profile_out=args.profile,
+            journal_path=args.journal,
+            resume=args.resume,
+            queue_url=args.queue if args.role == "worker" else None,
+        )
@@ -0,0 +1,91 @@
+# manifest.py
+
+import fcntl
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+from config import MANIFEST_FILENAME, ID_COUNTER_FILENAME
+
+logger = logging.getLogger(__name__)
+
+
+@contextmanager
+def _locked(path: str):
+    """Holds an exclusive flock on `path` (created if missing) for the duration of the block."""
+    with open(path, 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class IdAllocator:
+    """
+    Atomic sequential id allocator backed by a counter file.
+
+    Allocation is O(1) and safe across processes: the counter is read and
+    advanced under an exclusive file lock. The first allocation in a directory
+    without a counter seeds it with `seed()` (e.g. a one-time scan of existing
+    files), so existing datasets keep numbering where they left off.
+    """
+
+    def __init__(self, directory: str, seed: Optional[Callable[[], int]] = None):
+        self.directory = directory
+        self.counter_path = os.path.join(directory, ID_COUNTER_FILENAME)
+        self.lock_path = self.counter_path + '.lock'
+        self.seed = seed
+        os.makedirs(directory, exist_ok=True)
+
+    def allocate(self, count: int = 1) -> int:
+        """Reserves `count` consecutive ids and returns the first one."""
+        with _locked(self.lock_path):
+            try:
+                with open(self.counter_path, 'r') as f:
+                    next_id = int(f.read().strip() or 0)
+            except FileNotFoundError:
+                next_id = self.seed() if self.seed is not None else 0
+
+            temp_path = self.counter_path + '.tmp'
+            with open(temp_path, 'w') as f:
+                f.write(str(next_id + count))
+            os.replace(temp_path, self.counter_path)
+        return next_id
+
+
+class Manifest:
+    """
+    Append-only JSONL manifest with one record per saved contract (id, paths,
+    params, hashes, timings). Appends are serialized with a file lock so
+    several processes can share one manifest.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.path = os.path.join(directory, MANIFEST_FILENAME)
+        os.makedirs(directory, exist_ok=True)
+
+    def append(self, record: dict) -> dict:
+        record = {"created_at": time.time(), **record}
+        line = json.dumps(record, sort_keys=True) + "\n"
+        with _locked(self.path + '.lock'):
+            with open(self.path, 'a') as f:
+                f.write(line)
+        return record
+
+    def __iter__(self) -> Iterator[dict]:
+        try:
+            with open(self.path, 'r') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        logger.warning(f"Skipping unreadable manifest line in {self.path}")
+        except FileNotFoundError:
+            return
@@ -0,0 +1,149 @@
+# metrics.py
+
+import contextvars
+import json
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+# Labels are kept as sorted (name, value) tuples so they can key dicts
+Labels = Tuple[Tuple[str, str], ...]
+
+_QUANTILES = (0.5, 0.95, 0.99)
+
+# Span of the stage currently running in this task; lets nested code (e.g. CohereAPI) annotate it
+_current_span: contextvars.ContextVar[Optional[dict]] = contextvars.ContextVar("current_span", default=None)
+
+
+def _labels(labels: Dict[str, object]) -> Labels:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _quantile(ordered: List[float], q: float) -> float:
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def _format_labels(labels: Labels, extra: Labels = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class MetricsRegistry:
+    """
+    In-process metrics for a pipeline run.
+
+    Counters and duration summaries are keyed by name and labels. `span`
+    times one step of one contract (param selection, generation, preflight,
+    compile, Slither, save, repair, ...), records the duration under
+    `pipeline_span_seconds{stage=...}` and keeps the span itself (contract,
+    stage, start, duration, outcome and any annotations such as tokens used)
+    for the JSON export. Code running inside a span can add to it with
+    `annotate` without being handed the span.
+
+    Export with `to_prometheus` (text exposition format, durations as
+    summaries) or `to_json` (per-stage summary plus counters and spans).
+    Safe to use from the event loop and worker threads.
+    """
+
+    def __init__(self, keep_spans: bool = True):
+        self.keep_spans = keep_spans
+        self.counters: Dict[str, Dict[Labels, float]] = defaultdict(lambda: defaultdict(float))
+        self.observations: Dict[str, Dict[Labels, List[float]]] = defaultdict(lambda: defaultdict(list))
+        self.spans: List[dict] = []
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1.0, **labels):
+        with self._lock:
+            self.counters[name][_labels(labels)] += value
+
+    def observe(self, name: str, value: float, **labels):
+        with self._lock:
+            self.observations[name][_labels(labels)].append(value)
+
+    @contextmanager
+    def span(self, stage: str, contract: Optional[int] = None, **attributes):
+        record = {"contract": contract, "stage": stage, "start": time.time(), "ok": True, **attributes}
+        token = _current_span.set(record)
+        start = time.perf_counter()
+        try:
+            yield record
+        except BaseException:
+            record["ok"] = False
+            raise
+        finally:
+            _current_span.reset(token)
+            record["seconds"] = time.perf_counter() - start
+            self.record_span(record)
+
+    def record_span(self, record: dict):
+        """Records a span measured elsewhere (needs at least stage and seconds)."""
+        self.observe("pipeline_span_seconds", record["seconds"], stage=record["stage"])
+        if not record.get("ok", True):
+            self.inc("pipeline_span_failures_total", stage=record["stage"])
+        if self.keep_spans:
+            with self._lock:
+                self.spans.append(record)
+
+    @staticmethod
+    def annotate(**values):
+        """Adds numeric values to the span running in the current task, if any."""
+        record = _current_span.get()
+        if record is None:
+            return
+        for name, value in values.items():
+            record[name] = record.get(name, 0) + value
+
+    def stage_summary(self) -> Dict[str, dict]:
+        summary = {}
+        for labels, values in self.observations.get("pipeline_span_seconds", {}).items():
+            ordered = sorted(values)
+            summary[dict(labels)["stage"]] = {
+                "count": len(ordered),
+                "sum": sum(ordered),
+                "mean": sum(ordered) / len(ordered),
+                **{f"p{int(q * 100)}": _quantile(ordered, q) for q in _QUANTILES},
+            }
+        return summary
+
+    def to_json(self, include_spans: bool = True) -> str:
+        with self._lock:
+            counters = {
+                name: [{"labels": dict(labels), "value": value} for labels, value in series.items()]
+                for name, series in self.counters.items()
+            }
+            spans = list(self.spans) if include_spans else []
+        return json.dumps({
+            "started_at": self.started_at,
+            "elapsed_seconds": time.time() - self.started_at,
+            "stages": self.stage_summary(),
+            "counters": counters,
+            **({"spans": spans} if include_spans else {}),
+        }, indent=2, default=str)
+
+    def to_prometheus(self) -> str:
+        lines = []
+        with self._lock:
+            for name, series in sorted(self.counters.items()):
+                lines.append(f"# TYPE {name} counter")
+                for labels, value in series.items():
+                    lines.append(f"{name}{_format_labels(labels)} {value}")
+            for name, series in sorted(self.observations.items()):
+                lines.append(f"# TYPE {name} summary")
+                for labels, values in series.items():
+                    ordered = sorted(values)
+                    for q in _QUANTILES:
+                        lines.append(f"{name}{_format_labels(labels, (('quantile', str(q)),))} {_quantile(ordered, q)}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {sum(ordered)}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {len(ordered)}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str):
+        """Writes Prometheus text for *.prom/*.txt paths, the JSON summary otherwise."""
+        with open(path, 'w') as f:
+            f.write(self.to_prometheus() if path.endswith((".prom", ".txt")) else self.to_json())
@@ -0,0 +1,592 @@
+# pipeline.py
+
+import asyncio
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Callable, Dict, List, Optional, Tuple
+from utils import pprint
+from solidity_tools import (
+    compile_contract, analyze_contract, validate_contract, save_contract_record, append_manifest_record,
+    normalize_findings, open_shard_writer, open_dedup_index, COMPILE_TOOL_ERROR,
+)
+from preflight import preflight_contract
+from findings_store import FindingsStore
+from sampler import CoverageSampler
+from metrics import MetricsRegistry
+from journal import JobJournal
+from config import (
+    DISTRIBUTED_POLL_SECONDS, PIPELINE_GENERATE_WORKERS, PIPELINE_COMPILE_WORKERS,
+    PIPELINE_ANALYZE_WORKERS, PIPELINE_QUEUE_SIZE, PIPELINE_VERIFY_POLICY, PIPELINE_OUTPUT_FORMAT,
+    PIPELINE_DEDUP_THRESHOLD, PIPELINE_PREFLIGHT, PIPELINE_REPAIR_ATTEMPTS, PIPELINE_REPAIR_VERIFY,
+    PIPELINE_CONTRACTS_PER_CALL, PIPELINE_STREAM
+)
+
+logger = logging.getLogger(__name__)
+
+# Sentinel telling a stage worker that its upstream is exhausted
+_STOP = object()
+
+# Completions of "The Solidity contract below ..." in repair requests
+_COMPILE_PROBLEM = "fails to compile with these solc errors:"
+_VERIFY_PROBLEM = "compiles, but Slither does not detect some of the vulnerabilities it is meant to contain."
+
+
+@dataclass
+class ContractJob:
+    """State of one contract as it moves through the pipeline stages."""
+    index: int
+    complexity: str
+    vulnerabilities: List[str]
+    contract_code: Optional[str] = None
+    compilation_result: Optional[str] = None
+    slither_result: Optional[str] = None
+    findings: List[dict] = field(default_factory=list)
+    confirmed: List[str] = field(default_factory=list)
+    missing: List[str] = field(default_factory=list)
+    repairs: List[dict] = field(default_factory=list)
+    contract_id: Optional[str] = None
+    save_result: Optional[str] = None
+    timings: Dict[str, float] = field(default_factory=dict)
+
+
+class ContractPipeline:
+    """
+    Direct-mode pipeline: generate -> preflight -> dedup -> validate -> save.
+
+    Stages are connected by bounded asyncio queues, so a slow stage applies
+    backpressure instead of buffering every contract in memory. Cohere calls
+    run on the event loop through the async client, while solc and Slither
+    run on process pools so their CPU time overlaps with generation of the
+    next contracts. With a job_queue the pipeline runs as a distributed
+    worker and submits its results instead of saving them.
+    """
+
+    def __init__(
+        self,
+        cohere_api,
+        select_params: Callable[[], Tuple[Optional[str], Optional[List[str]]]],
+        generate_workers: int = PIPELINE_GENERATE_WORKERS,
+        compile_workers: int = PIPELINE_COMPILE_WORKERS,
+        analyze_workers: int = PIPELINE_ANALYZE_WORKERS,
+        queue_size: int = PIPELINE_QUEUE_SIZE,
+        split_validation: bool = False,
+        verify_policy: str = PIPELINE_VERIFY_POLICY,
+        findings_store: Optional[FindingsStore] = None,
+        sampler: Optional[CoverageSampler] = None,
+        stop_at_coverage: bool = False,
+        output_format: str = PIPELINE_OUTPUT_FORMAT,
+        dedup_threshold: float = PIPELINE_DEDUP_THRESHOLD,
+        preflight: bool = PIPELINE_PREFLIGHT,
+        repair_attempts: int = PIPELINE_REPAIR_ATTEMPTS,
+        repair_verify: bool = PIPELINE_REPAIR_VERIFY,
+        contracts_per_call: int = PIPELINE_CONTRACTS_PER_CALL,
+        stream: bool = PIPELINE_STREAM,
+        metrics: Optional[MetricsRegistry] = None,
+        journal: Optional[JobJournal] = None,
+        resume: bool = False,
+        job_queue=None,
+        worker: Optional[str] = None,
+    ):
+        if split_validation and verify_policy != "off":
+            raise ValueError(f"verify_policy {verify_policy!r} needs the fused validate stage; split_validation only supports 'off'")
+        self.cohere_api = cohere_api
+        self.select_params = select_params
+        self.generate_workers = max(1, generate_workers)
+        self.compile_workers = max(1, compile_workers)
+        self.analyze_workers = max(1, analyze_workers)
+        self.queue_size = max(1, queue_size)
+        self.split_validation = split_validation
+        self.verify_policy = verify_policy
+        self.findings_store = findings_store
+        self.sampler = sampler
+        self.stop_at_coverage = stop_at_coverage
+        self.output_format = output_format
+        self.dedup_threshold = dedup_threshold
+        self.preflight = preflight
+        self.repair_attempts = max(0, repair_attempts)
+        self.repair_verify = repair_verify
+        self.contracts_per_call = max(1, contracts_per_call)
+        self.stream = stream
+        self.metrics = metrics
+        self.journal = journal
+        self.resume = resume
+        self.job_queue = job_queue
+        self.worker = worker
+        self.completed: List[ContractJob] = []
+        self.failed: List[ContractJob] = []
+
+    def run(self, num_contracts: Optional[int]) -> List[ContractJob]:
+        """
+        Runs the pipeline for num_contracts jobs and returns the saved ones. None
+        means every job of the queue, or the journaled target of a resumed run.
+        """
+        return asyncio.run(self._run(num_contracts))
+
+    async def _run(self, num_contracts: Optional[int]) -> List[ContractJob]:
+        """
+        Compile and analyze are one validate stage that reuses a single solc
+        compilation for Slither; split_validation keeps them as two stages
+        with their own pools.
+        """
+        self._num_contracts = num_contracts
+        self._thread_pool = ThreadPoolExecutor(max_workers=1)
+        self._compile_pool = ProcessPoolExecutor(max_workers=self.compile_workers)
+        self._analyze_pool = ProcessPoolExecutor(max_workers=self.analyze_workers)
+        # Workers only submit results; the coordinator owns the dataset
+        self._shard_writer = open_shard_writer() if self.output_format == "shards" and self.job_queue is None else None
+        self._dedup_index = open_dedup_index(self.dedup_threshold) if self.dedup_threshold > 0 else None
+        # Shard-saved jobs and their manifest records, published once their shard data is synced
+        self._awaiting_sync: List[Tuple[ContractJob, dict]] = []
+
+        # Coroutines waiting on a repair request do not occupy a pool process
+        repair_slots = self.generate_workers if self.repair_attempts else 0
+        if self.split_validation:
+            validation_stages = [
+                ("compile", self._compile, self.compile_workers + repair_slots),
+                ("analyze", self._analyze, self.analyze_workers),
+            ]
+        else:
+            validation_stages = [("validate", self._validate, self.analyze_workers + repair_slots)]
+        stages = [
+            ("generate", self._generate, self.generate_workers),
+            *([("preflight", self._preflight, 1)] if self.preflight else []),
+            *([("dedup", self._dedup, 1)] if self._dedup_index is not None else []),
+            *validation_stages,
+            ("submit", self._submit, 1) if self.job_queue is not None else ("save", self._save, 1),
+        ]
+        queues = [asyncio.Queue(maxsize=self.queue_size) for _ in stages]
+
+        try:
+            workers = []
+            for k, (name, handler, count) in enumerate(stages):
+                outbox = queues[k + 1] if k + 1 < len(stages) else None
+                batched = name == "generate" and self.contracts_per_call > 1
+                workers.append([
+                    asyncio.create_task(
+                        self._batch_generate_worker(queues[k], outbox) if batched
+                        else self._stage_worker(name, handler, queues[k], outbox)
+                    )
+                    for _ in range(count)
+                ])
+
+            if self.job_queue is not None:
+                await self._lease(queues[0], num_contracts)
+            else:
+                await self._produce(queues[0], num_contracts)
+
+            # Drain the stages in order: a stage is only told to stop once every
+            # worker of the stage feeding it has finished.
+            for k, group in enumerate(workers):
+                for _ in group:
+                    await queues[k].put(_STOP)
+                await asyncio.gather(*group)
+        finally:
+            self._thread_pool.shutdown(wait=False)
+            self._compile_pool.shutdown()
+            self._analyze_pool.shutdown()
+            if self._shard_writer is not None:
+                self._shard_writer.close()
+                self._publish_synced()
+
+        if self.job_queue is not None:
+            pprint(f"Worker finished: {len(self.completed)} submitted, {len(self.failed)} failed")
+        else:
+            pprint(f"Pipeline finished: {len(self.completed)} saved, {len(self.failed)} failed out of {self._num_contracts}")
+        return self.completed
+
+    async def _produce(self, queue: asyncio.Queue, num_contracts: Optional[int]):
+        """
+        Picks parameters (from the sampler when given, which can stop at
+        coverage) and queues num_contracts jobs. With a journal and resume, the
+        unfinished jobs of the previous run are requeued first, keeping any
+        source they already have, and num_contracts counts them too.
+        """
+        first = 0
+        if self.journal is not None:
+            self.journal.start(num_contracts, resume=self.resume)
+            num_contracts = self.journal.num_contracts
+            resumed = self.journal.pending_jobs()
+            if resumed:
+                pprint(f"Resuming {len(resumed)} unfinished jobs of run {self.journal.run_id}")
+            for entry in resumed:
+                if self.sampler is not None:
+                    self.sampler.reserve(entry["vulnerabilities"])
+                await queue.put(ContractJob(
+                    index=entry["index"],
+                    complexity=entry["complexity"],
+                    vulnerabilities=entry["vulnerabilities"],
+                    contract_code=entry["contract_code"],
+                    repairs=entry["repairs"],
+                ))
+            first = self.journal.next_index() - 1
+
+        num_contracts = 1 if num_contracts is None else num_contracts
+        self._num_contracts = num_contracts
+        for i in range(first, num_contracts):
+            if self.sampler is not None and self.stop_at_coverage and self.sampler.coverage_reached():
+                pprint(f"Coverage target reached after {i} jobs, not scheduling more")
+                break
+            with self._span("select_params", i + 1):
+                if self.sampler is not None:
+                    complexity, vulnerabilities = self.sampler.sample()
+                else:
+                    complexity, vulnerabilities = self.select_params()
+            if self.journal is not None:
+                self.journal.schedule(i + 1, complexity, vulnerabilities)
+            if complexity is None:
+                if self.journal is not None:
+                    self.journal.finish(i + 1, "select_params", saved=False)
+                continue
+            await queue.put(ContractJob(index=i + 1, complexity=complexity, vulnerabilities=vulnerabilities))
+
+    async def _lease(self, queue: asyncio.Queue, num_contracts: Optional[int]):
+        """
+        Worker-mode producer: leases jobs from the queue whenever the first
+        stage has room, until the queue is finished or num_contracts jobs were
+        taken. Job indices are the queue's job ids.
+        """
+        loop = asyncio.get_running_loop()
+        leased = 0
+        while num_contracts is None or leased < num_contracts:
+            try:
+                entry = await loop.run_in_executor(None, self.job_queue.lease, self.worker)
+                finished = entry is None and await loop.run_in_executor(None, self.job_queue.finished)
+            except Exception as e:
+                logger.error(f"Could not lease a job from the queue, retrying: {e}")
+                await asyncio.sleep(DISTRIBUTED_POLL_SECONDS)
+                continue
+            if entry is None:
+                if finished:
+                    break
+                await asyncio.sleep(DISTRIBUTED_POLL_SECONDS)
+                continue
+            leased += 1
+            logger.info(f"Leased job {entry['job_id']}")
+            await queue.put(ContractJob(
+                index=entry["job_id"], complexity=entry["complexity"], vulnerabilities=entry["vulnerabilities"]
+            ))
+
+    async def _stage_worker(self, name: str, handler, inbox: asyncio.Queue, outbox: Optional[asyncio.Queue]):
+        while True:
+            job = await inbox.get()
+            if job is _STOP:
+                return
+
+            start = time.perf_counter()
+            with self._span(name, job.index) as span:
+                try:
+                    keep = await handler(job)
+                except Exception as e:
+                    logger.error(f"Error in {name} stage for contract {job.index}: {e}")
+                    keep = False
+                if span is not None:
+                    span["ok"] = keep
+            job.timings[name] = time.perf_counter() - start
+            await self._forward(name, job, keep, outbox)
+
+    async def _batch_generate_worker(self, inbox: asyncio.Queue, outbox: asyncio.Queue):
+        """Generate-stage worker that requests up to contracts_per_call queued jobs per Cohere call."""
+        stopping = False
+        while not stopping:
+            batch = [await inbox.get()]
+            # Take whatever else is already queued, without waiting for a full batch
+            while len(batch) < self.contracts_per_call and not inbox.empty():
+                batch.append(inbox.get_nowait())
+            stops = batch.count(_STOP)
+            if stops:
+                # Each worker consumes exactly one _STOP; hand back any taken for the other workers
+                batch = [job for job in batch if job is not _STOP]
+                for _ in range(stops - 1):
+                    inbox.put_nowait(_STOP)
+                stopping = True
+            # Resumed jobs that already have a source skip generation
+            for job in [job for job in batch if job.contract_code is not None]:
+                batch.remove(job)
+                await self._forward("generate", job, True, outbox)
+            if not batch:
+                continue
+
+            start = time.perf_counter()
+            logger.info(f"Generating contracts {[job.index for job in batch]} in one call")
+            with self._span("generate_batch", None, contracts=[job.index for job in batch]):
+                try:
+                    codes = await self.cohere_api.agenerate_contract_batch(
+                        [(job.complexity, job.vulnerabilities) for job in batch]
+                    )
+                except Exception as e:
+                    logger.error(f"Error in generate stage for contracts {[job.index for job in batch]}: {e}")
+                    codes = [None] * len(batch)
+            elapsed = time.perf_counter() - start
+            for job, code in zip(batch, codes):
+                job.contract_code = code
+                job.timings["generate"] = elapsed
+                if code is None:
+                    logger.error(f"Failed to generate contract {job.index}, skipping.")
+                await self._forward("generate", job, code is not None, outbox)
+
+    def _span(self, stage: str, contract: Optional[int], **attributes):
+        return self.metrics.span(stage, contract, **attributes) if self.metrics is not None else nullcontext()
+
+    async def _forward(self, stage: str, job: ContractJob, keep: bool, outbox: Optional[asyncio.Queue]):
+        """
+        Passes a job to the next stage, or records it as completed or failed,
+        journaling the transition first.
+        """
+        if self.metrics is not None and (not keep or outbox is None):
+            self.metrics.inc("pipeline_contracts_total", outcome="saved" if keep else "dropped", stage=stage)
+        # Bookkeeping failures are logged, never raised: an exception here would kill the stage worker
+        if self.journal is not None:
+            try:
+                if keep and outbox is not None:
+                    self.journal.advance(job.index, stage, job.contract_code, job.repairs)
+                elif not keep or self._shard_writer is None:
+                    # Shard saves are journaled by _publish_synced
+                    self.journal.finish(job.index, stage, saved=keep, contract_id=job.contract_id)
+            except Exception as e:
+                logger.error(f"Could not journal contract {job.index} after the {stage} stage: {e}")
+        if not keep:
+            self.failed.append(job)
+            if self.job_queue is not None:
+                try:
+                    await asyncio.get_running_loop().run_in_executor(
+                        None, self.job_queue.fail, job.index, self.worker, f"dropped at {stage}"
+                    )
+                except Exception as e:
+                    # The lease expires and the job goes to another worker
+                    logger.error(f"Could not report job {job.index} as failed to the queue: {e}")
+            if self.sampler is not None:
+                self.sampler.release(job.vulnerabilities)
+            if self._dedup_index is not None:
+                self._dedup_index.discard(self._dedup_key(job))
+        elif outbox is not None:
+            await outbox.put(job)
+        else:
+            self.completed.append(job)
+
+    def _publish_synced(self):
+        """
+        Publishes the shard-saved contracts once the shard writer has synced
+        them: manifest record, findings, dedup signature and journal entry. A
+        crash before the sync then leaves no reference to a lost record, and a
+        resumed run saves those jobs again.
+        """
+        awaiting, self._awaiting_sync = self._awaiting_sync, []
+        for job, record in awaiting:
+            try:
+                self._publish(job, record)
+                if self._dedup_index is not None:
+                    self._dedup_index.commit(self._dedup_key(job), job.contract_id)
+                if self.journal is not None:
+                    self.journal.finish(job.index, "save", saved=True, contract_id=job.contract_id)
+            except Exception as e:
+                logger.error(f"Could not publish saved contract {job.index}: {e}")
+
+    def _publish(self, job: ContractJob, record: dict):
+        """Records a saved contract in the manifest (shards only; files are already in it) and the findings store."""
+        if self._shard_writer is not None:
+            append_manifest_record(record)
+        if self.findings_store is not None:
+            self.findings_store.add_contract(
+                job.contract_id, job.complexity, job.vulnerabilities, normalize_findings(job.findings),
+                record["contract_path"], record["report_path"],
+            )
+
+    # -------------------------------
+    # Stage Handlers
+    # -------------------------------
+
+    async def _generate(self, job: ContractJob) -> bool:
+        """Generates the source, streamed with stream (see agenerate_contract_stream); resumed jobs keep theirs."""
+        if job.contract_code is not None:
+            logger.info(f"Contract {job.index} was generated before the run was interrupted, reusing its source")
+            return True
+        logger.info(f"Generating contract {job.index} (Complexity: {job.complexity}, Vulnerabilities: {job.vulnerabilities})")
+        generate = self.cohere_api.agenerate_contract_stream if self.stream else self.cohere_api.agenerate_contract
+        job.contract_code = await generate(job.complexity, job.vulnerabilities)
+        if job.contract_code is None:
+            logger.error(f"Failed to generate contract {job.index}, skipping.")
+            return False
+        return True
+
+    async def _preflight(self, job: ContractJob) -> bool:
+        """Extracts the source from the model output and rejects broken or truncated output (see preflight_contract)."""
+        result = preflight_contract(job.contract_code)
+        if not result.ok:
+            logger.error(f"Contract {job.index} rejected before compilation: {result.reason}")
+            return False
+        job.contract_code = result.code
+        return True
+
+    @staticmethod
+    def _dedup_key(job: ContractJob) -> str:
+        return f"pending-{job.index}"
+
+    async def _dedup(self, job: ContractJob) -> bool:
+        """Drops a generation at least dedup_threshold similar to a saved or in-flight contract."""
+        # Hashing is pure Python, so keep it off the event loop; the lookup and reservation stay on it
+        loop = asyncio.get_running_loop()
+        signature = await loop.run_in_executor(None, self._dedup_index.signature, job.contract_code)
+        duplicate = self._dedup_index.reserve(self._dedup_key(job), signature)
+        if duplicate is not None:
+            logger.error(f"Contract {job.index} is a near-duplicate of {duplicate[0]} (similarity {duplicate[1]:.2f}), skipping.")
+            return False
+        return True
+
+    async def _repair(self, job: ContractJob, problem: str, diagnostics: str) -> bool:
+        """
+        Replaces job.contract_code with a repaired version. Returns False once
+        the job has used up its repair attempts.
+        """
+        while len(job.repairs) < self.repair_attempts:
+            attempt = {"attempt": len(job.repairs) + 1, "problem": problem, "ok": False}
+            job.repairs.append(attempt)
+            start = time.perf_counter()
+            with self._span("repair", job.index, attempt=attempt["attempt"]):
+                repaired = await self.cohere_api.arepair_contract(job.contract_code, problem, diagnostics, job.vulnerabilities)
+            attempt["seconds"] = time.perf_counter() - start
+            if repaired is None:
+                attempt["reason"] = "request failed"
+                continue
+            if self.preflight:
+                checked = preflight_contract(repaired)
+                if not checked.ok:
+                    attempt["reason"] = checked.reason
+                    continue
+                repaired = checked.code
+            attempt["ok"] = True
+            job.contract_code = repaired
+            logger.info(f"Contract {job.index}: repair attempt {attempt['attempt']} returned a new source")
+            return True
+        return False
+
+    async def _compile(self, job: ContractJob) -> bool:
+        """Split-validation compile stage; compile errors are sent back to Cohere for repairs."""
+        loop = asyncio.get_running_loop()
+        while True:
+            compiled, job.compilation_result = await loop.run_in_executor(
+                self._compile_pool, compile_contract, job.contract_code
+            )
+            if compiled:
+                return True
+            if job.compilation_result.startswith(COMPILE_TOOL_ERROR):
+                # solc never ran, so there are no diagnostics a repair request could fix
+                logger.error(f"Contract {job.index} could not be compiled: {job.compilation_result}")
+                return False
+            if not await self._repair(job, _COMPILE_PROBLEM, job.compilation_result):
+                logger.error(f"Contract {job.index} failed to compile, skipping analysis and save.")
+                return False
+
+    async def _analyze(self, job: ContractJob) -> bool:
+        """Split-validation Slither pass; produces the text report only, so verify_policy must be 'off'."""
+        loop = asyncio.get_running_loop()
+        # A non-zero Slither exit usually just means findings were reported, so keep the job either way
+        _, job.slither_result = await loop.run_in_executor(
+            self._analyze_pool, analyze_contract, job.contract_code
+        )
+        return True
+
+    async def _validate(self, job: ContractJob) -> bool:
+        """
+        Compiles and analyzes the contract in one worker call (see
+        validate_contract). Only the requested detectors run first, and
+        contracts failing verify_policy are dropped before the full Slither
+        pass. Compile errors (and, with repair_verify, missed detectors) are
+        sent back to Cohere for up to repair_attempts fixes.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            result = await loop.run_in_executor(
+                self._analyze_pool, validate_contract, job.contract_code, job.vulnerabilities, self.verify_policy
+            )
+            job.compilation_result = result.compilation_output
+            if self.metrics is not None:
+                for step, seconds in result.timings.items():
+                    ok = result.compiled or step != "compile"
+                    self.metrics.record_span({"contract": job.index, "stage": step, "seconds": seconds, "ok": ok})
+            if result.tool_error:
+                logger.error(f"Contract {job.index} could not be validated: {result.compilation_output}")
+                return False
+            if not result.compiled:
+                if await self._repair(job, _COMPILE_PROBLEM, result.compilation_output):
+                    continue
+                logger.error(f"Contract {job.index} failed to compile, skipping analysis and save.")
+                return False
+            job.confirmed, job.missing = result.confirmed, result.missing
+            if not result.analyzed:
+                logger.error(f"Contract {job.index} could not be analyzed: {result.analysis_output}")
+                return False
+            if not result.verified:
+                if self.repair_verify and await self._repair(
+                    job, _VERIFY_PROBLEM, f"Not detected: {', '.join(result.missing)}"
+                ):
+                    continue
+                logger.error(f"Contract {job.index} failed verification (missing: {result.missing}), skipping full analysis and save.")
+                return False
+            break
+        job.slither_result = result.analysis_output
+        job.findings = result.findings
+        return True
+
+    async def _save(self, job: ContractJob) -> bool:
+        """
+        Saves the contract under the next id from the IdAllocator, as two files
+        or packed into shards, and records it in the manifest, findings store
+        and dedup index (for shards, once they are synced).
+        """
+        loop = asyncio.get_running_loop()
+        # The fused validate stage produces Slither JSON; the split analyze stage produces text
+        record = await loop.run_in_executor(
+            self._thread_pool,
+            partial(
+                save_contract_record,
+                job.contract_code,
+                job.slither_result,
+                report_suffix="_slither_report.txt" if self.split_validation else "_slither.json",
+                params={"complexity": job.complexity, "vulnerabilities": job.vulnerabilities,
+                        "confirmed": job.confirmed, "missing": job.missing, "repairs": job.repairs},
+                timings=job.timings,
+                shard_writer=self._shard_writer,
+                labels=[job.complexity, *job.confirmed],
+                append_manifest=self._shard_writer is None,
+            ),
+        )
+        job.contract_id = record["id"]
+        job.save_result = f"Files saved successfully:\n- Contract: {record['contract_path']}\n- Slither Report: {record['report_path']}"
+
+        if self._shard_writer is not None:
+            # Nothing may point at a shard record before the writer's batched sync makes it durable
+            self._awaiting_sync.append((job, record))
+            if not self._shard_writer.unsynced:
+                self._publish_synced()
+        else:
+            await loop.run_in_executor(self._thread_pool, self._publish, job, record)
+            if self._dedup_index is not None:
+                self._dedup_index.commit(self._dedup_key(job), job.contract_id)
+        if self.sampler is not None:
+            self.sampler.record(job.complexity, job.vulnerabilities, job.confirmed)
+        pprint(f"Contract {job.index} completed successfully")
+        return True
+
+    async def _submit(self, job: ContractJob) -> bool:
+        loop = asyncio.get_running_loop()
+        result = {
+            "contract_code": job.contract_code,
+            "slither_result": job.slither_result,
+            "report_format": "text" if self.split_validation else "json",
+            "confirmed": job.confirmed,
+            "missing": job.missing,
+            "repairs": job.repairs,
+            "timings": job.timings,
+            "findings": normalize_findings(job.findings),
+        }
+        accepted = await loop.run_in_executor(None, self.job_queue.complete, job.index, self.worker, result)
+        if not accepted:
+            logger.error(f"Job {job.index} was already finished by another worker, discarding this result.")
+        if self._dedup_index is not None:
+            self._dedup_index.discard(self._dedup_key(job))
+        pprint(f"Job {job.index} submitted")
+        return accepted
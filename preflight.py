@@ -0,0 +1,195 @@
+# preflight.py
+
+import re
+from dataclasses import dataclass
+from typing import List, Optional
+from config import STREAM_ABORT_CHARS
+
+DEFAULT_SPDX = "// SPDX-License-Identifier: MIT"
+DEFAULT_PRAGMA = "pragma solidity ^0.8.0;"
+
+_FENCE = re.compile(r"```[ \t]*([A-Za-z]*)[^\n]*\n(.*?)(?:```|\Z)", re.S)
+_SOURCE_START = re.compile(
+    r"^[ \t]*(?://\s*SPDX|pragma\s|import\s|(?:abstract\s+)?contract\s|interface\s|library\s)", re.M
+)
+_SPDX_LINE = re.compile(r"^[ \t]*//\s*SPDX-License-Identifier:[^\n]*\n?", re.M)
+_PRAGMA_SOLIDITY = re.compile(r"^[ \t]*pragma\s+solidity\s+[^;\n]*;[ \t]*\n?", re.M)
+_DECLARATION = re.compile(r"\b(?:abstract\s+contract|contract|interface|library)\s+[A-Za-z_$][A-Za-z0-9_$]*")
+# A declaration starting a line; prose such as "this contract is vulnerable" does not count
+_LINE_DECLARATION = re.compile(
+    r"^[ \t]*(?:abstract\s+contract|contract|interface|library)\s+[A-Za-z_$][A-Za-z0-9_$]*", re.M
+)
+_BRACE = re.compile(r"[{}]")
+# What may follow a closed top-level block in a source; anything else (prose, a closing fence) ends it
+_TOP_LEVEL_CONTINUATION = re.compile(
+    r"(?://|/\*|(?:abstract|contract|interface|library|pragma|import|struct|enum|function|error|event|using|type)\b)"
+)
+# Comments and string literals, so braces inside them are not counted
+_NON_CODE = re.compile(r"//[^\n]*|/\*.*?(?:\*/|\Z)|\"(?:\\.|[^\"\\\n])*\"|'(?:\\.|[^'\\\n])*'", re.S)
+
+
+@dataclass
+class PreflightResult:
+    """Outcome of the pre-compile checks; `code` is the extracted, header-normalized source."""
+    ok: bool
+    code: Optional[str]
+    reason: Optional[str] = None
+
+
+def extract_solidity(text: str) -> str:
+    """
+    Pulls the Solidity source out of a model response: the fenced code block
+    (preferring one tagged solidity/sol) when there is one, otherwise
+    everything from the first SPDX/pragma/import/declaration line on. Prose
+    after the last top-level closing brace and a trailing END marker are
+    dropped.
+    """
+    blocks = _FENCE.findall(text)
+    if blocks:
+        tagged = [body for lang, body in blocks if lang.lower() in ("solidity", "sol")]
+        with_contract = [body for _, body in blocks if _DECLARATION.search(body)]
+        text = (tagged or with_contract or [blocks[0][1]])[0]
+    else:
+        start = _SOURCE_START.search(text)
+        if start:
+            text = text[start.start():]
+
+    end = _top_level_end(text)
+    # Only trim trailing prose; another declaration after the last closed block may be a truncated contract
+    if end is not None and not _LINE_DECLARATION.search(_code_only(text[end:])):
+        text = text[:end]
+    return text.strip()
+
+
+def _code_only(code: str) -> str:
+    """The source with comments and string literals blanked out (same length)."""
+    return _NON_CODE.sub(lambda m: " " * len(m.group()), code)
+
+
+def _top_level_end(code: str) -> Optional[int]:
+    """Index just past the last brace that closes a top-level block, if any."""
+    depth, end = 0, None
+    for brace in _BRACE.finditer(_code_only(code)):
+        if brace.group() == "{":
+            depth += 1
+        else:
+            depth -= 1
+            if depth == 0:
+                end = brace.end()
+    return end
+
+
+def _structure_problem(code: str) -> Optional[str]:
+    stripped = _code_only(code)
+    declarations = list(_DECLARATION.finditer(stripped))
+    if not declarations:
+        return "no contract, interface or library declaration"
+
+    depth = 0
+    opened_top_level = 0
+    for brace in _BRACE.finditer(stripped):
+        if brace.group() == "{":
+            if depth == 0:
+                opened_top_level += 1
+            depth += 1
+        else:
+            depth -= 1
+            if depth < 0:
+                return "unbalanced braces: '}' without a matching '{'"
+    if depth > 0:
+        return f"truncated: {depth} unclosed brace(s) at end of output"
+    if stripped.count("(") != stripped.count(")"):
+        return "unbalanced parentheses"
+
+    top_level_declarations = [m for m in declarations if _depth_at(stripped, m.start()) == 0]
+    if len(top_level_declarations) > opened_top_level:
+        return "a contract declaration has no body"
+    return None
+
+
+def _depth_at(code: str, index: int) -> int:
+    return code.count("{", 0, index) - code.count("}", 0, index)
+
+
+def normalize_header(code: str, spdx: str = DEFAULT_SPDX, pragma: str = DEFAULT_PRAGMA) -> str:
+    """
+    Gives the source exactly one SPDX line and one `pragma solidity` at the
+    top: existing SPDX lines are replaced, and the first existing pragma is
+    kept (others are dropped) or `pragma` is added.
+    """
+    body = _SPDX_LINE.sub("", code)
+    pragmas: List[str] = [m.group().strip() for m in _PRAGMA_SOLIDITY.finditer(body)]
+    body = _PRAGMA_SOLIDITY.sub("", body).strip()
+    return f"\n{spdx}\n{pragmas[0] if pragmas else pragma}\n\n{body}\n"
+
+
+def preflight_contract(text: Optional[str]) -> PreflightResult:
+    """
+    Extracts the Solidity source from raw model output, rejects it when it is
+    obviously not compilable (no declaration, unbalanced or truncated
+    braces), and normalizes its SPDX/pragma header. Runs in-process and costs
+    microseconds, so the compiler only sees plausible sources.
+    """
+    if not text or not text.strip():
+        return PreflightResult(False, None, "empty output")
+    code = extract_solidity(text)
+    problem = _structure_problem(code)
+    if problem is not None:
+        return PreflightResult(False, code, problem)
+    return PreflightResult(True, normalize_header(code))
+
+
+class StreamChecker:
+    """
+    Watches a streamed generation chunk by chunk and decides when to stop it.
+
+    `feed` returns COMPLETE once the END marker arrives or the last top-level
+    block has closed and what follows is not more Solidity (prose or a closing
+    fence), and ABORT when the stream has gone off the rails: no contract
+    declaration within `abort_after_chars`, or a `}` with no matching `{`.
+    `text` then holds the output up to the stopping point and `reason` says why.
+    """
+
+    CONTINUE, COMPLETE, ABORT = "continue", "complete", "abort"
+
+    def __init__(self, abort_after_chars: int = STREAM_ABORT_CHARS, end_marker: str = "END"):
+        self.abort_after_chars = abort_after_chars
+        self.end_marker = end_marker
+        self.text = ""
+        self.reason: Optional[str] = None
+
+    def feed(self, chunk: str) -> str:
+        self.text += chunk
+        end = self.text.find(self.end_marker)
+        if end != -1:
+            self.text = self.text[:end]
+            self.reason = "end marker"
+            return self.COMPLETE
+
+        code = _code_only(self.text)
+        if not _DECLARATION.search(code):
+            if len(self.text) > self.abort_after_chars:
+                self.reason = f"no contract declaration in the first {self.abort_after_chars} characters"
+                return self.ABORT
+            return self.CONTINUE
+
+        depth, last_close = 0, None
+        for brace in _BRACE.finditer(code):
+            if brace.group() == "{":
+                depth += 1
+            else:
+                depth -= 1
+                if depth < 0:
+                    self.reason = "unbalanced braces: '}' without a matching '{'"
+                    return self.ABORT
+                if depth == 0:
+                    last_close = brace.end()
+        if depth == 0 and last_close is not None:
+            rest = self.text[last_close:].lstrip()
+            # Wait for a complete first word, which may still turn out to start another contract
+            first_word = re.match(r"\S+", rest)
+            if first_word and first_word.end() < len(rest) and not _TOP_LEVEL_CONTINUATION.match(rest):
+                self.text = self.text[:last_close]
+                self.reason = "outer contract closed"
+                return self.COMPLETE
+        return self.CONTINUE
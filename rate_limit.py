@@ -0,0 +1,120 @@
+# rate_limit.py
+
+import asyncio
+import logging
+import random
+import time
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Own generator, so retries never advance the (possibly seeded) one used to pick contract parameters
+_jitter = random.Random()
+
+
+def backoff_delay(attempt: int, base: float = 1.0, cap: float = 60.0) -> float:
+    """
+    Full-jitter exponential backoff: a random delay in [0, min(cap, base * 2**attempt)].
+    Jitter keeps many concurrent retries from hitting the API in lockstep.
+    """
+    return _jitter.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class TokenBucket:
+    """
+    Async token bucket allowing `rate` acquisitions per second with bursts of up
+    to `capacity`. The rate can be changed while callers are waiting.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def set_rate(self, rate: float):
+        self._refill()
+        self.rate = rate
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class AdaptiveRateLimiter:
+    """
+    Limits both the request rate (token bucket) and the number of requests in
+    flight, and tunes them from what the API tells us:
+
+    - a 429 halves the concurrency limit and the request rate (multiplicative decrease);
+    - a success under the latency target raises the concurrency limit by one after
+      every `increase_every` successes, and recovers the rate towards its maximum
+      (additive increase);
+    - a success slower than the latency target lowers the concurrency limit by one,
+      since piling on more requests only queues them server-side.
+    """
+
+    def __init__(
+        self,
+        requests_per_second: float,
+        max_concurrency: int,
+        min_concurrency: int = 1,
+        latency_target: float = 30.0,
+        increase_every: int = 5,
+    ):
+        self.max_rate = requests_per_second
+        self.min_rate = requests_per_second / 16
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_concurrency = max(1, min(min_concurrency, self.max_concurrency))
+        self.latency_target = latency_target
+        self.increase_every = increase_every
+
+        self.concurrency = self.max_concurrency
+        self.bucket = TokenBucket(requests_per_second)
+        self._in_flight = 0
+        self._successes = 0
+        self._condition = asyncio.Condition()
+
+    async def acquire(self):
+        """Waits for a free concurrency slot and a rate token."""
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._in_flight < self.concurrency)
+            self._in_flight += 1
+        await self.bucket.acquire()
+
+    async def release(self):
+        async with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+
+    def record_success(self, latency: float):
+        if latency > self.latency_target:
+            self._successes = 0
+            self._set_concurrency(self.concurrency - 1)
+            return
+
+        self._successes += 1
+        if self._successes >= self.increase_every:
+            self._successes = 0
+            self._set_concurrency(self.concurrency + 1)
+            self.bucket.set_rate(min(self.max_rate, self.bucket.rate * 1.25))
+
+    def record_throttle(self):
+        self._successes = 0
+        self._set_concurrency(self.concurrency // 2)
+        self.bucket.set_rate(max(self.min_rate, self.bucket.rate / 2))
+        logger.warning(f"Rate limited by API, concurrency now {self.concurrency}, rate {self.bucket.rate:.2f}/s")
+
+    def _set_concurrency(self, value: int):
+        self.concurrency = max(self.min_concurrency, min(self.max_concurrency, value))
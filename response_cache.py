@@ -0,0 +1,118 @@
+# response_cache.py
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+import zlib
+from collections import Counter
+from typing import Optional
+from config import LLM_CACHE_PATH, LLM_CACHE_MAX_BYTES
+
+logger = logging.getLogger(__name__)
+
+CACHE_MODES = ("passthrough", "record", "replay")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    model TEXT,
+    size INTEGER NOT NULL,
+    created_at REAL,
+    last_used REAL,
+    body BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses(last_used);
+"""
+
+
+class ResponseCacheMiss(LookupError):
+    """Raised in replay mode when a request was never recorded."""
+
+
+class ResponseCache:
+    """
+    Record/replay store for Cohere generations.
+
+    Entries are keyed by model, a hash of the prompt, the sampling params,
+    the seed and the occurrence of that exact request within the run, so a
+    run that issues the same prompt several times (same parameters picked
+    again) records and replays each response separately. Bodies are zlib
+    compressed in SQLite; once the store exceeds `max_bytes` the least
+    recently used entries are evicted.
+
+    Modes:
+        passthrough: the cache is not used.
+        record:      every response from the API is stored (replacing older ones).
+        replay:      responses come only from the cache; a miss raises
+                     ResponseCacheMiss and nothing is sent over the network.
+    """
+
+    def __init__(self, path: str = LLM_CACHE_PATH, mode: str = "record", max_bytes: int = LLM_CACHE_MAX_BYTES):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unknown response cache mode {mode!r}, expected one of {CACHE_MODES}")
+        self.path = path
+        self.mode = mode
+        self.max_bytes = max_bytes
+        self._occurrences: Counter = Counter()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.executescript(_SCHEMA)
+        self._total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "passthrough"
+
+    def make_key(self, kwargs: dict) -> str:
+        """
+        Cache key of a generate request; calling it again with the same request
+        gives the key of its next occurrence.
+        """
+        params = {name: value for name, value in kwargs.items() if name not in ("prompt", "request_options")}
+        params["prompt_sha256"] = hashlib.sha256(kwargs["prompt"].encode()).hexdigest()
+        base = hashlib.sha256(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()
+        occurrence = self._occurrences[base]
+        self._occurrences[base] += 1
+        return f"{base}:{occurrence}"
+
+    def get(self, key: str) -> Optional[str]:
+        row = self.conn.execute("SELECT body FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        with self.conn:
+            self.conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+        return zlib.decompress(row[0]).decode()
+
+    def put(self, key: str, text: str, model: Optional[str] = None):
+        body = zlib.compress(text.encode())
+        now = time.time()
+        with self.conn:
+            previous = self.conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, size, created_at, last_used, body) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, len(body), now, now, body),
+            )
+        self._total += len(body) - (previous[0] if previous else 0)
+        if self._total > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        """Drops least recently used entries until the store is under max_bytes."""
+        rows = self.conn.execute("SELECT key, size FROM responses ORDER BY last_used").fetchall()
+        evicted = []
+        for key, size in rows:
+            if self._total <= self.max_bytes:
+                break
+            evicted.append((key,))
+            self._total -= size
+        with self.conn:
+            self.conn.executemany("DELETE FROM responses WHERE key = ?", evicted)
+        logger.info(f"Evicted {len(evicted)} cached responses")
+
+    def close(self):
+        self.conn.close()
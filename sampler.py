@@ -0,0 +1,131 @@
+# sampler.py
+
+import json
+import logging
+import random
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+from utils import VULNERABILITIES, COMPLEXITY
+from solidity_tools import available_detectors
+from config import SAMPLER_DEFAULT_TARGET, SAMPLER_MIN_WEIGHT
+
+logger = logging.getLogger(__name__)
+
+
+class CoverageSampler:
+    """
+    Picks (complexity, vulnerabilities) like utils.get_params, but weighted
+    towards what the dataset is still missing.
+
+    Counts of confirmed findings per detector and of contracts per complexity
+    are loaded from the findings store and kept up to date as contracts are
+    saved. A detector's weight is its remaining deficit against its target
+    (targets come from the distribution config, or `default_target`); complexity
+    is weighted by how far its share of the dataset is below its target share.
+    Picks still in flight count against the deficit, so concurrent jobs do not
+    all chase the same rare detector. By default the candidates are the
+    entries of VULNERABILITIES that this Slither can detect: a name it has no
+    detector for could never be confirmed, would keep its full deficit and
+    would keep `coverage_reached` false forever.
+
+    Target distribution config (JSON):
+        {"default": 100, "detectors": {"reentrancy-eth": 500},
+         "complexity": {"low": 0.2, "medium": 0.4, "high": 0.4}}
+    """
+
+    def __init__(
+        self,
+        findings_store=None,
+        targets: Optional[Dict[str, int]] = None,
+        complexity_shares: Optional[Dict[str, float]] = None,
+        default_target: int = SAMPLER_DEFAULT_TARGET,
+        vulnerabilities: Optional[List[str]] = None,
+        min_weight: float = SAMPLER_MIN_WEIGHT,
+        rng: Optional[random.Random] = None,
+    ):
+        if vulnerabilities is None:
+            vulnerabilities = VULNERABILITIES
+            detectors = available_detectors()
+            if detectors is not None:
+                unconfirmable = [name for name in vulnerabilities if name not in detectors]
+                if unconfirmable:
+                    logger.warning(f"Not sampling vulnerabilities without a Slither detector: {unconfirmable}")
+                vulnerabilities = [name for name in vulnerabilities if name in detectors]
+        self.vulnerabilities = list(vulnerabilities)
+        self.targets = {name: (targets or {}).get(name, default_target) for name in self.vulnerabilities}
+        shares = complexity_shares or {level: 1.0 for level in COMPLEXITY}
+        total = sum(shares.values())
+        self.complexity_shares = {level: shares.get(level, 0.0) / total for level in COMPLEXITY}
+        self.min_weight = min_weight
+        self.rng = rng or random.Random()
+
+        self.detector_counts: Counter = Counter()
+        self.complexity_counts: Counter = Counter()
+        self._pending: Counter = Counter()
+        if findings_store is not None:
+            self.detector_counts.update(findings_store.detector_counts(confirmed=True))
+            # Stores written by uniform runs may hold capitalized levels ('Low')
+            for level, count in findings_store.complexity_counts(confirmed=True).items():
+                self.complexity_counts[(level or "").lower()] += count
+
+    @classmethod
+    def from_config_file(cls, path: str, findings_store=None, default_target: int = SAMPLER_DEFAULT_TARGET,
+                         rng: Optional[random.Random] = None):
+        with open(path, 'r') as f:
+            config = json.load(f)
+        return cls(
+            findings_store,
+            targets=config.get("detectors"),
+            complexity_shares=config.get("complexity"),
+            default_target=config.get("default", default_target),
+            rng=rng,
+        )
+
+    def _deficit(self, name: str) -> float:
+        return max(self.targets[name] - self.detector_counts[name] - self._pending[name], 0)
+
+    def coverage_reached(self) -> bool:
+        """True once every detector has at least its target count of confirmed findings."""
+        return all(self.detector_counts[name] >= target for name, target in self.targets.items())
+
+    def _sample_complexity(self) -> str:
+        total = sum(self.complexity_counts.values())
+        weights = [
+            max(share - (self.complexity_counts[level] / total if total else 0.0), 0.0) + self.min_weight
+            for level, share in self.complexity_shares.items()
+        ]
+        return self.rng.choices(list(self.complexity_shares), weights=weights, k=1)[0]
+
+    def _sample_vulnerabilities(self, k: int) -> List[str]:
+        # Weighted sampling without replacement
+        candidates = list(self.vulnerabilities)
+        weights = [self._deficit(name) + self.min_weight for name in candidates]
+        selected = []
+        for _ in range(min(k, len(candidates))):
+            i = self.rng.choices(range(len(candidates)), weights=weights, k=1)[0]
+            selected.append(candidates.pop(i))
+            weights.pop(i)
+        return selected
+
+    def sample(self) -> Tuple[str, List[str]]:
+        """Returns the complexity and 1-5 vulnerabilities for the next contract."""
+        complexity = self._sample_complexity()
+        vulnerabilities = self._sample_vulnerabilities(self.rng.randint(1, 5))
+        self.reserve(vulnerabilities)
+        logger.info(f"Sampled complexity '{complexity}' with vulnerabilities: {vulnerabilities}")
+        return complexity, vulnerabilities
+
+    def reserve(self, requested: List[str]):
+        """Counts a contract's requested detectors as in flight (done by `sample`; needed for resumed jobs)."""
+        self._pending.update(requested)
+
+    def record(self, complexity: str, requested: List[str], confirmed: List[str]):
+        """Updates counts once a sampled contract is saved with its confirmed detectors."""
+        self._pending.subtract(requested)
+        self.detector_counts.update(confirmed)
+        if confirmed:
+            self.complexity_counts[(complexity or "").lower()] += 1
+
+    def release(self, requested: List[str]):
+        """Drops the in-flight reservation of a sampled contract that was not saved."""
+        self._pending.subtract(requested)
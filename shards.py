@@ -0,0 +1,189 @@
+# shards.py
+
+import fcntl
+import json
+import logging
+import mmap
+import os
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional
+from config import SHARD_MAX_BYTES, SHARD_SYNC_EVERY
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILENAME = 'index.jsonl'
+_SHARD_PATTERN = 'shard-{:05d}.bin'
+
+
+@dataclass
+class ShardRecord:
+    """Zero-copy view of one saved contract; `contract` and `report` are memoryviews into the shard mmap."""
+    id: str
+    labels: List[str]
+    contract: memoryview
+    report: memoryview
+
+
+class ShardWriter:
+    """
+    Appends contracts and reports to size-capped shard files.
+
+    Each record is the contract source followed by its report, written back to
+    back into the current shard; a new shard is started once the current one
+    reaches `max_shard_bytes`. Offsets go to an `index.jsonl` next to the
+    shards, but only after the shard data has been fsynced, so a crash can at
+    worst leave unreferenced bytes at the end of a shard, never an index entry
+    pointing past the data. Fsyncs are batched every `sync_every` records.
+
+    A shard directory has one writer at a time (held with an flock); every
+    writer starts a fresh shard rather than appending to one it did not write.
+    """
+
+    def __init__(self, directory: str, max_shard_bytes: int = SHARD_MAX_BYTES, sync_every: int = SHARD_SYNC_EVERY):
+        self.directory = directory
+        self.max_shard_bytes = max_shard_bytes
+        self.sync_every = max(1, sync_every)
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock_file = open(os.path.join(directory, '.writer.lock'), 'a')
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self._lock_file.close()
+            raise RuntimeError(f"Another process is already writing shards to {directory}")
+
+        self._shard_number = len(_shard_files(directory))
+        self._shard = None
+        self._index = open(os.path.join(directory, INDEX_FILENAME), 'a')
+        self._pending: List[dict] = []
+
+    def _shard_name(self) -> str:
+        return _SHARD_PATTERN.format(self._shard_number)
+
+    def _open_next_shard(self):
+        if self._shard is not None:
+            self.sync()
+            self._shard.close()
+            self._shard_number += 1
+        self._shard = open(os.path.join(self.directory, self._shard_name()), 'ab')
+
+    def append(self, record_id: str, contract: str, report: str, labels: Optional[List[str]] = None) -> dict:
+        """Appends one contract and report; returns their index entry (shard name and offsets)."""
+        contract_bytes, report_bytes = contract.encode(), report.encode()
+        if self._shard is None or (
+            self._shard.tell() and self._shard.tell() + len(contract_bytes) + len(report_bytes) > self.max_shard_bytes
+        ):
+            self._open_next_shard()
+
+        offset = self._shard.tell()
+        self._shard.write(contract_bytes)
+        self._shard.write(report_bytes)
+        entry = {
+            "id": str(record_id),
+            "shard": self._shard_name(),
+            "contract_offset": offset,
+            "contract_length": len(contract_bytes),
+            "report_offset": offset + len(contract_bytes),
+            "report_length": len(report_bytes),
+            "labels": list(labels or []),
+        }
+        self._pending.append(entry)
+        if len(self._pending) >= self.sync_every:
+            self.sync()
+        return entry
+
+    @property
+    def unsynced(self) -> int:
+        """Records appended since the last sync, whose data is not yet durable or indexed."""
+        return len(self._pending)
+
+    def sync(self):
+        """Fsyncs the current shard, then publishes the pending index entries."""
+        if not self._pending:
+            return
+        self._shard.flush()
+        os.fsync(self._shard.fileno())
+        self._index.write("".join(json.dumps(entry, sort_keys=True) + "\n" for entry in self._pending))
+        self._index.flush()
+        os.fsync(self._index.fileno())
+        self._pending = []
+
+    def close(self):
+        self.sync()
+        if self._shard is not None:
+            self._shard.close()
+        self._index.close()
+        fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+        self._lock_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _shard_files(directory: str) -> List[str]:
+    return sorted(name for name in os.listdir(directory) if name.startswith('shard-') and name.endswith('.bin'))
+
+
+class ShardReader:
+    """
+    Read-only access to a shard directory written by ShardWriter.
+
+    The index is loaded once; shards are memory-mapped on first use, so
+    `get` and `by_label` return memoryview slices of the mapped files without
+    copying or opening a file per contract. Views must be released before
+    `close()`.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.entries: Dict[str, dict] = {}
+        self.labels: Dict[str, List[str]] = defaultdict(list)
+        self._maps: Dict[str, mmap.mmap] = {}
+        try:
+            with open(os.path.join(directory, INDEX_FILENAME), 'r') as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    entry = json.loads(line)
+                    self.entries[entry["id"]] = entry
+                    for label in entry["labels"]:
+                        self.labels[label].append(entry["id"])
+        except FileNotFoundError:
+            logger.warning(f"No shard index found in {directory}")
+
+    def _map(self, shard: str) -> mmap.mmap:
+        if shard not in self._maps:
+            with open(os.path.join(self.directory, shard), 'rb') as f:
+                self._maps[shard] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._maps[shard]
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __iter__(self) -> Iterator[ShardRecord]:
+        for record_id in self.entries:
+            yield self.get(record_id)
+
+    def get(self, record_id) -> ShardRecord:
+        entry = self.entries[str(record_id)]
+        view = memoryview(self._map(entry["shard"]))
+        contract_start, report_start = entry["contract_offset"], entry["report_offset"]
+        return ShardRecord(
+            id=entry["id"],
+            labels=entry["labels"],
+            contract=view[contract_start:contract_start + entry["contract_length"]],
+            report=view[report_start:report_start + entry["report_length"]],
+        )
+
+    def by_label(self, label: str) -> Iterator[ShardRecord]:
+        for record_id in self.labels.get(label, []):
+            yield self.get(record_id)
+
+    def close(self):
+        for mapped in self._maps.values():
+            mapped.close()
+        self._maps = {}
@@ -1,63 +1,54 @@
 # solidity_tools.py
-from config import GENERATED_CONTRACT_DIR, GENERATED_REPORT_DIR
-from typing import Type, Optional, Tuple, List
-from langchain.tools import tool
-from pydantic import BaseModel, Field
+from config import GENERATED_CONTRACT_DIR, GENERATED_REPORT_DIR, SAVE_DIRECTORY, SOLC_PATH, SLITHER_PATH, SHARD_DIRNAME, DEDUP_INDEX_FILENAME
+from typing import Type, Optional, Tuple, List, Dict
+from dataclasses import dataclass, field, asdict
+from functools import lru_cache
 import subprocess
+import hashlib
+import inspect
+import json
 import os
 import logging
 from datetime import datetime
 import random
 import tempfile
-from utils import VULNERABILITIES, COMPLEXITY
-from rich.pretty import pprint
+import time
+from utils import VULNERABILITIES, COMPLEXITY, pprint
+from tool_cache import get_tool_cache, tool_version
+from manifest import IdAllocator, Manifest
+from shards import ShardWriter
+from dedup import NearDuplicateIndex
+from preflight import normalize_header, preflight_contract
 import re
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
-# -------------------------------
-# Input Schema Definitions
-# -------------------------------
-
-class CompileSolidityInput(BaseModel):
-    contract_code: str = Field(..., description="Solidity contract code to compile.")
+# LangChain tools for agent mode live in agent_tools, so importing this module
+# (as every compile/analysis worker process does) does not load LangChain or pydantic
+_AGENT_TOOLS = (
+    "CompileSolidityInput", "CompileSolidityBatchInput", "AnalyzeWithSlitherInput", "SaveContractAndReportInput",
+    "compile_solidity", "compile_solidity_batch", "analyze_with_slither", "save_contract_and_report",
+)
 
-class AnalyzeWithSlitherInput(BaseModel):
-    contract_code: str = Field(..., description="Solidity contract code to analyze.")
 
-class SaveContractAndReportInput(BaseModel):
-    contract_code: str = Field(..., description="Solidity contract code to save.")
-    slither_output: str = Field(..., description="Slither analysis report to save.")
-    contract_filename: Optional[str] = Field(
-        default=None, 
-        description="Desired filename for the Solidity contract (e.g., MyContract.sol). If not provided, a timestamped filename will be used."
-    )
-    report_filename: Optional[str] = Field(
-        default=None, 
-        description="Desired filename for the Slither report (e.g., MyContract_SlitherReport.txt). If not provided, a timestamped filename will be used."
-    )
-    save_directory: Optional[str] = Field(
-        default="saved_contracts", 
-        description="Directory where the files will be saved. Defaults to 'saved_contracts' in the current working directory."
-    )
+def __getattr__(name: str):
+    if name in _AGENT_TOOLS:
+        import agent_tools
+        return getattr(agent_tools, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # -------------------------------
 # Contract Template for SPDX and Pragma Solidity
 # -------------------------------
 
-CONTRACT_TEMPLATE = """
-// SPDX-License-Identifier: MIT
-pragma solidity ^0.8.0;
-
-"""
-
-# Helper function to prepend the template to generated contracts
+# Helper function to give generated contracts the SPDX identifier and pragma
 def generate_contract_with_template(contract_body: str) -> str:
     """
-    Prepend the contract body with the SPDX identifier and solidity version pragma.
+    Prepend the contract body with the SPDX identifier and solidity version pragma,
+    replacing any SPDX line and keeping any pragma the body already has.
     """
-    return CONTRACT_TEMPLATE + contract_body
+    return normalize_header(contract_body)
 
 # -------------------------------
 # Helper Function for Sequential Naming
@@ -67,6 +58,9 @@ def get_next_filename(directory: str, extension: str) -> int:
     """
     Get the next available sequential filename number in the given directory.
     Files are named as 0.extension, 1.extension, 2.extension, etc.
+
+    This scans the whole directory; it is only used to seed the IdAllocator
+    of a directory that predates the id counter.
     """
     # Ensure the directory exists, if not create it
     if not os.path.exists(directory):
@@ -86,104 +80,694 @@ def get_next_filename(directory: str, extension: str) -> int:
     return max(numbers) + 1 if numbers else 0
 
 # -------------------------------
-# Tool Definitions Using @tool
+# Plain Pipeline Functions
 # -------------------------------
+# These run in-process without going through an agent, so the direct pipeline
+# (and any worker process) can call them with no LLM round-trip. The @tool
+# definitions in agent_tools are thin wrappers around them.
 
-@tool(
-    args_schema=CompileSolidityInput,
-    return_direct=True
-)
-def compile_solidity(contract_code: str) -> str:
-    """Compiles the Solidity contract."""
-    try:
-        with tempfile.NamedTemporaryFile(suffix='.sol', delete=False) as temp_file:
-            temp_file.write(contract_code.encode())
-            temp_file.flush()
-            pprint(f"Temporary Solidity file created at {temp_file.name}")
+def _tool_cache_key(tool: str, binaries: List[str], flags: List[str], contract_code: str) -> Optional[str]:
+    """
+    Cache key for running `tool` on the source, or None when a binary's version
+    is unknown (in which case the result is not cached).
+    """
+    versions = [tool_version(binary) for binary in binaries]
+    if any(version is None for version in versions):
+        return None
+    return get_tool_cache().make_key(tool, versions, flags, contract_code)
 
+
+def _cached_tool_run(tool: str, binaries: List[str], flags: List[str], contract_code: str, run) -> Tuple[bool, str]:
+    """
+    Returns the cached (success, output) of a tool run on this exact source, or
+    calls `run` and caches its result. `run` returns (success, output, cacheable);
+    errors that never reached the tool are not cached.
+    """
+    cache = get_tool_cache()
+    key = _tool_cache_key(tool, binaries, flags, contract_code) if cache.enabled else None
+    if key is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            logger.info(f"{tool} cache hit for {key[:12]}")
+            return cached["success"], cached["output"]
+
+    success, output, cacheable = run(contract_code)
+    if key is not None and cacheable:
+        cache.put(key, {"success": success, "output": output})
+    return success, output
+
+
+# Start of a compile output when solc never ran (missing binary, OS error) rather than reporting diagnostics
+COMPILE_TOOL_ERROR = "Error during compilation"
+
+
+# Source file name the tools are run on, so their output (and the cached output) does not name a temp path
+_SOURCE_NAME = 'Contract.sol'
+
+
+def _run_on_source(command: List[str], contract_code: str) -> subprocess.CompletedProcess:
+    """Runs `command` on the source, written as _SOURCE_NAME into a temporary directory used as cwd."""
+    with tempfile.TemporaryDirectory() as work_dir:
+        with open(os.path.join(work_dir, _SOURCE_NAME), 'w') as f:
+            f.write(contract_code)
+        return subprocess.run([*command, _SOURCE_NAME], cwd=work_dir, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+
+def _run_solc(contract_code: str) -> Tuple[bool, str, bool]:
+    try:
         # Compile the contract using solc
-        result = subprocess.run(['solc', temp_file.name], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        
+        result = _run_on_source([SOLC_PATH], contract_code)
+
         if result.returncode != 0:
             logger.error(f"Compilation failed: {result.stderr.decode()}")
-            return f"Compilation failed: {result.stderr.decode()}"  # Return the error message
+            return False, f"Compilation failed: {result.stderr.decode()}", True
 
-        return result.stdout.decode()  # Return the compiled contract binary
+        return True, result.stdout.decode(), True
 
     except Exception as e:
-        logger.error(f"Error during compilation: {e}")
-        return f"Error during compilation: {e}"  # Return the error message
+        logger.error(f"{COMPILE_TOOL_ERROR}: {e}")
+        return False, f"{COMPILE_TOOL_ERROR}: {e}", False
 
 
-@tool(
-    args_schema=AnalyzeWithSlitherInput,
-    return_direct=True
-)
-def analyze_with_slither(contract_code: str) -> str:
-    """Analyzes the Solidity contract using Slither."""
+def _run_slither(contract_code: str) -> Tuple[bool, str, bool]:
     try:
-        with tempfile.NamedTemporaryFile(suffix='.sol', delete=False) as temp_file:
-            temp_file.write(contract_code.encode())
-            temp_file.flush()
-            pprint(f"Temporary Solidity file created for Slither analysis at {temp_file.name}")
-
         # Analyze the contract using Slither
-        result = subprocess.run(['slither', temp_file.name], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        
+        result = _run_on_source([SLITHER_PATH], contract_code)
+
         if result.returncode != 0:
             logger.error(f"Slither analysis failed: {result.stderr.decode()}")
-            return f"Slither analysis failed: {result.stderr.decode()}"  # Return the error message
+            return False, f"Slither analysis failed: {result.stderr.decode()}", True
 
-        return result.stdout.decode()  # Return the analysis report
+        return True, result.stdout.decode(), True
 
     except Exception as e:
         logger.error(f"Error during Slither analysis: {e}")
-        return f"Error during Slither analysis: {e}"  # Return the error message
+        return False, f"Error during Slither analysis: {e}", False
 
 
-@tool(
-    args_schema=SaveContractAndReportInput,
-    return_direct=True
-)
-def save_contract_and_report(
-    contract_code: str, 
-    slither_output: str, 
-    contract_filename: Optional[str] = None, 
-    report_filename: Optional[str] = None, 
-    save_directory: Optional[str] = "saved_contracts"
-) -> str:
-    """Saves the Solidity contract and Slither report with dynamic naming to prevent overwriting."""
+def compile_contract(contract_code: str) -> Tuple[bool, str]:
+    """
+    Compile the contract with solc. Results for byte-identical sources are
+    served from the tool cache.
+
+    Returns:
+        Tuple[bool, str]: Whether compilation succeeded, and the compiler output
+        (or the error message when it failed).
+    """
+    return _cached_tool_run('solc', [SOLC_PATH], [_SOURCE_NAME], contract_code, _run_solc)
+
+
+def analyze_contract(contract_code: str) -> Tuple[bool, str]:
+    """
+    Analyze the contract with Slither. Results for byte-identical sources are
+    served from the tool cache.
+
+    Returns:
+        Tuple[bool, str]: Whether Slither exited cleanly, and the analysis report
+        (or the error message when it did not).
+    """
+    # Slither compiles through solc, so its version is part of the key too
+    return _cached_tool_run('slither', [SLITHER_PATH, SOLC_PATH], [_SOURCE_NAME], contract_code, _run_slither)
+
+
+# -------------------------------
+# Combined Compile + Analysis
+# -------------------------------
+# validate_contract compiles once through `solc --standard-json` and hands those
+# artifacts straight to Slither's Python API, so the source is not compiled a
+# second time by crytic-compile. When Slither is not importable in this
+# interpreter it falls back to the Slither CLI on the same file.
+#
+# When the requested vulnerabilities are given, a cheap verification pass runs
+# only their detectors first; the full detector pass is spent only on contracts
+# that pass it.
+
+VERIFY_POLICIES = ("off", "any", "all")
+
+
+@dataclass
+class ValidationResult:
+    """Compile and analysis outcome of one contract."""
+    compiled: bool
+    compilation_output: str
+    analyzed: bool = False
+    analysis_output: str = ""
+    findings: List[dict] = field(default_factory=list)
+    verified: bool = True
+    confirmed: List[str] = field(default_factory=list)
+    missing: List[str] = field(default_factory=list)
+    timings: Dict[str, float] = field(default_factory=dict)  # Seconds per step; empty for cached results
+    tool_error: bool = False  # solc or Slither could not be run at all; never cached
+
+
+def _solc_version_number() -> Optional[str]:
+    """Returns the bare solc version (e.g. '0.8.19') parsed from `solc --version`."""
+    match = re.search(r"Version: (\d+\.\d+\.\d+)", tool_version(SOLC_PATH) or "")
+    return match.group(1) if match else None
+
+
+def run_solc_standard_json(sources: Dict[str, str]) -> dict:
+    """
+    Compiles the given {source name: content} mapping in a single
+    `solc --standard-json` invocation over stdin and returns solc's JSON output.
+    Raises RuntimeError when solc itself cannot be run.
+    """
+    solc_input = {
+        "language": "Solidity",
+        "sources": {name: {"content": content} for name, content in sources.items()},
+        "settings": {
+            "optimizer": {"enabled": False},
+            "outputSelection": {
+                "*": {"*": ["abi", "evm.bytecode", "evm.deployedBytecode"], "": ["ast"]}
+            },
+        },
+    }
+    result = subprocess.run(
+        [SOLC_PATH, '--standard-json'],
+        input=json.dumps(solc_input).encode(),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    if result.returncode != 0 and not result.stdout:
+        raise RuntimeError(result.stderr.decode())
+    return json.loads(result.stdout.decode())
+
+
+def _solc_errors(solc_output: dict) -> List[dict]:
+    return [error for error in solc_output.get("errors", []) if error.get("severity") == "error"]
+
+
+def _format_solc_diagnostics(diagnostics: List[dict]) -> str:
+    return "\n".join(d.get("formattedMessage") or d.get("message", "") for d in diagnostics)
+
+
+@lru_cache(maxsize=None)
+def _load_slither_api():
+    """Imports Slither's Python API once per process, or returns None if it is unavailable."""
     try:
-        # Ensure the contract and report directories exist
-        os.makedirs(os.path.join(save_directory, GENERATED_CONTRACT_DIR), exist_ok=True)
-        os.makedirs(os.path.join(save_directory, GENERATED_REPORT_DIR), exist_ok=True)
+        from crytic_compile import CryticCompile
+        from crytic_compile.compilation_unit import CompilationUnit
+        from crytic_compile.compiler.compiler import CompilerVersion
+        from crytic_compile.platform.solc_standard_json import SolcStandardJson, parse_standard_json_output
+        from slither import Slither
+        from slither.detectors import all_detectors
+        from slither.detectors.abstract_detector import AbstractDetector
+    except ImportError:
+        return None
+
+    class PrecompiledStandardJson(SolcStandardJson):
+        """crytic-compile platform that loads existing solc output instead of running solc."""
+
+        def __init__(self, solc_input: dict, solc_output: dict, solc_version: str):
+            super().__init__(solc_input)
+            self._solc_output = solc_output
+            self._solc_version = solc_version
+
+        def compile(self, crytic_compile, **kwargs):
+            compilation_unit = CompilationUnit(crytic_compile, "standard_json")
+            compilation_unit.compiler_version = CompilerVersion(
+                compiler="solc", version=self._solc_version, optimized=False
+            )
+            parse_standard_json_output(self._solc_output, compilation_unit)
+
+        def clean(self, **kwargs):
+            pass
+
+    detectors = {
+        d.ARGUMENT: d for d in (getattr(all_detectors, name) for name in dir(all_detectors))
+        if inspect.isclass(d) and issubclass(d, AbstractDetector)
+    }
+    return CryticCompile, Slither, PrecompiledStandardJson, detectors
+
+
+@lru_cache(maxsize=None)
+def available_detectors() -> Optional[frozenset]:
+    """
+    Names of the Slither detectors available in this environment, or None when
+    they cannot be listed. Used to avoid passing unknown names to `--detect`.
+    """
+    api = _load_slither_api()
+    if api is not None:
+        return frozenset(api[3])
+    try:
+        result = subprocess.run([SLITHER_PATH, '--list-detectors-json'], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        return frozenset(d["check"] for d in json.loads(result.stdout.decode()))
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
 
-        # Get the next available file number in the contract directory
-        next_number = get_next_filename(os.path.join(save_directory, GENERATED_CONTRACT_DIR), 'sol')
 
-        # Define filenames dynamically if not provided
-        contract_filename = contract_filename or f"{next_number}.sol"
-        report_filename = report_filename or f"{next_number}_slither.json"
+def _slither_report(findings: List[dict]) -> str:
+    """Serializes findings in the same shape as `slither --json` output."""
+    return json.dumps({"success": True, "error": None, "results": {"detectors": findings}}, indent=2)
 
-        # Apply the contract template (SPDX identifier and pragma solidity)
-        contract_code_with_template = generate_contract_with_template(contract_code)
 
-        # Define full paths
-        contract_path = os.path.join(save_directory, GENERATED_CONTRACT_DIR, contract_filename)
-        report_path = os.path.join(save_directory, GENERATED_REPORT_DIR, report_filename)
+def normalize_findings(findings: List[dict]) -> List[dict]:
+    """
+    Reduces raw Slither detector results to compact records with the detector,
+    impact, confidence, first description line and the source lines involved.
+    """
+    normalized = []
+    for finding in findings:
+        lines = sorted({
+            line
+            for element in finding.get("elements", [])
+            for line in element.get("source_mapping", {}).get("lines", [])
+        })
+        normalized.append({
+            "detector": finding.get("check"),
+            "impact": finding.get("impact"),
+            "confidence": finding.get("confidence"),
+            "description": (finding.get("description") or "").strip().split("\n")[0],
+            "lines": lines,
+        })
+    return normalized
+
+
+class _SlitherSession:
+    """
+    Runs Slither detectors against one precompiled contract. With the Python API
+    the contract is parsed once and detector passes are incremental; otherwise
+    each pass is a Slither CLI run restricted with --detect.
+    """
+
+    def __init__(self, source_path: str, solc_output: dict):
+        self.source_path = source_path
+        self.slither = None
+        self._detectors = {}
+
+        api = _load_slither_api()
+        solc_version = _solc_version_number()
+        if api is None or solc_version is None:
+            return
+        CryticCompile, Slither, PrecompiledStandardJson, self._detectors = api
+        try:
+            platform = PrecompiledStandardJson({"sources": {source_path: {"urls": [source_path]}}}, solc_output, solc_version)
+            self.slither = Slither(CryticCompile(platform))
+        except Exception as e:
+            logger.warning(f"Slither API could not load the compilation, falling back to the Slither CLI: {e}")
+
+    def run(self, detector_names: Optional[List[str]] = None) -> Tuple[bool, str, List[dict]]:
+        """Runs the named detectors (all when None) that have not run yet in this session."""
+        if self.slither is None:
+            return _analyze_with_slither_cli(self.source_path, detector_names)
+
+        registered = {type(d).ARGUMENT for d in self.slither.detectors}
+        names = self._detectors if detector_names is None else detector_names
+        before = len(self.slither.detectors)
+        for name in names:
+            if name in self._detectors and name not in registered:
+                self.slither.register_detector(self._detectors[name])
+        try:
+            findings = [
+                finding for detector in self.slither.detectors[before:]
+                for finding in detector.detect() if finding
+            ]
+        except Exception as e:
+            logger.warning(f"Slither API analysis failed, falling back to the Slither CLI: {e}")
+            self.slither = None
+            return _analyze_with_slither_cli(self.source_path, detector_names)
+        return True, _slither_report(findings), findings
+
+
+def _analyze_with_slither_cli(source_path: str, detector_names: Optional[List[str]] = None) -> Tuple[bool, str, List[dict]]:
+    command = [SLITHER_PATH, source_path, '--json', '-']
+    if detector_names is not None:
+        known = available_detectors()
+        detector_names = [name for name in detector_names if known is None or name in known]
+        if not detector_names:
+            return True, _slither_report([]), []
+        command += ['--detect', ','.join(detector_names)]
+    result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    # Slither exits non-zero whenever it reports findings, so trust the JSON "success" flag instead
+    try:
+        output = json.loads(result.stdout.decode())
+    except ValueError:
+        return False, f"Slither analysis failed: {result.stderr.decode()}", []
+    if not output.get("success"):
+        return False, f"Slither analysis failed: {output.get('error')}", []
+
+    findings = output.get("results", {}).get("detectors", [])
+    return True, _slither_report(findings), findings
+
+
+def _compile_for_analysis(contract_code: str, work_dir: str):
+    """
+    Writes the source into work_dir and compiles it with solc standard JSON.
+    Returns (compiled, compilation_output, solc_output, source_path).
+    """
+    source_path = os.path.join(work_dir, _SOURCE_NAME)
+    with open(source_path, 'w') as f:
+        f.write(contract_code)
+
+    solc_output = run_solc_standard_json({source_path: contract_code})
+    errors = _solc_errors(solc_output)
+    if errors:
+        # Slither needs the real path as the source unit name; the (cached) diagnostics do not
+        message = _format_solc_diagnostics(errors).replace(source_path, _SOURCE_NAME)
+        logger.error(f"Compilation failed: {message}")
+        return False, f"Compilation failed: {message}", solc_output, source_path
+
+    contract_names = [name for contracts in solc_output.get("contracts", {}).values() for name in contracts]
+    warnings = _format_solc_diagnostics(solc_output.get("errors", [])).replace(source_path, _SOURCE_NAME)
+    compilation_output = f"Compiled contracts: {', '.join(contract_names)}" + (f"\n{warnings}" if warnings else "")
+    return True, compilation_output, solc_output, source_path
+
+
+def _split_requested(findings: List[dict], requested: List[str]) -> Tuple[List[str], List[str]]:
+    found = {finding.get("check") for finding in findings}
+    confirmed = [name for name in requested if name in found]
+    missing = [name for name in requested if name not in found]
+    return confirmed, missing
+
+
+def _passes_policy(confirmed: List[str], missing: List[str], policy: str) -> bool:
+    if policy == "all":
+        return not missing
+    if policy == "any":
+        return bool(confirmed)
+    return True
+
+
+def _validate_uncached(contract_code: str, requested: Optional[List[str]], policy: str, full: bool) -> ValidationResult:
+    timings: Dict[str, float] = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        start = time.perf_counter()
+        compiled, compilation_output, solc_output, source_path = _compile_for_analysis(contract_code, work_dir)
+        timings["compile"] = time.perf_counter() - start
+        if not compiled:
+            return ValidationResult(compiled=False, compilation_output=compilation_output, timings=timings)
+
+        session = _SlitherSession(source_path, solc_output)
+        findings: List[dict] = []
+        confirmed: List[str] = []
+        missing: List[str] = []
+
+        if requested and policy != "off":
+            start = time.perf_counter()
+            analyzed, analysis_output, findings = session.run(requested)
+            timings["slither_targeted"] = time.perf_counter() - start
+            if not analyzed:
+                logger.error(analysis_output)
+                return ValidationResult(True, compilation_output, False, analysis_output, verified=False, timings=timings)
+            confirmed, missing = _split_requested(findings, requested)
+            if not _passes_policy(confirmed, missing, policy) or not full:
+                return ValidationResult(
+                    True, compilation_output, True, analysis_output, findings,
+                    verified=_passes_policy(confirmed, missing, policy), confirmed=confirmed, missing=missing,
+                    timings=timings,
+                )
+
+        # Full pass; with the Python API only detectors that have not run yet are executed
+        start = time.perf_counter()
+        analyzed, analysis_output, more_findings = session.run(None)
+        timings["slither_full"] = time.perf_counter() - start
+        if not analyzed:
+            logger.error(analysis_output)
+            # Keeps what the targeted pass established
+            return ValidationResult(
+                True, compilation_output, False, analysis_output, findings,
+                verified=_passes_policy(confirmed, missing, policy), confirmed=confirmed, missing=missing,
+                timings=timings,
+            )
+        if session.slither is not None:
+            findings = findings + more_findings
+            analysis_output = _slither_report(findings)
+        else:
+            findings = more_findings
+        if requested:
+            confirmed, missing = _split_requested(findings, requested)
+        return ValidationResult(True, compilation_output, True, analysis_output, findings,
+                                confirmed=confirmed, missing=missing, timings=timings)
+
+
+def _validate(contract_code: str, requested: Optional[List[str]], policy: str, full: bool) -> ValidationResult:
+    if policy not in VERIFY_POLICIES:
+        raise ValueError(f"Unknown verification policy {policy!r}, expected one of {VERIFY_POLICIES}")
+
+    cache = get_tool_cache()
+    flags = [_SOURCE_NAME, policy, "full" if full else "targeted", *(requested or [])]
+    key = _tool_cache_key('validate', [SOLC_PATH, SLITHER_PATH], flags, contract_code) if cache.enabled else None
+    if key is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            logger.info(f"validate cache hit for {key[:12]}")
+            return ValidationResult(**{**cached, "timings": {}})
+
+    try:
+        result = _validate_uncached(contract_code, requested, policy, full)
+    except Exception as e:
+        logger.error(f"Error during validation: {e}")
+        return ValidationResult(compiled=False, compilation_output=f"{COMPILE_TOOL_ERROR}: {e}", tool_error=True)
+
+    # A failed Slither run may succeed next time, so only finished validations are cached
+    if key is not None and (result.analyzed or not result.compiled):
+        cache.put(key, asdict(result))
+    return result
+
+
+def validate_contract(contract_code: str, requested: Optional[List[str]] = None, policy: str = "off") -> ValidationResult:
+    """
+    Compile the contract once with solc and analyze the same compilation with
+    Slither. Meant to run inside a long-lived worker process, where Slither's
+    modules stay imported between contracts. Results are served from the tool
+    cache for byte-identical sources.
+
+    With `requested` detectors and a policy of "any" or "all", a targeted pass
+    runs only those detectors first, and the full pass is skipped (verified=False)
+    unless at least one / all of them are confirmed.
+    """
+    return _validate(contract_code, requested, policy, full=True)
 
-        # Save the Solidity contract
-        with open(contract_path, 'w') as f:
-            f.write(contract_code_with_template)
-        pprint(f"Saved Solidity contract to {contract_path}")
 
-        # Save the Slither report
-        with open(report_path, 'w') as f:
-            f.write(slither_output)
-        pprint(f"Saved Slither report to {report_path}")
+def verify_vulnerabilities(contract_code: str, requested: List[str], policy: str = "all") -> ValidationResult:
+    """
+    Fast verification only: compile once and run just the requested detectors.
+    The result lists which requested vulnerabilities were confirmed and which
+    are missing, with the findings for them.
+    """
+    return _validate(contract_code, requested, "all" if policy == "off" else policy, full=False)
+
+
+# -------------------------------
+# Batch Compilation
+# -------------------------------
+
+def _diagnostics_by_source(solc_output: dict, names: List[str]) -> Dict[str, List[dict]]:
+    """
+    Groups solc diagnostics by source name. Diagnostics without a source
+    location cannot be attributed, so they are reported against every source.
+    """
+    grouped = {name: [] for name in names}
+    for diagnostic in solc_output.get("errors", []):
+        source = diagnostic.get("sourceLocation", {}).get("file")
+        for name in ([source] if source in grouped else names):
+            grouped[name].append(diagnostic)
+    return grouped
+
+
+# Source name stored in cached batch results in place of the batch-position name,
+# so a hit at another position or in another batch names its own source
+_BATCH_CACHE_SOURCE = "<source>"
+
+
+def _batch_source_name(i: int) -> str:
+    return f"contract_{i}.sol"
+
+
+def compile_contracts(contract_codes: List[str]) -> List[Tuple[bool, str]]:
+    """
+    Compile many contracts with a single `solc --standard-json` call over stdin.
+
+    Diagnostics are split back out per source. solc stops code generation for
+    the whole batch when any source has an error, so sources that were clean
+    in a failing batch are compiled again without the broken ones. Cached
+    results are used for byte-identical sources; their diagnostics are stored
+    with a placeholder source name and report the source's current position.
+
+    Returns:
+        List[Tuple[bool, str]]: One (compiled, output) pair per input, in order,
+        in the same form as compile_contract.
+    """
+    results: List[Optional[Tuple[bool, str]]] = [None] * len(contract_codes)
+    cache = get_tool_cache()
+    keys = [
+        _tool_cache_key('solc-batch', [SOLC_PATH], [_BATCH_CACHE_SOURCE], code) if cache.enabled else None
+        for code in contract_codes
+    ]
+
+    pending = []
+    for i, key in enumerate(keys):
+        cached = cache.get(key) if key is not None else None
+        if cached is not None:
+            results[i] = (cached["success"], cached["output"].replace(_BATCH_CACHE_SOURCE, _batch_source_name(i)))
+        else:
+            pending.append(i)
+
+    while pending:
+        names = {_batch_source_name(i): i for i in pending}
+        try:
+            solc_output = run_solc_standard_json({name: contract_codes[i] for name, i in names.items()})
+        except Exception as e:
+            logger.error(f"Error during batch compilation: {e}")
+            for i in pending:
+                results[i] = (False, f"{COMPILE_TOOL_ERROR}: {e}")
+            break
+
+        diagnostics = _diagnostics_by_source(solc_output, list(names))
+        compiled_sources = solc_output.get("contracts", {})
+        failed = {name for name, items in diagnostics.items() if _solc_errors({"errors": items})}
+        clean = [name for name in names if name not in failed]
+
+        for name in failed:
+            message = _format_solc_diagnostics(_solc_errors({"errors": diagnostics[name]}))
+            results[names[name]] = (False, f"Compilation failed: {message}")
+
+        if failed and not compiled_sources:
+            # solc produced no artifacts for the batch; retry the clean sources alone
+            pending = [names[name] for name in clean]
+            continue
+
+        for name in clean:
+            warnings = _format_solc_diagnostics(diagnostics[name])
+            contract_names = list(compiled_sources.get(name, {}))
+            output = f"Compiled contracts: {', '.join(contract_names)}" + (f"\n{warnings}" if warnings else "")
+            results[names[name]] = (True, output)
+        pending = []
+
+    for i, (key, result) in enumerate(zip(keys, results)):
+        if key is not None and not result[1].startswith(COMPILE_TOOL_ERROR):
+            output = result[1].replace(_batch_source_name(i), _BATCH_CACHE_SOURCE)
+            cache.put(key, {"success": result[0], "output": output})
+
+    return results
+
+
+def _dataset_root(save_directory: str) -> str:
+    """Directory holding the contracts/reports subdirectories, the id counter and the manifest."""
+    return os.path.dirname(os.path.join(save_directory, GENERATED_CONTRACT_DIR))
+
+
+def get_id_allocator(save_directory: str) -> IdAllocator:
+    """
+    Id allocator for a save directory. A directory without a counter is seeded
+    once from its existing `N.sol` files.
+    """
+    contract_dir = os.path.join(save_directory, GENERATED_CONTRACT_DIR)
+    return IdAllocator(_dataset_root(save_directory), seed=lambda: get_next_filename(contract_dir, 'sol'))
+
+
+def open_shard_writer(save_directory: str = SAVE_DIRECTORY) -> ShardWriter:
+    """Shard writer for the dataset under a save directory (see save_contract_record's shard_writer)."""
+    return ShardWriter(os.path.join(_dataset_root(save_directory), SHARD_DIRNAME))
+
+
+def open_dedup_index(threshold: float, save_directory: str = SAVE_DIRECTORY) -> NearDuplicateIndex:
+    """Near-duplicate index persisted alongside the dataset under a save directory."""
+    return NearDuplicateIndex(os.path.join(_dataset_root(save_directory), DEDUP_INDEX_FILENAME), threshold)
+
+
+def save_contract_record(
+    contract_code: str,
+    slither_output: str,
+    contract_filename: Optional[str] = None,
+    report_filename: Optional[str] = None,
+    save_directory: Optional[str] = SAVE_DIRECTORY,
+    params: Optional[dict] = None,
+    timings: Optional[dict] = None,
+    report_suffix: str = "_slither.json",
+    shard_writer: Optional[ShardWriter] = None,
+    labels: Optional[List[str]] = None,
+    append_manifest: bool = True,
+) -> dict:
+    """
+    Save the Solidity contract and Slither report and append their manifest
+    record, which is returned. Without filenames, the contract gets the next id
+    from the atomic allocator rather than a directory scan.
+
+    With a shard_writer both are appended to the packed shards (tagged with
+    `labels`) instead of written as two files; the manifest record then points
+    at the shard and its offsets. Shard data is only durable after the
+    writer's next sync, so callers that batch syncs pass append_manifest=False
+    and append the record with append_manifest_record once it is synced.
+    """
+    if shard_writer is not None:
+        contract_id = str(get_id_allocator(save_directory).allocate())
+        contract_code_with_template = generate_contract_with_template(contract_code)
+        entry = shard_writer.append(contract_id, contract_code_with_template, slither_output, labels)
+        shard_path = os.path.join(shard_writer.directory, entry["shard"])
+        record = {
+            **entry,
+            "contract_path": shard_path,
+            "report_path": shard_path,
+            "params": params or {},
+            "contract_sha256": hashlib.sha256(contract_code_with_template.encode()).hexdigest(),
+            "report_sha256": hashlib.sha256(slither_output.encode()).hexdigest(),
+            "timings": timings or {},
+        }
+        return append_manifest_record(record, save_directory) if append_manifest else record
+
+    # Ensure the contract and report directories exist
+    os.makedirs(os.path.join(save_directory, GENERATED_CONTRACT_DIR), exist_ok=True)
+    os.makedirs(os.path.join(save_directory, GENERATED_REPORT_DIR), exist_ok=True)
+
+    # Define filenames dynamically if not provided
+    if contract_filename is None:
+        contract_id = str(get_id_allocator(save_directory).allocate())
+        contract_filename = f"{contract_id}.sol"
+    else:
+        contract_id = os.path.splitext(contract_filename)[0]
+    report_filename = report_filename or f"{contract_id}{report_suffix}"
+
+    # Apply the contract template (SPDX identifier and pragma solidity)
+    contract_code_with_template = generate_contract_with_template(contract_code)
+
+    # Define full paths
+    contract_path = os.path.join(save_directory, GENERATED_CONTRACT_DIR, contract_filename)
+    report_path = os.path.join(save_directory, GENERATED_REPORT_DIR, report_filename)
+
+    # Save the Solidity contract
+    with open(contract_path, 'w') as f:
+        f.write(contract_code_with_template)
+    pprint(f"Saved Solidity contract to {contract_path}")
+
+    # Save the Slither report
+    with open(report_path, 'w') as f:
+        f.write(slither_output)
+    pprint(f"Saved Slither report to {report_path}")
+
+    return Manifest(_dataset_root(save_directory)).append({
+        "id": contract_id,
+        "contract_path": contract_path,
+        "report_path": report_path,
+        "params": params or {},
+        "contract_sha256": hashlib.sha256(contract_code_with_template.encode()).hexdigest(),
+        "report_sha256": hashlib.sha256(slither_output.encode()).hexdigest(),
+        "timings": timings or {},
+    })
+
+
+def append_manifest_record(record: dict, save_directory: Optional[str] = SAVE_DIRECTORY) -> dict:
+    """Appends a record returned by save_contract_record(..., append_manifest=False) to the manifest."""
+    return Manifest(_dataset_root(save_directory)).append(record)
+
+
+def save_contract_files(
+    contract_code: str,
+    slither_output: str,
+    contract_filename: Optional[str] = None,
+    report_filename: Optional[str] = None,
+    save_directory: Optional[str] = SAVE_DIRECTORY
+) -> str:
+    """
+    Save the Solidity contract and Slither report, using sequential ids when
+    no filenames are given. Returns a status message with the saved paths.
+    """
+    try:
+        record = save_contract_record(contract_code, slither_output, contract_filename, report_filename, save_directory)
 
         # Return success message with file paths
-        return f"Files saved successfully:\n- Contract: {contract_path}\n- Slither Report: {report_path}"
+        return f"Files saved successfully:\n- Contract: {record['contract_path']}\n- Slither Report: {record['report_path']}"
 
     except Exception as e:
         logger.error(f"Error saving files: {e}", exc_info=True)
@@ -0,0 +1,107 @@
+# startup_benchmark.py
+"""
+Startup-time benchmark for the entry points that are started most often.
+
+Each target runs in a fresh interpreter, `--repeats` times, and reports the
+median wall time of the process and of the import itself. Targets that
+should start light (compile/analysis worker processes, the pipeline, the
+CLI's --help) must not load the agent frameworks; with --max-ms the run
+fails when one of them is over budget or loads a heavy module, so it can
+guard against an eager import creeping back in.
+
+    python startup_benchmark.py --repeats 5 --max-ms 400
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+# Loaded only in agent mode or for Cohere calls; light targets must not pull them in
+HEAVY_MODULES = ("langchain", "langchain_core", "langchain_cohere", "pydantic", "rich", "httpx")
+
+# Probe run in the child: times the statement and reports which heavy modules it loaded
+_PROBE = '''
+import contextlib, io, json, sys, time
+start = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()):
+    try:
+{statement}
+    except SystemExit:
+        pass
+elapsed = time.perf_counter() - start
+heavy = sorted(name for name in {heavy!r} if name in sys.modules)
+sys.stderr.write("\\n" + json.dumps({{"import_seconds": elapsed, "heavy": heavy}}) + "\\n")
+'''
+
+# name -> (statement, expected to stay light)
+TARGETS = {
+    "worker (solidity_tools)": ("import solidity_tools", True),
+    "pipeline": ("import pipeline", True),
+    "cli --help": ("sys.argv = ['main.py', '--help']; import runpy; runpy.run_path('main.py', run_name='__main__')", True),
+    "agent tools": ("import agent_tools", False),
+}
+
+
+def measure(statement: str, repeats: int, cwd: str) -> Dict[str, object]:
+    code = _PROBE.format(statement=f"        {statement}", heavy=HEAVY_MODULES)
+    wall, imports, heavy = [], [], set()
+    for _ in range(repeats):
+        start = time.perf_counter()
+        completed = subprocess.run([sys.executable, "-c", code], cwd=cwd, capture_output=True, text=True)
+        wall.append(time.perf_counter() - start)
+        if completed.returncode != 0:
+            raise RuntimeError(f"Probe {statement!r} failed:\n{completed.stderr}")
+        report = json.loads(completed.stderr.strip().splitlines()[-1])
+        imports.append(report["import_seconds"])
+        heavy.update(report["heavy"])
+    return {
+        "wall_ms": statistics.median(wall) * 1000,
+        "import_ms": statistics.median(imports) * 1000,
+        "heavy_modules": sorted(heavy),
+    }
+
+
+def run_startup_benchmark(repeats: int = 5, targets: Dict[str, tuple] = TARGETS) -> List[dict]:
+    package_dir = os.path.dirname(os.path.abspath(__file__))
+    return [
+        {"target": name, "light": light, **measure(statement, repeats, package_dir)}
+        for name, (statement, light) in targets.items()
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure interpreter startup and import time of the pipeline entry points.")
+    parser.add_argument("--repeats", type=int, default=5, help="Fresh interpreters per target (the median is reported).")
+    parser.add_argument("--max-ms", type=float, help="Fail when a light target's median wall time exceeds this many milliseconds.")
+    parser.add_argument("--json-out", help="Also write the results as JSON to this file.")
+    args = parser.parse_args()
+
+    results = run_startup_benchmark(max(1, args.repeats))
+    print(f"{'target':<26}{'wall ms':>10}{'import ms':>12}  heavy modules")
+    for result in results:
+        print(f"{result['target']:<26}{result['wall_ms']:>10.0f}{result['import_ms']:>12.0f}  {', '.join(result['heavy_modules']) or '-'}")
+    if args.json_out:
+        with open(args.json_out, "w") as f:
+            json.dump(results, f, indent=2)
+
+    problems = [
+        f"{result['target']} loads {', '.join(result['heavy_modules'])}"
+        for result in results if result["light"] and result["heavy_modules"]
+    ]
+    if args.max_ms is not None:
+        problems += [
+            f"{result['target']} takes {result['wall_ms']:.0f} ms (budget {args.max_ms:.0f} ms)"
+            for result in results if result["light"] and result["wall_ms"] > args.max_ms
+        ]
+    if problems:
+        print("\n".join(["", "Startup regressions:", *problems]))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
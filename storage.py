@@ -1,32 +1,62 @@
 # storage.py
 
 import os
+import hashlib
 from datetime import datetime
 import logging
 import json
-from rich.pretty import pprint
-from config import GENERATED_CONTRACT_DIR, GENERATED_REPORT_DIR
+from typing import Optional
+from utils import pprint
+from config import SAVE_DIRECTORY, DATASET_ROOT, GENERATED_CONTRACT_DIR, GENERATED_REPORT_DIR
+from manifest import IdAllocator, Manifest
+
+logger = logging.getLogger(__name__)
+
+# Same dataset as the save tools, so ids and the manifest are shared
+CONTRACT_DIR = os.path.join(SAVE_DIRECTORY, GENERATED_CONTRACT_DIR)
+REPORT_DIR = os.path.join(SAVE_DIRECTORY, GENERATED_REPORT_DIR)
 
 class ContractStorage:
     def __init__(self):
         self._create_directories()
+        self.id_allocator = IdAllocator(DATASET_ROOT, seed=self._seed_id)
+        self.manifest = Manifest(DATASET_ROOT)
 
     def _create_directories(self):
         try:
-            os.makedirs(GENERATED_CONTRACT_DIR, exist_ok=True)
-            os.makedirs(GENERATED_REPORT_DIR, exist_ok=True)
+            os.makedirs(CONTRACT_DIR, exist_ok=True)
+            os.makedirs(REPORT_DIR, exist_ok=True)
             pprint("Output directories created or already exist.")
         except Exception as e:
             logger.error(f"Error creating directories: {e}")
             raise e
 
-    def save_generated_contract(self, contract_code: str) -> str:
-        timestamp = datetime.now().strftime("%H%M%S%f")
-        filename = f"contract_{timestamp}.sol"
-        filepath = os.path.join(GENERATED_CONTRACT_DIR, filename)
+    @staticmethod
+    def _seed_id() -> int:
+        """One-time scan used only when the output directory has no id counter yet."""
+        from solidity_tools import get_next_filename
+        return get_next_filename(CONTRACT_DIR, 'sol')
+
+    def save_generated_contract(self, contract_code: str, params: Optional[dict] = None) -> str:
+        """
+        Saves the contract under the next id from the atomic allocator and
+        appends its manifest record.
+
+        Returns:
+            str: The file path of the saved contract.
+        """
+        contract_id = self.id_allocator.allocate()
+        filename = f"{contract_id}.sol"
+        filepath = os.path.join(CONTRACT_DIR, filename)
         try:
             with open(filepath, 'w') as f:
                 f.write(contract_code)
+            self.manifest.append({
+                "id": str(contract_id),
+                "contract_path": filepath,
+                "params": params or {},
+                "contract_sha256": hashlib.sha256(contract_code.encode()).hexdigest(),
+            })
             pprint(f"Generated contract saved at {filepath}.")
             return filepath
         except Exception as e:
@@ -36,20 +66,26 @@ class ContractStorage:
     def save_slither_report(self, contract_filepath: str, slither_report: str) -> str:
         """
         Saves the Slither analysis report with the same base name as the contract.
-        
+
         Parameters:
             contract_filepath (str): The file path of the validated contract.
             slither_report (str): The Slither analysis report content.
-        
+
         Returns:
             str: The file path where the Slither report is saved.
         """
         try:
             base_name = os.path.splitext(os.path.basename(contract_filepath))[0]
             report_filename = f"{base_name}_slither_report.txt"
-            report_filepath = os.path.join(GENERATED_REPORT_DIR, report_filename)
+            report_filepath = os.path.join(REPORT_DIR, report_filename)
             with open(report_filepath, 'w') as f:
                 f.write(slither_report)
+            # Manifest records are append-only, so the report gets its own record for the same id
+            self.manifest.append({
+                "id": base_name,
+                "report_path": report_filepath,
+                "report_sha256": hashlib.sha256(slither_report.encode()).hexdigest(),
+            })
             pprint(f"Slither report saved at {report_filepath}.")
             return report_filepath
         except Exception as e:
@@ -0,0 +1,90 @@
+# test_dedup.py
+
+import json
+
+from dedup import NearDuplicateIndex, normalize_tokens
+
+TOKEN = """contract Token {
+    mapping(address => uint256) public balances;
+    uint256 public totalSupply;
+
+    function mint(address to, uint256 amount) public {
+        balances[to] += amount;
+        totalSupply += amount;
+    }
+
+    function transfer(address to, uint256 amount) public {
+        require(balances[msg.sender] >= amount, "balance");
+        balances[msg.sender] -= amount;
+        balances[to] += amount;
+    }
+}"""
+
+# Same contract with renamed identifiers, a comment and different formatting
+RENAMED = """// a clone
+contract Coin { mapping(address => uint256) public ledger; uint256 public supply;
+  function mint(address who, uint256 qty) public { ledger[who] += qty; supply += qty; }
+  function transfer(address who, uint256 qty) public {
+    require(ledger[msg.sender] >= qty, "balance"); ledger[msg.sender] -= qty; ledger[who] += qty; }
+}"""
+
+AUCTION = """contract Auction {
+    address public highestBidder;
+    uint public highestBid;
+
+    function bid() external payable {
+        require(msg.value > highestBid);
+        payable(highestBidder).transfer(highestBid);
+        highestBidder = msg.sender;
+        highestBid = msg.value;
+    }
+}"""
+
+
+def test_normalize_tokens_ignores_names_comments_and_whitespace():
+    assert normalize_tokens(TOKEN) == normalize_tokens(RENAMED)
+    assert normalize_tokens("uint256 x = msg.value;") == ["uint256", "id0", "=", "msg", ".", "value", ";"]
+
+
+def test_reserve_blocks_in_flight_duplicates(tmp_path):
+    index = NearDuplicateIndex(str(tmp_path / "dedup.jsonl"), threshold=0.8)
+    assert index.reserve("job-1", index.signature(TOKEN)) is None
+    duplicate = index.reserve("job-2", index.signature(RENAMED))
+    assert duplicate == ("job-1", 1.0)
+    assert index.reserve("job-3", index.signature(AUCTION)) is None
+
+
+def test_discard_frees_the_reservation(tmp_path):
+    index = NearDuplicateIndex(str(tmp_path / "dedup.jsonl"), threshold=0.8)
+    index.reserve("job-1", index.signature(TOKEN))
+    index.discard("job-1")
+    assert index.reserve("job-2", index.signature(RENAMED)) is None
+    assert not (tmp_path / "dedup.jsonl").exists()
+
+
+def test_commit_persists_under_the_saved_id(tmp_path):
+    path = tmp_path / "dedup.jsonl"
+    index = NearDuplicateIndex(str(path), threshold=0.8)
+    index.reserve("job-1", index.signature(TOKEN))
+    index.commit("job-1", "contract_7")
+    assert "job-1" not in index.signatures
+    assert [json.loads(line)["id"] for line in path.read_text().splitlines()] == ["contract_7"]
+
+    reloaded = NearDuplicateIndex(str(path), threshold=0.8)
+    assert reloaded.reserve("job-2", reloaded.signature(RENAMED)) == ("contract_7", 1.0)
+
+
+def test_commit_or_discard_of_unknown_key_is_a_no_op(tmp_path):
+    path = tmp_path / "dedup.jsonl"
+    index = NearDuplicateIndex(str(path), threshold=0.8)
+    index.commit("missing", "contract_1")
+    index.discard("missing")
+    assert not path.exists() and not index.signatures
+
+
+def test_reload_skips_signatures_of_another_size(tmp_path):
+    path = tmp_path / "dedup.jsonl"
+    small = NearDuplicateIndex(str(path), threshold=0.8, num_perm=16)
+    small.reserve("job-1", small.signature(TOKEN))
+    small.commit("job-1", "contract_1")
+    assert NearDuplicateIndex(str(path), threshold=0.8).signatures == {}
@@ -0,0 +1,198 @@
+# test_distributed.py
+
+import json
+
+import pytest
+
+from sampler import CoverageSampler
+
+from distributed import Coordinator, QueueServer, ResultWriter, SQLiteJobQueue, TCPJobQueue, parse_queue_url
+
+
+def open_queue(tmp_path, lease_seconds=60):
+    return SQLiteJobQueue(str(tmp_path / "queue.db"), lease_seconds=lease_seconds)
+
+
+def test_lease_hands_out_each_job_once_in_order(tmp_path):
+    queue = open_queue(tmp_path)
+    first = queue.enqueue("low", ["reentrancy-eth"])
+    second = queue.enqueue("high", ["tx-origin"])
+    assert queue.lease("w1") == {"job_id": first, "complexity": "low", "vulnerabilities": ["reentrancy-eth"]}
+    assert queue.lease("w2")["job_id"] == second
+    assert queue.lease("w3") is None
+    assert queue.counts() == {"leased": 2}
+
+
+def test_expired_lease_is_taken_over(tmp_path):
+    queue = open_queue(tmp_path, lease_seconds=-1)
+    job_id = queue.enqueue("low", ["codex"])
+    assert queue.lease("w1")["job_id"] == job_id
+    assert queue.lease("w2")["job_id"] == job_id
+    attempts = queue.conn.execute("SELECT attempts, worker FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+    assert attempts == (2, "w2")
+
+
+def test_first_result_wins(tmp_path):
+    queue = open_queue(tmp_path, lease_seconds=-1)
+    job_id = queue.enqueue("low", ["codex"])
+    queue.lease("w1")
+    queue.lease("w2")
+    assert queue.complete(job_id, "w2", {"contract_code": "contract A {}"})
+    assert not queue.complete(job_id, "w1", {"contract_code": "contract B {}"})
+    assert not queue.fail(job_id, "w1", "compile")
+    [collected] = queue.collect()
+    assert collected["status"] == "done" and collected["worker"] == "w2"
+    assert collected["result"] == {"contract_code": "contract A {}"}
+
+
+def test_finished_results_cannot_be_leased_again(tmp_path):
+    queue = open_queue(tmp_path, lease_seconds=-1)
+    job_id = queue.enqueue("low", ["codex"])
+    queue.lease("w1")
+    queue.fail(job_id, "w1", "preflight")
+    assert queue.lease("w2") is None
+    assert queue.collect()[0]["reason"] == "preflight"
+
+
+def test_result_for_a_job_never_leased_is_rejected(tmp_path):
+    queue = open_queue(tmp_path)
+    job_id = queue.enqueue("low", ["codex"])
+    assert not queue.complete(job_id, "w1", {})
+    assert queue.counts() == {"queued": 1}
+
+
+def test_settle_removes_from_collect(tmp_path):
+    queue = open_queue(tmp_path)
+    job_id = queue.enqueue("low", ["codex"])
+    queue.lease("w1")
+    queue.complete(job_id, "w1", {"contract_code": "contract A {}"})
+    queue.settle(job_id, contract_id="contract_1")
+    assert queue.collect() == []
+    row = queue.conn.execute("SELECT settled, result, contract_id FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+    assert row == (1, None, "contract_1")
+
+
+def test_finished_needs_close_and_no_open_jobs(tmp_path):
+    queue = open_queue(tmp_path)
+    assert not queue.finished()
+    queue.close()
+    assert queue.finished()
+    queue.reopen()
+    job_id = queue.enqueue("low", ["codex"])
+    queue.close()
+    assert not queue.finished()
+    queue.lease("w1")
+    assert not queue.finished()
+    queue.complete(job_id, "w1", {})
+    assert queue.finished()
+
+
+def test_shared_queue_uses_the_rollback_journal(tmp_path):
+    assert open_queue(tmp_path).conn.execute("PRAGMA journal_mode").fetchone() == ("delete",)
+    local = SQLiteJobQueue(str(tmp_path / "local.db"), local=True)
+    assert local.conn.execute("PRAGMA journal_mode").fetchone() == ("wal",)
+
+
+def test_queue_is_shared_between_connections(tmp_path):
+    coordinator, worker = open_queue(tmp_path), open_queue(tmp_path)
+    job_id = coordinator.enqueue("medium", ["suicidal"])
+    assert worker.lease("w1")["job_id"] == job_id
+    worker.complete(job_id, "w1", {"contract_code": "contract A {}"})
+    assert coordinator.collect()[0]["job_id"] == job_id
+
+
+def test_tcp_client_only_reaches_worker_operations(tmp_path):
+    queue = open_queue(tmp_path)
+    job_id = queue.enqueue("low", ["codex"])
+    server = QueueServer(queue, "127.0.0.1", 0, token=None)
+    server.serve_in_background()
+    client = TCPJobQueue(*server.server_address, timeout=5, token=None)
+    try:
+        assert client.lease("w1")["job_id"] == job_id
+        assert client.complete(job_id, "w1", {"contract_code": "contract A {}"})
+        assert not client.fail(job_id, "w1", "late")
+        with pytest.raises(RuntimeError):
+            client._call("enqueue", "low", ["codex"])
+        assert queue.counts() == {"done": 1}
+    finally:
+        client.close_connection()
+        server.shutdown()
+        server.server_close()
+
+
+def test_tcp_server_checks_the_shared_token(tmp_path):
+    queue = open_queue(tmp_path)
+    queue.enqueue("low", ["codex"])
+    server = QueueServer(queue, "127.0.0.1", 0, token="secret")
+    server.serve_in_background()
+    intruder = TCPJobQueue(*server.server_address, timeout=5, token="guess")
+    client = TCPJobQueue(*server.server_address, timeout=5, token="secret")
+    try:
+        with pytest.raises(RuntimeError):
+            intruder.lease("w1")
+        assert queue.counts() == {"queued": 1}
+        assert client.lease("w1") is not None
+    finally:
+        intruder.close_connection()
+        client.close_connection()
+        server.shutdown()
+        server.server_close()
+
+
+def test_tcp_server_needs_a_token_off_loopback(tmp_path):
+    with pytest.raises(ValueError):
+        QueueServer(open_queue(tmp_path), "0.0.0.0", 0, token=None)
+
+
+def test_result_writer_rejects_unknown_report_formats(tmp_path):
+    entry = {
+        "job_id": 1, "complexity": "low", "vulnerabilities": ["codex"], "worker": "w1",
+        "result": {"contract_code": "contract A {}", "slither_result": "{}", "report_format": "../../etc/x",
+                   "confirmed": [], "missing": [], "repairs": [], "timings": {}, "findings": []},
+    }
+    with pytest.raises(ValueError):
+        ResultWriter()(entry)
+
+
+def test_coordinator_balances_sampler_reservations_of_leftover_jobs(tmp_path):
+    queue = open_queue(tmp_path)
+    saved_id = queue.enqueue("low", ["reentrancy-eth", "codex"])
+    failed_id = queue.enqueue("high", ["tx-origin"])
+    queue.lease("w1")
+    queue.lease("w1")
+    queue.complete(saved_id, "w1", {"confirmed": ["reentrancy-eth"]})
+    queue.fail(failed_id, "w1", "compile")
+
+    sampler = CoverageSampler(vulnerabilities=["reentrancy-eth", "codex", "tx-origin"])
+    coordinator = Coordinator(queue, lambda: (None, None), lambda entry: "contract_1", sampler=sampler, poll_seconds=0)
+    assert coordinator.run(0) == ["contract_1"]
+    assert all(count == 0 for count in sampler._pending.values())
+    assert sampler.detector_counts["reentrancy-eth"] == 1
+    assert queue.unsettled() == []
+
+
+def test_result_writer_syncs_shard_records_before_publishing(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    entry = {
+        "job_id": 1, "complexity": "low", "vulnerabilities": ["codex"], "worker": "w1",
+        "result": {"contract_code": "contract A {}", "slither_result": "{}", "report_format": "json",
+                   "confirmed": [], "missing": [], "repairs": [], "timings": {}, "findings": []},
+    }
+    writer = ResultWriter(output_format="shards")
+    try:
+        contract_id = writer(entry)
+        assert writer.shard_writer.unsynced == 0
+    finally:
+        writer.close()
+    root = tmp_path / "saved_contracts" / "save_directory"
+    assert [json.loads(line)["id"] for line in (root / "shards" / "index.jsonl").read_text().splitlines()] == [contract_id]
+    assert [json.loads(line)["id"] for line in (root / "manifest.jsonl").read_text().splitlines()] == [contract_id]
+
+
+def test_parse_queue_url():
+    assert parse_queue_url("sqlite:///shared/queue.db") == ("sqlite", "/shared/queue.db")
+    assert parse_queue_url("queue.db") == ("sqlite", "queue.db")
+    assert parse_queue_url("tcp://coordinator:7000") == ("tcp", "coordinator:7000")
+    for url in ("tcp://coordinator", "redis://localhost:6379"):
+        with pytest.raises(ValueError):
+            parse_queue_url(url)
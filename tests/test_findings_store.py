@@ -0,0 +1,23 @@
+# test_findings_store.py
+
+from findings_store import FindingsStore
+
+REENTRANCY = {"detector": "reentrancy-eth", "impact": "High", "confidence": "Medium", "lines": [3], "description": "d"}
+TX_ORIGIN = {"detector": "tx-origin", "impact": "Medium", "confidence": "Medium", "lines": [5], "description": "d"}
+
+
+def test_confirmed_findings_are_the_requested_detectors(tmp_path):
+    store = FindingsStore(str(tmp_path / "findings.sqlite"))
+    store.add_contract("1", "low", ["reentrancy-eth"], [REENTRANCY, TX_ORIGIN])
+    assert store.detector_counts(confirmed=True) == {"reentrancy-eth": 1}
+    assert store.detector_counts() == {"reentrancy-eth": 1, "tx-origin": 1}
+    assert store.complexity_counts(confirmed=True) == {"low": 1}
+
+
+def test_adding_a_contract_id_again_replaces_its_record(tmp_path):
+    store = FindingsStore(str(tmp_path / "findings.sqlite"))
+    store.add_contract("0", "low", ["reentrancy-eth"], [REENTRANCY], "old.sol", "old.json")
+    store.add_contract("0", "high", ["tx-origin"], [TX_ORIGIN], "new.sol", "new.json")
+    assert store.conn.execute("SELECT complexity, contract_path FROM contracts").fetchall() == [("high", "new.sol")]
+    assert store.detector_counts(confirmed=True) == {"tx-origin": 1}
+    assert store.detector_counts() == {"tx-origin": 1}
@@ -0,0 +1,76 @@
+# test_journal.py
+
+from journal import JobJournal
+
+
+def open_journal(tmp_path):
+    return JobJournal(str(tmp_path / "journal.db"))
+
+
+def test_resume_returns_pending_jobs_with_their_source(tmp_path):
+    journal = open_journal(tmp_path)
+    journal.start(4)
+    journal.schedule(1, "low", ["reentrancy-eth"])
+    journal.schedule(2, "high", ["tx-origin", "suicidal"])
+    journal.schedule(3, "medium", ["arbitrary-send-eth"])
+    journal.advance(1, "generate", "contract A {}", [])
+    journal.finish(1, "save", saved=True, contract_id="contract_1")
+    journal.advance(2, "repair", "contract B {}", [{"attempt": 1, "problem": "compile"}])
+    journal.finish(3, "validate", saved=False)
+    journal.close()
+
+    resumed = open_journal(tmp_path)
+    resumed.start(None, resume=True)
+    assert resumed.num_contracts == 4
+    assert resumed.pending_jobs() == [
+        {
+            "index": 2,
+            "complexity": "high",
+            "vulnerabilities": ["tx-origin", "suicidal"],
+            "stage": "repair",
+            "contract_code": "contract B {}",
+            "repairs": [{"attempt": 1, "problem": "compile"}],
+        }
+    ]
+    assert resumed.next_index() == 4
+    assert resumed.summary() == {"saved": 1, "failed": 1, "pending": 1}
+
+
+def test_scheduled_job_resumes_without_source(tmp_path):
+    journal = open_journal(tmp_path)
+    journal.start(2)
+    journal.schedule(1, "low", ["codex"])
+    journal.close()
+
+    resumed = open_journal(tmp_path)
+    resumed.start(None, resume=True)
+    [job] = resumed.pending_jobs()
+    assert job["stage"] == "scheduled" and job["contract_code"] is None and job["repairs"] == []
+
+
+def test_resume_with_a_new_target(tmp_path):
+    journal = open_journal(tmp_path)
+    run_id = journal.start(3)
+    journal.close()
+
+    resumed = open_journal(tmp_path)
+    assert resumed.start(10, resume=True) == run_id
+    assert resumed.num_contracts == 10
+
+
+def test_new_run_starts_numbering_again(tmp_path):
+    journal = open_journal(tmp_path)
+    first = journal.start(2)
+    journal.schedule(1, "low", ["codex"])
+    second = journal.start(None)
+    assert second != first
+    assert journal.num_contracts == 1
+    assert journal.next_index() == 1
+    assert journal.pending_jobs() == []
+
+
+def test_resume_without_a_previous_run_starts_one(tmp_path):
+    journal = open_journal(tmp_path)
+    journal.start(5, resume=True)
+    assert journal.num_contracts == 5
+    assert journal.next_index() == 1
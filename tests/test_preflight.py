@@ -0,0 +1,102 @@
+# test_preflight.py
+
+from preflight import StreamChecker, extract_solidity, normalize_header, preflight_contract
+
+CONTRACT = """pragma solidity ^0.8.0;
+
+contract Vault {
+    mapping(address => uint256) balances;
+
+    function withdraw() public {
+        // a brace in a comment: {
+        string memory s = "}";
+        balances[msg.sender] = 0;
+    }
+}"""
+
+
+def test_extract_prefers_solidity_fence():
+    text = f"Here is a helper:\n```js\nconsole.log(1)\n```\nAnd the contract:\n```solidity\n{CONTRACT}\n```\nHope it helps."
+    assert extract_solidity(text) == CONTRACT
+
+
+def test_extract_without_fence_drops_prose_and_end_marker():
+    text = f"Sure! Below is the contract.\n\n{CONTRACT}\n\nThis contract is vulnerable to reentrancy.\nEND"
+    assert extract_solidity(text) == CONTRACT
+
+
+def test_extract_keeps_a_trailing_truncated_declaration():
+    text = f"{CONTRACT}\n\ncontract Second {{\n    function f() public {{"
+    assert extract_solidity(text).endswith("function f() public {")
+
+
+def test_normalize_header_single_spdx_and_pragma():
+    code = "// SPDX-License-Identifier: GPL-3.0\npragma solidity >=0.7.0;\npragma solidity ^0.8.0;\ncontract A {}"
+    lines = normalize_header(code).strip().splitlines()
+    assert lines[:2] == ["// SPDX-License-Identifier: MIT", "pragma solidity >=0.7.0;"]
+    assert sum(line.startswith("pragma solidity") for line in lines) == 1
+
+
+def test_normalize_header_adds_missing_pragma():
+    assert "pragma solidity ^0.8.0;" in normalize_header("contract A {}")
+
+
+def test_preflight_accepts_braces_in_comments_and_strings():
+    result = preflight_contract(f"```solidity\n{CONTRACT}\n```")
+    assert result.ok, result.reason
+    assert result.code.lstrip().startswith("// SPDX-License-Identifier: MIT")
+
+
+def test_preflight_rejects_broken_output():
+    cases = {
+        "": "empty output",
+        "I cannot help with that.": "no contract, interface or library declaration",
+        "contract A {\n function f() public {": "truncated: 2 unclosed brace(s) at end of output",
+        "contract A { }\n}\ncontract B {}": "unbalanced braces: '}' without a matching '{'",
+        "contract A { function f( public {} }": "unbalanced parentheses",
+        "contract A is B;\ncontract C {}": "a contract declaration has no body",
+    }
+    for text, reason in cases.items():
+        result = preflight_contract(text)
+        assert not result.ok and result.reason == reason, text
+
+
+def feed_all(checker, chunks):
+    for chunk in chunks:
+        status = checker.feed(chunk)
+        if status != StreamChecker.CONTINUE:
+            return status
+    return StreamChecker.CONTINUE
+
+
+def test_stream_completes_after_outer_contract_and_prose():
+    checker = StreamChecker()
+    status = feed_all(checker, ["contract A {\n", "  function f() public {}\n", "}\n", "This ", "contract is ", "vulnerable."])
+    assert status == StreamChecker.COMPLETE
+    assert checker.text == "contract A {\n  function f() public {}\n}"
+    assert checker.reason == "outer contract closed"
+
+
+def test_stream_waits_for_a_following_contract():
+    checker = StreamChecker()
+    assert feed_all(checker, ["contract A {}\n", "contract B {\n", " uint x;\n"]) == StreamChecker.CONTINUE
+    assert feed_all(checker, ["}\n```\n", "Done."]) == StreamChecker.COMPLETE
+    assert checker.text == "contract A {}\ncontract B {\n uint x;\n}"
+
+
+def test_stream_end_marker():
+    checker = StreamChecker()
+    assert feed_all(checker, ["contract A {", " uint x; }\nEN", "D trailing"]) == StreamChecker.COMPLETE
+    assert checker.text == "contract A { uint x; }\n"
+    assert checker.reason == "end marker"
+
+
+def test_stream_aborts_without_declaration():
+    checker = StreamChecker(abort_after_chars=20)
+    assert checker.feed("Let me think about this ") == StreamChecker.ABORT
+    assert checker.reason.startswith("no contract declaration")
+
+
+def test_stream_aborts_on_unmatched_closing_brace():
+    checker = StreamChecker()
+    assert checker.feed("contract A { } }") == StreamChecker.ABORT
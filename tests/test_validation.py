@@ -0,0 +1,76 @@
+# test_validation.py
+
+import solidity_tools
+from solidity_tools import validate_contract
+
+FINDING = {"check": "reentrancy-eth", "impact": "High", "confidence": "Medium", "description": "", "elements": []}
+
+
+class FakeCache:
+    enabled = True
+
+    def __init__(self):
+        self.entries = {}
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def put(self, key, value):
+        self.entries[key] = value
+
+
+def fake_session(outcomes):
+    """_SlitherSession stand-in answering each run with the next (analyzed, output, findings)."""
+    class Session:
+        slither = None
+
+        def __init__(self, source_path, solc_output):
+            pass
+
+        def run(self, detector_names=None):
+            return outcomes.pop(0)
+    return Session
+
+
+def stub_tools(monkeypatch, outcomes):
+    cache = FakeCache()
+    monkeypatch.setattr(solidity_tools, "get_tool_cache", lambda: cache)
+    monkeypatch.setattr(solidity_tools, "_tool_cache_key", lambda *args: "key")
+    monkeypatch.setattr(
+        solidity_tools, "_compile_for_analysis",
+        lambda code, work_dir: (True, "Compiled contracts: A", {}, f"{work_dir}/A.sol"),
+    )
+    monkeypatch.setattr(solidity_tools, "_SlitherSession", fake_session(outcomes))
+    return cache
+
+
+def test_failed_full_pass_keeps_the_targeted_result_and_is_not_cached(monkeypatch):
+    cache = stub_tools(monkeypatch, [(True, "[]", [FINDING]), (False, "Slither analysis failed: boom", [])])
+    result = validate_contract("contract A {}", ["reentrancy-eth", "tx-origin"], "any")
+    assert result.compiled and not result.analyzed
+    assert result.verified
+    assert result.confirmed == ["reentrancy-eth"] and result.missing == ["tx-origin"]
+    assert cache.entries == {}
+
+
+def test_failed_targeted_pass_is_unverified(monkeypatch):
+    cache = stub_tools(monkeypatch, [(False, "Slither analysis failed: boom", [])])
+    result = validate_contract("contract A {}", ["reentrancy-eth"], "all")
+    assert not result.analyzed and not result.verified
+    assert cache.entries == {}
+
+
+def test_finished_validation_is_cached(monkeypatch):
+    cache = stub_tools(monkeypatch, [(True, "[]", [FINDING]), (True, "[]", [FINDING])])
+    result = validate_contract("contract A {}", ["reentrancy-eth"], "all")
+    assert result.analyzed and result.verified and result.confirmed == ["reentrancy-eth"]
+    assert list(cache.entries) == ["key"]
+
+
+def test_solc_output_does_not_name_a_temp_path(tmp_path, monkeypatch):
+    solc = tmp_path / "solc"
+    solc.write_text("#!/bin/sh\necho \"Error: $1:1:1: ParserError\" >&2\nexit 1\n")
+    solc.chmod(0o755)
+    monkeypatch.setattr(solidity_tools, "SOLC_PATH", str(solc))
+    outputs = {solidity_tools._run_solc("contract A {")[1] for _ in range(2)}
+    assert outputs == {"Compilation failed: Error: Contract.sol:1:1: ParserError\n"}
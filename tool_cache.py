@@ -0,0 +1,143 @@
+# tool_cache.py
+
+import hashlib
+import json
+import logging
+import os
+import subprocess
+import tempfile
+from functools import lru_cache
+from typing import Iterable, Optional
+from config import TOOL_CACHE_DIR, TOOL_CACHE_MAX_BYTES, TOOL_CACHE_DISABLE_ENV
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=None)
+def tool_version(binary: str) -> Optional[str]:
+    """Returns the `--version` output of a tool binary, or None if it cannot be run."""
+    try:
+        result = subprocess.run([binary, '--version'], stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=30)
+    except (OSError, subprocess.SubprocessError) as e:
+        logger.warning(f"Could not determine version of {binary}: {e}")
+        return None
+    if result.returncode != 0:
+        return None
+    return result.stdout.decode().strip()
+
+
+class ToolCache:
+    """
+    Content-addressed on-disk cache for compile/analysis results.
+
+    Entries are keyed by a hash of the tool name, tool versions, flags and the
+    source, so any change to one of them is a miss. Each entry is a small JSON
+    file; reads bump its mtime, and once the cache grows past `max_bytes` the
+    least recently used entries are evicted. Writes are atomic renames, so
+    several worker processes can share one cache directory.
+    """
+
+    def __init__(self, directory: str = TOOL_CACHE_DIR, max_bytes: int = TOOL_CACHE_MAX_BYTES, enabled: bool = True):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self._size = None  # Lazily computed running estimate of the cache size
+
+    @staticmethod
+    def make_key(tool: str, versions: Iterable[str], flags: Iterable[str], source: str) -> str:
+        digest = hashlib.sha256()
+        for part in [tool, *versions, '\0', *flags, '\0', source]:
+            digest.update(part.encode())
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def get(self, key: str) -> Optional[dict]:
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, 'r') as f:
+                value = json.load(f)
+            os.utime(path)  # Mark as recently used
+            return value
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Discarding unreadable tool cache entry {path}: {e}")
+            return None
+
+    def put(self, key: str, value: dict):
+        if not self.enabled:
+            return
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            data = json.dumps(value).encode()
+            with tempfile.NamedTemporaryFile(dir=os.path.dirname(path), delete=False) as temp_file:
+                temp_file.write(data)
+            os.replace(temp_file.name, path)
+        except OSError as e:
+            logger.warning(f"Could not write tool cache entry {path}: {e}")
+            return
+
+        if self._size is None:
+            self._size = self._scan_size()
+        else:
+            self._size += len(data)
+        if self._size > self.max_bytes:
+            self.evict()
+
+    def _entries(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith('.json'):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue  # Evicted concurrently by another worker
+                    yield stat.st_mtime, stat.st_size, path
+
+    def _scan_size(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self):
+        """Deletes least recently used entries until the cache is under 90% of max_bytes."""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * 0.9
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        self._size = total
+
+    def clear(self):
+        for _, _, path in list(self._entries()):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        self._size = 0
+
+
+_tool_cache: Optional[ToolCache] = None
+
+
+def get_tool_cache() -> ToolCache:
+    """
+    Returns this process's shared ToolCache. The cache is disabled when the
+    TOOL_CACHE_DISABLE_ENV environment variable is set, which worker processes
+    inherit from the main process.
+    """
+    global _tool_cache
+    if _tool_cache is None:
+        _tool_cache = ToolCache(enabled=not os.getenv(TOOL_CACHE_DISABLE_ENV))
+    return _tool_cache
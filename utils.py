@@ -1,9 +1,16 @@
 import os
 import random
 import logging
+from typing import Optional
 
 logger = logging.getLogger(__name__)
 
+
+def pprint(*args, **kwargs):
+    """rich's pprint, imported on first use so modules loaded by worker processes do not pay for rich."""
+    from rich.pretty import pprint as rich_pprint
+    rich_pprint(*args, **kwargs)
+
 # List of vulnerabilities
 VULNERABILITIES = [
     'abiencoderv2-array', 'arbitrary-send-erc20', 'arbitrary-send-erc20-permit', 'arbitrary-send-eth',
@@ -50,13 +57,14 @@ def load_preamble_from_file(filename="preamble.txt"):
     with open(preamble_path, 'r') as file:
         return file.read()
         
-def get_params() -> str:
+def get_params(rng: Optional[random.Random] = None) -> str:
     """Returns the contract complexity level and selects which vulnerabilities you need to include in the solidity source code you generate."""
+    rng = rng or random
     try:
-        complexity = random.choice(COMPLEXITY)
+        complexity = rng.choice(COMPLEXITY)
 
         # Randomly select vulnerabilities without repetition
-        selected_vulnerabilities = random.sample(VULNERABILITIES, k=random.randint(1, 5))
+        selected_vulnerabilities = rng.sample(VULNERABILITIES, k=rng.randint(1, 5))
 
         # Format the result
         result = f"Complexity Level: {complexity.capitalize()}\n"